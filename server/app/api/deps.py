@@ -1,7 +1,12 @@
-from typing import Generator, Optional
+import base64
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, AsyncGenerator, Callable, Dict, Optional, Type, get_args
 from fastapi import Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from pydantic import BaseModel
+from sqlalchemy import tuple_, types
+from app.core.database import Database, get_db
 from app.core.config import settings
 
 
@@ -12,16 +17,66 @@ def get_pagination_params(
     return page, size
 
 
-def get_db_session() -> Generator[Session, None, None]:
+def get_db_session() -> AsyncGenerator[Database, None]:
     return get_db()
 
 
+def encode_cursor(values: list[Any]) -> str:
+    payload = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return values
+
+
+class TotalMode(str, Enum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    NONE = "none"
+
+
+def get_pagination(
+    page: int = Query(1, ge=1, description="Page number (offset mode)"),
+    size: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor/prev_cursor from a previous page"),
+    paging: str = Query("offset", pattern="^(offset|cursor)$", description="offset or cursor pagination"),
+    total: TotalMode = Query(TotalMode.EXACT, description="exact count, planner estimate, or none")
+) -> "PaginationParams":
+    return PaginationParams(
+        page=page,
+        size=size,
+        cursor=cursor,
+        cursor_mode=paging == "cursor" or cursor is not None,
+        total_mode=total
+    )
+
+
 class PaginationParams:
-    def __init__(self, page: int = 1, size: int = 20):
+    def __init__(
+        self,
+        page: int = 1,
+        size: int = 20,
+        cursor: Optional[str] = None,
+        cursor_mode: bool = False,
+        total_mode: TotalMode = TotalMode.EXACT
+    ):
         self.page = page
         self.size = size
         self.offset = (page - 1) * size
         self.limit = size
+        self.cursor = cursor
+        self.cursor_mode = cursor_mode
+        self.total_mode = total_mode
     
     def paginate_query(self, query):
         return query.offset(self.offset).limit(self.limit)
@@ -38,3 +93,198 @@ class PaginationParams:
             "has_next": self.page < pages,
             "has_prev": self.page > 1
         }
+    
+    def paginate(
+        self,
+        query,
+        keyset: list,
+        serialize: Callable[[Any], Any],
+        descending: bool = False
+    ) -> dict:
+        """
+        Run a list query in the requested mode and build the PaginatedResponse dict.
+        
+        ``keyset`` is the unique sort key (e.g. ``[Pago.fecha_pago, Pago.pago_id]``).
+        Offset mode keeps the classic page/pages metadata; cursor mode seeks
+        past the key of the last (or first) row, so pages stay stable while
+        rows are inserted.
+        """
+        
+        total = self.count(query)
+        
+        if not self.cursor_mode:
+            ordered = query.order_by(*[c.desc() if descending else c.asc() for c in keyset])
+            
+            if total is not None:
+                return self.create_pagination_response(
+                    [serialize(item) for item in self.paginate_query(ordered).all()],
+                    total
+                )
+            
+            rows = ordered.offset(self.offset).limit(self.limit + 1).all()
+            
+            return {
+                "items": [serialize(item) for item in rows[:self.size]],
+                "total": None,
+                "page": self.page,
+                "size": self.size,
+                "pages": None,
+                "has_next": len(rows) > self.size,
+                "has_prev": self.page > 1
+            }
+        
+        backwards = False
+        if self.cursor:
+            direction, *values = decode_cursor(self.cursor) or [None]
+            if direction not in ("n", "p") or len(values) != len(keyset):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            
+            backwards = direction == "p"
+            values = [self._coerce(column, value) for column, value in zip(keyset, values)]
+            
+            # Walking backwards flips the sort, so the seek comparison flips too
+            if descending != backwards:
+                query = query.filter(tuple_(*keyset) < tuple_(*values))
+            else:
+                query = query.filter(tuple_(*keyset) > tuple_(*values))
+        
+        reverse = descending != backwards
+        rows = query.order_by(
+            *[c.desc() if reverse else c.asc() for c in keyset]
+        ).limit(self.size + 1).all()
+        
+        more = len(rows) > self.size
+        rows = rows[:self.size]
+        
+        if backwards:
+            rows.reverse()
+        
+        has_next = more if not backwards else True
+        has_prev = more if backwards else self.cursor is not None
+        
+        def _cursor(direction: str, row) -> str:
+            return encode_cursor([direction] + [getattr(row, column.key) for column in keyset])
+        
+        return {
+            "items": [serialize(item) for item in rows],
+            "total": total,
+            "page": None,
+            "size": self.size,
+            "pages": (total + self.size - 1) // self.size if total is not None else None,
+            "has_next": has_next and bool(rows),
+            "has_prev": has_prev and bool(rows),
+            "next_cursor": _cursor("n", rows[-1]) if has_next and rows else None,
+            "prev_cursor": _cursor("p", rows[0]) if has_prev and rows else None
+        }
+    
+    def count(self, query) -> Optional[int]:
+        return count_rows(query, self.total_mode)
+    
+    @staticmethod
+    def _coerce(column, value):
+        # Cursor values travel as JSON (dates and decimals as strings); other
+        # column types are compared as decoded
+        try:
+            if isinstance(column.type, types.DateTime):
+                return datetime.fromisoformat(value)
+            if isinstance(column.type, types.Date):
+                return date.fromisoformat(value)
+            if isinstance(column.type, (types.Integer, types.Numeric)):
+                return column.type.python_type(value)
+            return value
+        except (TypeError, ValueError, ArithmeticError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def count_rows(query, mode: TotalMode) -> Optional[int]:
+    """Total rows of ``query`` in the requested mode (None for ``none``)."""
+    
+    if mode == TotalMode.NONE:
+        return None
+    
+    if mode == TotalMode.EXACT:
+        return query.count()
+    
+    return estimate_count(query)
+
+
+def estimate_count(query) -> int:
+    """Row estimate from the planner (EXPLAIN, no execution) instead of a COUNT scan."""
+    
+    connection = query.session.connection()
+    compiled = query.statement.compile(
+        dialect=connection.dialect,
+        compile_kwargs={"render_postcompile": True}
+    )
+    
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+FieldTree = Dict[str, Optional["FieldTree"]]
+
+
+def _nested_model(annotation: Any) -> Optional[Type[BaseModel]]:
+    """The model inside an annotation such as ``Optional[List[Model]]``, if any."""
+    
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    
+    for arg in get_args(annotation):
+        model = _nested_model(arg)
+        if model is not None:
+            return model
+    
+    return None
+
+
+def field_selection(model: Type[BaseModel]) -> Callable[..., Optional[FieldTree]]:
+    """
+    Dependency for a ``fields`` query parameter selecting part of ``model``.
+    
+    Names are comma-separated and dotted for nested objects and list items,
+    e.g. ``nombre,creditos.saldo_pendiente,creditos.next_payment.fecha_vencimiento``.
+    A bare name keeps the whole value. Returns the selection as a tree for
+    ``select_fields`` (None when the parameter is absent); unknown names are
+    a 400.
+    """
+    
+    def dependency(
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return, dotted for nested ones")
+    ) -> Optional[FieldTree]:
+        if not fields:
+            return None
+        
+        tree: FieldTree = {}
+        
+        for path in filter(None, (p.strip() for p in fields.split(","))):
+            names = path.split(".")
+            
+            current: Optional[Type[BaseModel]] = model
+            for name in names:
+                if current is None or name not in current.model_fields:
+                    raise HTTPException(status_code=400, detail=f"Unknown field: {path}")
+                current = _nested_model(current.model_fields[name].annotation)
+            
+            node = tree
+            for name in names[:-1]:
+                child = node.setdefault(name, {})
+                if child is None:
+                    # A shorter path already selects the whole value
+                    break
+                node = child
+            else:
+                node[names[-1]] = None
+        
+        return tree
+    
+    return dependency
+
@@ -1,93 +1,99 @@
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy.orm import Session, joinedload
+from app.core.database import Database, get_db
+from app.core.replica import get_read_db
 from app.models.models import Cliente
 from app.schemas.cliente import (
     ClienteResponse, 
     ClienteCreate, 
     ClienteUpdate,
-    ClienteWithCreditos
+    ClienteWithCreditos,
+    ClienteDashboard
 )
+from app.schemas.credito import CreditoResponse
 from app.schemas.response import PaginatedResponse, APIResponse
-from app.api.deps import PaginationParams
+from app.api.deps import FieldTree, PaginationParams, field_selection, get_pagination
+from app.api.responses import FastJSONResponse, select_fields
+from app.services.cliente_service import ClienteService
 
 router = APIRouter()
 
 
 @router.get("/", response_model=PaginatedResponse[ClienteResponse])
 async def get_clientes(
-    page: int = Query(1, ge=1),
-    size: int = Query(20, ge=1, le=100),
-    search: str = Query(None, description="Search by name or document"),
-    ciudad: str = Query(None, description="Filter by city"),
-    db: Session = Depends(get_db)
+    search: str = Query(None, description="Search by name (fuzzy, accent-insensitive) or document prefix"),
+    ciudad: str = Query(None, description="Filter by city prefix"),
+    pagination: PaginationParams = Depends(get_pagination),
+    db: Database = Depends(get_read_db)
 ):
-    pagination = PaginationParams(page=page, size=size)
-    
-    query = db.query(Cliente)
-    
-    if search:
-        query = query.filter(
-            Cliente.nombre.ilike(f"%{search}%") |
-            Cliente.num_doc.ilike(f"%{search}%")
+    def _get_clientes(session: Session):
+        # Keyset pages must follow cliente_id, so ranking only applies to offset pages
+        query = ClienteService(session).search_query(
+            search,
+            ciudad,
+            ranked=not pagination.cursor_mode
+        )
+        
+        return pagination.paginate(
+            query,
+            keyset=[Cliente.cliente_id],
+            serialize=ClienteResponse.model_validate
         )
     
-    if ciudad:
-        query = query.filter(Cliente.ciudad.ilike(f"%{ciudad}%"))
-    
-    total = query.count()
-    
-    clientes = pagination.paginate_query(query).all()
-    
-    return pagination.create_pagination_response(clientes, total)
+    return await db.run(_get_clientes)
 
 
 @router.get("/{cliente_id}", response_model=ClienteWithCreditos)
 async def get_cliente(
     cliente_id: int,
     include_creditos: bool = Query(True, description="Include client credits"),
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_read_db)
 ):
-    query = db.query(Cliente).filter(Cliente.cliente_id == cliente_id)
-    
-    if include_creditos:
-        from sqlalchemy.orm import joinedload
-        query = query.options(joinedload(Cliente.creditos))
-    
-    cliente = query.first()
-    
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente not found")
-    
-    return cliente
+    def _get_cliente(session: Session):
+        query = session.query(Cliente).filter(Cliente.cliente_id == cliente_id)
+        
+        if include_creditos:
+            query = query.options(joinedload(Cliente.creditos))
+        
+        cliente = query.first()
+        
+        if not cliente:
+            raise HTTPException(status_code=404, detail="Cliente not found")
+        
+        return ClienteWithCreditos.model_validate(cliente)
+    
+    return await db.run(_get_cliente)
 
 
 @router.post("/", response_model=APIResponse[ClienteResponse])
 async def create_cliente(
     cliente_data: ClienteCreate,
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
-    existing_cliente = db.query(Cliente).filter(
-        Cliente.tipo_doc == cliente_data.tipo_doc,
-        Cliente.num_doc == cliente_data.num_doc
-    ).first()
-    
-    if existing_cliente:
-        raise HTTPException(
-            status_code=400,
-            detail="Cliente with this document already exists"
-        )
-    
-    db_cliente = Cliente(**cliente_data.model_dump())
-    db.add(db_cliente)
-    db.commit()
-    db.refresh(db_cliente)
+    def _create_cliente(session: Session):
+        existing_cliente = session.query(Cliente).filter(
+            Cliente.tipo_doc == cliente_data.tipo_doc,
+            Cliente.num_doc == cliente_data.num_doc
+        ).first()
+        
+        if existing_cliente:
+            raise HTTPException(
+                status_code=400,
+                detail="Cliente with this document already exists"
+            )
+        
+        db_cliente = Cliente(**cliente_data.model_dump())
+        session.add(db_cliente)
+        session.commit()
+        session.refresh(db_cliente)
+        
+        return ClienteResponse.model_validate(db_cliente)
     
     return APIResponse(
         success=True,
         message="Cliente created successfully",
-        data=db_cliente
+        data=await db.run(_create_cliente)
     )
 
 
@@ -95,45 +101,51 @@ async def create_cliente(
 async def update_cliente(
     cliente_id: int,
     cliente_update: ClienteUpdate,
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
-    cliente = db.query(Cliente).filter(Cliente.cliente_id == cliente_id).first()
-    
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente not found")
-    
-    update_data = cliente_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(cliente, field, value)
-    
-    db.commit()
-    db.refresh(cliente)
+    def _update_cliente(session: Session):
+        cliente = session.query(Cliente).filter(Cliente.cliente_id == cliente_id).first()
+        
+        if not cliente:
+            raise HTTPException(status_code=404, detail="Cliente not found")
+        
+        update_data = cliente_update.model_dump(exclude_unset=True)
+        for field, value in update_data.items():
+            setattr(cliente, field, value)
+        
+        session.commit()
+        session.refresh(cliente)
+        
+        return ClienteResponse.model_validate(cliente)
     
     return APIResponse(
         success=True,
         message="Cliente updated successfully",
-        data=cliente
+        data=await db.run(_update_cliente)
     )
 
 
 @router.delete("/{cliente_id}", response_model=APIResponse[None])
 async def delete_cliente(
     cliente_id: int,
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
-    cliente = db.query(Cliente).filter(Cliente.cliente_id == cliente_id).first()
-    
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente not found")
-    
-    if cliente.creditos:
-        raise HTTPException(
-            status_code=400,
-            detail="Cannot delete client with active credits"
-        )
-    
-    db.delete(cliente)
-    db.commit()
+    def _delete_cliente(session: Session):
+        cliente = session.query(Cliente).filter(Cliente.cliente_id == cliente_id).first()
+        
+        if not cliente:
+            raise HTTPException(status_code=404, detail="Cliente not found")
+        
+        if cliente.creditos:
+            raise HTTPException(
+                status_code=400,
+                detail="Cannot delete client with active credits"
+            )
+        
+        session.delete(cliente)
+        session.commit()
+    
+    await db.run(_delete_cliente)
     
     return APIResponse(
         success=True,
@@ -144,11 +156,35 @@ async def delete_cliente(
 @router.get("/{cliente_id}/creditos", response_model=List[dict])
 async def get_cliente_creditos(
     cliente_id: int,
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_read_db)
 ):
-    cliente = db.query(Cliente).filter(Cliente.cliente_id == cliente_id).first()
+    def _get_cliente_creditos(session: Session):
+        cliente = session.query(Cliente).filter(Cliente.cliente_id == cliente_id).first()
+        
+        if not cliente:
+            raise HTTPException(status_code=404, detail="Cliente not found")
+        
+        return [CreditoResponse.model_validate(c).model_dump() for c in cliente.creditos]
+    
+    return await db.run(_get_cliente_creditos)
+
+
+@router.get("/{cliente_id}/dashboard", response_model=ClienteDashboard)
+async def get_cliente_dashboard(
+    cliente_id: int,
+    fields: Optional[FieldTree] = Depends(field_selection(ClienteDashboard)),
+    db: Database = Depends(get_read_db)
+):
+    """
+    Profile, credits with balances and next cuota due in one call (two
+    statements). ``fields`` trims the response to what the client renders,
+    e.g. ``?fields=nombre,saldo_pendiente,next_payment,creditos.producto``.
+    """
+    
+    dashboard = await db.run(lambda session: ClienteService(session).get_dashboard(cliente_id))
     
-    if not cliente:
+    if not dashboard:
         raise HTTPException(status_code=404, detail="Cliente not found")
     
-    return cliente.creditos
+    return FastJSONResponse(select_fields(dashboard, fields))
+
@@ -0,0 +1,86 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.core.config import settings
+from app.core.database import Database, get_db
+from app.core.replica import get_read_db
+from app.schemas.cobranza import CobranzaItem, CobranzaLease, CobranzaLeaseRequest, CobranzaReleaseRequest
+from app.schemas.response import APIResponse
+from app.api.responses import FastJSONResponse
+from app.services.cobranza_service import CobranzaService
+
+router = APIRouter()
+
+
+def _check_agente(agente: str) -> str:
+    agente = agente.strip()
+    
+    if not agente:
+        raise HTTPException(status_code=400, detail="agente is required")
+    
+    return agente
+
+
+@router.get("/cola", response_model=List[CobranzaItem])
+async def get_cola(
+    limit: int = Query(50, ge=1, description="Rows from the top of the worklist"),
+    agente: Optional[str] = Query(None, description="Only the credits this agent holds"),
+    db: Database = Depends(get_read_db)
+):
+    """Delinquent credits by collection priority, without leasing them."""
+    
+    if limit > settings.cobranza_lease_max:
+        raise HTTPException(status_code=400, detail=f"limit must be at most {settings.cobranza_lease_max}")
+    
+    items = await db.run(lambda session: CobranzaService(session).worklist(limit=limit, agente=agente))
+    
+    return FastJSONResponse(items)
+
+
+@router.post("/cola/lease", response_model=CobranzaLease)
+async def lease_cola(
+    lease: CobranzaLeaseRequest,
+    db: Database = Depends(get_db)
+):
+    """
+    Lease the next ``cantidad`` credits to ``agente``. Rows leased by other
+    agents (or being leased concurrently) are skipped, never waited on;
+    leases expire after ``segundos`` unless released first.
+    """
+    
+    agente = _check_agente(lease.agente)
+    segundos = settings.cobranza_lease_seconds if lease.segundos is None else lease.segundos
+    
+    if not 1 <= lease.cantidad <= settings.cobranza_lease_max:
+        raise HTTPException(status_code=400, detail=f"cantidad must be between 1 and {settings.cobranza_lease_max}")
+    
+    if segundos < 1:
+        raise HTTPException(status_code=400, detail="segundos must be positive")
+    
+    items = await db.run(
+        lambda session: CobranzaService(session).lease(agente, lease.cantidad, segundos)
+    )
+    
+    return FastJSONResponse({"agente": agente, "items": items})
+
+
+@router.post("/cola/{credito_id}/release", response_model=APIResponse)
+async def release_cola(
+    credito_id: int,
+    release: CobranzaReleaseRequest,
+    db: Database = Depends(get_db)
+):
+    """Give a leased credit back, optionally snoozed for ``posponer_minutos``."""
+    
+    agente = _check_agente(release.agente)
+    
+    if release.posponer_minutos < 0:
+        raise HTTPException(status_code=400, detail="posponer_minutos must not be negative")
+    
+    released = await db.run(
+        lambda session: CobranzaService(session).release(credito_id, agente, release.posponer_minutos)
+    )
+    
+    if not released:
+        raise HTTPException(status_code=404, detail="Lease not found")
+    
+    return APIResponse(success=True, message="Credito released")
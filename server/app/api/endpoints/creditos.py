@@ -1,7 +1,11 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, case
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.cache import credit_cache
+from app.core.config import settings
+from app.core.database import Database, get_db
+from app.core.replica import get_read_db
 from app.models.models import Credito, Cliente
 from app.schemas.credito import (
     CreditoResponse, 
@@ -9,46 +13,53 @@ from app.schemas.credito import (
     CreditoUpdate,
     CreditoWithSchedule,
     CreditoSummary,
+    CreditoSummaryBatch,
+    CreditoSummaryBatchRequest,
     EstadoCreditoEnum,
-    ProductoEnum
+    ProductoEnum,
+    AgingBucket,
+    AgingGroupEnum,
+    RollRate
 )
 from app.schemas.payment import PaymentScheduleResponse, PaymentSummary
 from app.schemas.response import PaginatedResponse, APIResponse
-from app.api.deps import PaginationParams
+from app.api.deps import PaginationParams, get_pagination
+from app.api.responses import FastJSONResponse
 from app.services.payment_service import PaymentService
+from app.services.amortization_service import AmortizationService
+from app.services.portfolio_service import PortfolioService
 
 router = APIRouter()
 
 
 @router.get("/", response_model=PaginatedResponse[CreditoResponse])
 async def get_creditos(
-    page: int = Query(1, ge=1),
-    size: int = Query(20, ge=1, le=100),
     cliente_id: Optional[int] = Query(None, description="Filter by client ID"),
     producto: Optional[ProductoEnum] = Query(None, description="Filter by product type"),
     estado: Optional[EstadoCreditoEnum] = Query(None, description="Filter by status"),
-    db: Session = Depends(get_db)
+    pagination: PaginationParams = Depends(get_pagination),
+    db: Database = Depends(get_read_db)
 ):
-    pagination = PaginationParams(page=page, size=size)
-    
-    query = db.query(Credito).join(Cliente)
-    
-    if cliente_id:
-        query = query.filter(Credito.cliente_id == cliente_id)
-    
-    if producto:
-        query = query.filter(Credito.producto == producto.value)
-    
-    if estado:
-        query = query.filter(Credito.estado == estado.value)
-    
-    query = query.order_by(Credito.fecha_desembolso.desc())
-    
-    total = query.count()
-    
-    creditos = pagination.paginate_query(query).all()
+    def _get_creditos(session: Session):
+        query = session.query(Credito).join(Cliente)
+        
+        if cliente_id:
+            query = query.filter(Credito.cliente_id == cliente_id)
+        
+        if producto:
+            query = query.filter(Credito.producto == producto.value)
+        
+        if estado:
+            query = query.filter(Credito.estado == estado.value)
+        
+        return pagination.paginate(
+            query,
+            keyset=[Credito.fecha_desembolso, Credito.credito_id],
+            serialize=CreditoResponse.model_validate,
+            descending=True
+        )
     
-    return pagination.create_pagination_response(creditos, total)
+    return await db.run(_get_creditos)
 
 
 @router.get("/{credito_id}", response_model=CreditoWithSchedule)
@@ -56,32 +67,20 @@ async def get_credito(
     credito_id: int,
     include_schedule: bool = Query(True, description="Include payment schedule"),
     include_payments: bool = Query(True, description="Include payment details"),
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_read_db)
 ):
-    credito = db.query(Credito).filter(Credito.credito_id == credito_id).first()
-    
-    if not credito:
-        raise HTTPException(status_code=404, detail="Credito not found")
-    
-    payment_service = PaymentService(db)
-    
-    schedule = []
-    summary = None
-    
-    if include_schedule:
-        schedule = payment_service.get_payment_schedule(
-            credito_id, 
+    credito = await db.run(
+        lambda session: PaymentService(session).get_credito_document(
+            credito_id,
+            include_schedule=include_schedule,
             include_payments=include_payments
         )
-        summary = payment_service.get_credit_summary(credito_id)
+    )
     
-    response_data = CreditoResponse.model_validate(credito)
+    if not credito:
+        raise HTTPException(status_code=404, detail="Credito not found")
     
-    return CreditoWithSchedule(
-        **response_data.model_dump(),
-        payment_schedule=schedule,
-        summary=summary
-    )
+    return FastJSONResponse(credito)
 
 
 @router.get("/{credito_id}/schedule", response_model=List[PaymentScheduleResponse])
@@ -89,28 +88,33 @@ async def get_credito_schedule(
     credito_id: int,
     include_payments: bool = Query(True, description="Include payment details"),
     estado: Optional[str] = Query(None, description="Filter by payment status"),
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_read_db)
 ):
-    credito = db.query(Credito).filter(Credito.credito_id == credito_id).first()
-    if not credito:
-        raise HTTPException(status_code=404, detail="Credito not found")
+    def _get_credito_schedule(session: Session):
+        payment_service = PaymentService(session)
+        schedule = payment_service.get_schedule_rows(credito_id, include_payments)
+        
+        if not schedule and not session.query(Credito.credito_id).filter(Credito.credito_id == credito_id).first():
+            raise HTTPException(status_code=404, detail="Credito not found")
+        
+        return schedule
     
-    payment_service = PaymentService(db)
-    schedule = payment_service.get_payment_schedule(credito_id, include_payments)
+    schedule = await db.run(_get_credito_schedule)
     
     if estado:
-        schedule = [s for s in schedule if s.estado == estado]
+        schedule = [s for s in schedule if s['estado'] == estado]
     
-    return schedule
+    return FastJSONResponse(schedule)
 
 
 @router.get("/{credito_id}/summary", response_model=CreditoSummary)
 async def get_credito_summary(
     credito_id: int,
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_read_db)
 ):
-    payment_service = PaymentService(db)
-    summary = payment_service.get_credit_summary(credito_id)
+    summary = await db.run(
+        lambda session: PaymentService(session).get_credit_summary(credito_id)
+    )
     
     if not summary:
         raise HTTPException(status_code=404, detail="Credito not found")
@@ -121,10 +125,11 @@ async def get_credito_summary(
 @router.get("/{credito_id}/next-payment", response_model=PaymentScheduleResponse)
 async def get_next_payment(
     credito_id: int,
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_read_db)
 ):
-    payment_service = PaymentService(db)
-    next_payment = payment_service.get_next_payment(credito_id)
+    next_payment = await db.run(
+        lambda session: PaymentService(session).get_next_payment(credito_id)
+    )
     
     if not next_payment:
         raise HTTPException(
@@ -138,21 +143,36 @@ async def get_next_payment(
 @router.post("/", response_model=APIResponse[CreditoResponse])
 async def create_credito(
     credito_data: CreditoCreate,
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
-    cliente = db.query(Cliente).filter(Cliente.cliente_id == credito_data.cliente_id).first()
-    if not cliente:
-        raise HTTPException(status_code=400, detail="Cliente not found")
+    if credito_data.inversion <= 0 or credito_data.cuotas_totales < 1 or credito_data.tea < 0:
+        raise HTTPException(
+            status_code=400,
+            detail="inversion must be positive, cuotas_totales at least 1 and tea non-negative"
+        )
     
-    db_credito = Credito(**credito_data.model_dump())
-    db.add(db_credito)
-    db.commit()
-    db.refresh(db_credito)
+    def _create_credito(session: Session):
+        cliente = session.query(Cliente).filter(Cliente.cliente_id == credito_data.cliente_id).first()
+        if not cliente:
+            raise HTTPException(status_code=400, detail="Cliente not found")
+        
+        db_credito = Credito(**credito_data.model_dump())
+        session.add(db_credito)
+        session.flush()
+        
+        AmortizationService(session).create_schedule(db_credito)
+        session.commit()
+        session.refresh(db_credito)
+        
+        return CreditoResponse.model_validate(db_credito)
+    
+    credito = await db.run(_create_credito)
+    credit_cache.invalidate(credito.credito_id)
     
     return APIResponse(
         success=True,
         message="Credito created successfully",
-        data=db_credito
+        data=credito
     )
 
 
@@ -160,21 +180,27 @@ async def create_credito(
 async def update_credito(
     credito_id: int,
     credito_update: CreditoUpdate,
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
-    credito = db.query(Credito).filter(Credito.credito_id == credito_id).first()
+    def _update_credito(session: Session):
+        credito = session.query(Credito).filter(Credito.credito_id == credito_id).first()
+        
+        if not credito:
+            raise HTTPException(status_code=404, detail="Credito not found")
+        
+        update_data = credito_update.model_dump(exclude_unset=True)
+        for field, value in update_data.items():
+            if hasattr(value, 'value'):
+                value = value.value
+            setattr(credito, field, value)
+        
+        session.commit()
+        session.refresh(credito)
+        
+        return CreditoResponse.model_validate(credito)
     
-    if not credito:
-        raise HTTPException(status_code=404, detail="Credito not found")
-    
-    update_data = credito_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        if hasattr(value, 'value'):
-            value = value.value
-        setattr(credito, field, value)
-    
-    db.commit()
-    db.refresh(credito)
+    credito = await db.run(_update_credito)
+    credit_cache.invalidate(credito_id)
     
     return APIResponse(
         success=True,
@@ -183,20 +209,62 @@ async def update_credito(
     )
 
 
+@router.post("/summaries", response_model=CreditoSummaryBatch)
+async def get_credito_summaries(
+    batch: CreditoSummaryBatchRequest,
+    db: Database = Depends(get_read_db)
+):
+    """
+    Summaries and next unpaid cuota of up to ``SUMMARY_BATCH_MAX`` credits in
+    one statement, for worklists that would otherwise call ``/summary`` once
+    per credit. Read-only despite the POST (id lists do not fit in a URL).
+    """
+    
+    if batch.credito_ids is not None and len(batch.credito_ids) > settings.summary_batch_max:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.summary_batch_max} credito_ids per request"
+        )
+    
+    if not 1 <= batch.limit <= settings.summary_batch_max:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {settings.summary_batch_max}")
+    
+    credito_ids = sorted(set(batch.credito_ids)) if batch.credito_ids is not None else None
+    
+    items = []
+    if credito_ids != []:
+        items = await db.run(lambda session: PaymentService(session).get_credit_summaries(
+            credito_ids=credito_ids,
+            cliente_id=batch.cliente_id,
+            producto=batch.producto.value if batch.producto else None,
+            estado=batch.estado.value if batch.estado else None,
+            limit=None if credito_ids is not None else batch.limit
+        ))
+    
+    # Requested ids that do not exist or do not match the filters
+    found = {item['credito_id'] for item in items}
+    
+    return FastJSONResponse({
+        "items": items,
+        "missing": [credito_id for credito_id in credito_ids or [] if credito_id not in found]
+    })
+
+
 @router.get("/analytics/overview", response_model=dict)
 async def get_credits_overview(
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_read_db)
 ):
-    from sqlalchemy import func, case
+    def _get_stats(session: Session):
+        return session.query(
+            func.count(Credito.credito_id).label('total_creditos'),
+            func.sum(Credito.inversion).label('total_inversion'),
+            func.count(case((Credito.estado == 'vigente', 1))).label('creditos_vigentes'),
+            func.count(case((Credito.estado == 'cancelado', 1))).label('creditos_cancelados'),
+            func.count(case((Credito.producto == 'e-bike', 1))).label('e_bikes'),
+            func.count(case((Credito.producto == 'e-moped', 1))).label('e_mopeds')
+        ).first()
     
-    stats = db.query(
-        func.count(Credito.credito_id).label('total_creditos'),
-        func.sum(Credito.inversion).label('total_inversion'),
-        func.count(case((Credito.estado == 'vigente', 1))).label('creditos_vigentes'),
-        func.count(case((Credito.estado == 'cancelado', 1))).label('creditos_cancelados'),
-        func.count(case((Credito.producto == 'e-bike', 1))).label('e_bikes'),
-        func.count(case((Credito.producto == 'e-moped', 1))).label('e_mopeds')
-    ).first()
+    stats = await db.run(_get_stats)
     
     return {
         "total_creditos": stats.total_creditos or 0,
@@ -208,3 +276,36 @@ async def get_credits_overview(
             "e_mopeds": stats.e_mopeds or 0
         }
     }
+
+
+@router.get("/analytics/aging", response_model=List[AgingBucket])
+async def get_aging_buckets(
+    producto: Optional[ProductoEnum] = Query(None, description="Filter by product type"),
+    ciudad: Optional[str] = Query(None, description="Filter by client city"),
+    group_by: Optional[AgingGroupEnum] = Query(None, description="Split buckets by producto or ciudad"),
+    db: Database = Depends(get_read_db)
+):
+    """
+    Vigente credits and outstanding balance per days-past-due bucket
+    (0, 1-30, 31-60, 61-90, 90+), read from the portfolio rollup.
+    """
+    return await db.run(lambda session: PortfolioService(session).aging_buckets(
+        producto=producto.value if producto else None,
+        ciudad=ciudad,
+        group_by=group_by.value if group_by else None
+    ))
+
+
+@router.get("/analytics/roll-rates", response_model=List[RollRate])
+async def get_roll_rates(
+    months: int = Query(6, ge=1, le=36, description="Month-end closes to return"),
+    producto: Optional[ProductoEnum] = Query(None, description="Filter by product type"),
+    ciudad: Optional[str] = Query(None, description="Filter by client city"),
+    db: Database = Depends(get_read_db)
+):
+    """Month-over-month bucket transitions from the month-end portfolio snapshots."""
+    return await db.run(lambda session: PortfolioService(session).roll_rates(
+        months=months,
+        producto=producto.value if producto else None,
+        ciudad=ciudad
+    ))
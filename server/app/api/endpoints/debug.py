@@ -0,0 +1,40 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from app.core.config import settings
+from app.core.profiler import profiler
+
+
+def require_debug_token(x_debug_token: Optional[str] = Header(None)):
+    # Without a configured token the debug routes do not exist
+    if not settings.debug_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    
+    if not x_debug_token or not secrets.compare_digest(x_debug_token, settings.debug_token):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+
+
+router = APIRouter(dependencies=[Depends(require_debug_token)])
+
+
+@router.get("/queries")
+async def get_queries(
+    order_by: str = Query("total", pattern="^(total|p99|count|mean)$"),
+    limit: int = Query(50, ge=1, le=1000)
+):
+    """
+    Statement fingerprints with count, total/mean/p50/p99/max time in ms
+    and, for slow read-only statements, the last captured plan.
+    """
+    return {
+        "enabled": settings.query_profiler,
+        "slow_query_ms": profiler.slow_ms,
+        "since": profiler.started_at,
+        "queries": profiler.report(order_by=order_by, limit=limit)
+    }
+
+
+@router.delete("/queries")
+async def reset_queries():
+    profiler.reset()
+    return {"success": True}
@@ -0,0 +1,104 @@
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+from app.core.config import settings
+from app.core.database import Database
+from app.core.replica import get_read_db
+from app.schemas.credito import ProductoEnum
+from app.schemas.payment import EstadoCuotaEnum, MedioPagoEnum
+from app.services.export_service import (
+    encode_csv,
+    encode_ndjson,
+    gzip_stream,
+    pagos_export_query,
+    schedule_export_query
+)
+
+router = APIRouter()
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _export(db: Database, query: Select, name: str, fmt: str, gzip: bool) -> StreamingResponse:
+    columns = [column.name for column in query.selected_columns]
+    chunks = db.stream(query, chunk_size=settings.export_chunk_size)
+    body = encode_csv(columns, chunks) if fmt == "csv" else encode_ndjson(columns, chunks)
+    filename = f"{name}.{fmt}"
+    media_type = MEDIA_TYPES[fmt]
+    
+    if gzip:
+        body = gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def _check_range(desde: Optional[date], hasta: Optional[date]):
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="desde must not be after hasta")
+
+
+@router.get("/schedule")
+async def export_schedule(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False, description="Compress the download"),
+    desde: Optional[date] = Query(None, description="First fecha_vencimiento"),
+    hasta: Optional[date] = Query(None, description="Last fecha_vencimiento"),
+    credito_id: Optional[int] = Query(None),
+    producto: Optional[ProductoEnum] = Query(None, description="Filter by product type"),
+    estado: Optional[EstadoCuotaEnum] = Query(None, description="Filter by cuota state"),
+    db: Database = Depends(get_read_db)
+):
+    """
+    Stream payment_schedule rows (with the credit's producto) as CSV or
+    NDJSON from a server-side cursor; memory use does not grow with the
+    number of rows.
+    """
+    _check_range(desde, hasta)
+    
+    query = schedule_export_query(
+        desde=desde,
+        hasta=hasta,
+        credito_id=credito_id,
+        producto=producto.value if producto else None,
+        estado=estado.value if estado else None
+    )
+    
+    return _export(db, query, "cuotas", format, gzip)
+
+
+@router.get("/pagos")
+async def export_pagos(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False, description="Compress the download"),
+    desde: Optional[date] = Query(None, description="First payment day"),
+    hasta: Optional[date] = Query(None, description="Last payment day"),
+    credito_id: Optional[int] = Query(None),
+    producto: Optional[ProductoEnum] = Query(None, description="Filter by product type"),
+    estado: Optional[EstadoCuotaEnum] = Query(None, description="Filter by state of the paid cuota"),
+    medio: Optional[MedioPagoEnum] = Query(None, description="Filter by payment method"),
+    db: Database = Depends(get_read_db)
+):
+    """Stream pagos (with cuota, credit and producto) as CSV or NDJSON."""
+    _check_range(desde, hasta)
+    
+    query = pagos_export_query(
+        desde=desde,
+        hasta=hasta,
+        credito_id=credito_id,
+        producto=producto.value if producto else None,
+        estado=estado.value if estado else None,
+        medio=medio.value if medio else None
+    )
+    
+    return _export(db, query, "pagos", format, gzip)
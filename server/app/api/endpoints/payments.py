@@ -1,104 +1,172 @@
+from datetime import date, timedelta
 from typing import List, Optional
 from decimal import Decimal
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.models.models import Pago, PaymentSchedule
+from app.core.config import settings
+from app.core.database import Database, get_db
+from app.core.replica import get_read_db
+from app.models.models import PaymentSchedule
 from app.schemas.payment import (
     PagoResponse, 
     PagoCreate,
-    PaymentScheduleResponse,
+    OverdueCuotaResponse,
+    BulkPaymentReport,
     MedioPagoEnum,
-    EstadoCuotaEnum
+    EstadoCuotaEnum,
+    PaymentGroupEnum,
+    PaymentSeriesPoint,
+    PeriodoEnum
 )
-from app.schemas.response import PaginatedResponse, APIResponse
-from app.api.deps import PaginationParams
-from app.services.payment_service import PaymentService
+from app.schemas.credito import ProductoEnum
+from app.schemas.response import PaginatedResponse, APIResponse, CursorPage
+from app.api.deps import PaginationParams, TotalMode, count_rows, get_pagination, encode_cursor, decode_cursor
+from app.api.responses import FastJSONResponse
+from app.services.payment_service import PaymentService, PaymentRejected, pagos_history, pagos_union
+from app.services.payment_rollup_service import PaymentRollupService
+from app.services.bulk_payments import ingest_batch, parse_rows
 
 router = APIRouter()
 
+BULK_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+def _check_range(desde: Optional[date], hasta: Optional[date]):
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="desde must not be after hasta")
+
 
 @router.get("/", response_model=PaginatedResponse[PagoResponse])
 async def get_pagos(
-    page: int = Query(1, ge=1),
-    size: int = Query(20, ge=1, le=100),
     schedule_id: Optional[int] = Query(None, description="Filter by schedule ID"),
     credito_id: Optional[int] = Query(None, description="Filter by credit ID"),
     medio: Optional[MedioPagoEnum] = Query(None, description="Filter by payment method"),
-    db: Session = Depends(get_db)
+    desde: Optional[date] = Query(None, description="First fecha_pago day"),
+    hasta: Optional[date] = Query(None, description="Last fecha_pago day"),
+    pagination: PaginationParams = Depends(get_pagination),
+    db: Database = Depends(get_read_db)
 ):
-    pagination = PaginationParams(page=page, size=size)
-    
-    query = db.query(Pago).join(PaymentSchedule)
-    
-    if schedule_id:
-        query = query.filter(Pago.schedule_id == schedule_id)
-    
-    if credito_id:
-        query = query.filter(PaymentSchedule.credito_id == credito_id)
+    """
+    Pagos, archived months included, newest first. ``desde``/``hasta``
+    restrict the scan to the monthly partitions they overlap, as does the
+    credit's disbursement date when filtering by credit or cuota.
+    """
+    _check_range(desde, hasta)
+    
+    def _get_pagos(session: Session):
+        pagos = pagos_union(
+            credito_id=credito_id or None,
+            schedule_id=schedule_id or None,
+            medio=medio.value if medio else None,
+            desde=desde,
+            hasta=hasta
+        )
+        
+        return pagination.paginate(
+            session.query(pagos),
+            keyset=[pagos.c.fecha_pago, pagos.c.pago_id],
+            serialize=PagoResponse.model_validate,
+            descending=True
+        )
     
-    if medio:
-        query = query.filter(Pago.medio == medio.value)
+    return await db.run(_get_pagos)
+
+
+@router.get("/overdue", response_model=CursorPage[OverdueCuotaResponse])
+async def get_overdue_payments(
+    days_overdue: int = Query(0, ge=0, description="Minimum days overdue"),
+    size: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    min_saldo: Optional[Decimal] = Query(None, ge=0, description="Minimum outstanding balance"),
+    ciudad: Optional[str] = Query(None, description="Filter by client city"),
+    producto: Optional[ProductoEnum] = Query(None, description="Filter by product type"),
+    total: TotalMode = Query(TotalMode.NONE, description="exact count, planner estimate, or none"),
+    db: Database = Depends(get_read_db)
+):
+    cutoff_date = date.today() - timedelta(days=days_overdue)
+    filters = {
+        "min_saldo": min_saldo,
+        "ciudad": ciudad,
+        "producto": producto.value if producto else None
+    }
     
-    query = query.order_by(Pago.fecha_pago.desc())
+    after = None
+    if cursor:
+        try:
+            fecha, schedule_id = decode_cursor(cursor)
+            after = (date.fromisoformat(fecha), int(schedule_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    def _get_overdue(session: Session):
+        service = PaymentService(session)
+        items, has_next = service.get_overdue_cuotas(cutoff_date, size, after=after, **filters)
+        
+        return items, has_next, count_rows(service.overdue_count_query(cutoff_date, **filters), total)
     
-    total = query.count()
+    items, has_next, count = await db.run(_get_overdue)
     
-    pagos = pagination.paginate_query(query).all()
+    next_cursor = None
+    if has_next:
+        last = items[-1]
+        next_cursor = encode_cursor([last.fecha_vencimiento.isoformat(), last.schedule_id])
     
-    return pagination.create_pagination_response(pagos, total)
+    return CursorPage(
+        items=items,
+        size=size,
+        total=count,
+        next_cursor=next_cursor,
+        has_next=has_next
+    )
 
 
 @router.get("/{pago_id}", response_model=PagoResponse)
 async def get_pago(
     pago_id: int,
-    db: Session = Depends(get_db)
+    fecha: Optional[date] = Query(None, description="Day of fecha_pago, when known; only its partition is read"),
+    db: Database = Depends(get_read_db)
 ):
-    pago = db.query(Pago).filter(Pago.pago_id == pago_id).first()
-    
-    if not pago:
-        raise HTTPException(status_code=404, detail="Pago not found")
+    def _get_pago(session: Session):
+        pago = session.query(pagos_union(pago_id=pago_id, desde=fecha, hasta=fecha)).first()
+        
+        if not pago:
+            raise HTTPException(status_code=404, detail="Pago not found")
+        
+        return PagoResponse.model_validate(pago)
     
-    return pago
+    return await db.run(_get_pago)
 
 
 @router.post("/", response_model=APIResponse[PagoResponse])
 async def create_pago(
     pago_data: PagoCreate,
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
-    schedule = db.query(PaymentSchedule).filter(
-        PaymentSchedule.schedule_id == pago_data.schedule_id
-    ).first()
-    
-    if not schedule:
-        raise HTTPException(status_code=400, detail="Payment schedule not found")
-    
     if pago_data.monto <= 0:
         raise HTTPException(status_code=400, detail="Payment amount must be positive")
     
-    existing_payments = db.query(Pago).filter(
-        Pago.schedule_id == pago_data.schedule_id
-    ).all()
-    
-    total_existing = sum(p.monto for p in existing_payments)
-    
-    if total_existing + pago_data.monto > schedule.valor_cuota:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Payment amount exceeds remaining balance. "
-                   f"Remaining: {schedule.valor_cuota - total_existing}"
+    def _create_pago(session: Session):
+        payment_service = PaymentService(session)
+        new_payment = payment_service.create_payment(
+            schedule_id=pago_data.schedule_id,
+            monto=pago_data.monto,
+            medio=pago_data.medio.value if pago_data.medio else None
         )
+        
+        if not new_payment:
+            raise HTTPException(status_code=400, detail="Payment schedule not found")
+        
+        return new_payment
     
-    payment_service = PaymentService(db)
-    new_payment = payment_service.create_payment(
-        schedule_id=pago_data.schedule_id,
-        monto=pago_data.monto,
-        medio=pago_data.medio.value if pago_data.medio else None
-    )
-    
-    if not new_payment:
-        raise HTTPException(status_code=500, detail="Failed to create payment")
+    try:
+        new_payment = await db.run(_create_pago)
+    except PaymentRejected as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     
     return APIResponse(
         success=True,
@@ -107,115 +175,169 @@ async def create_pago(
     )
 
 
+@router.post("/bulk", response_model=BulkPaymentReport)
+async def create_pagos_bulk(
+    request: Request,
+    db: Database = Depends(get_db)
+):
+    """
+    Post a batch of payments from a CSV (header: schedule_id,monto,medio,fecha_pago)
+    or NDJSON body. The upload is parsed as it streams in and posted in
+    chunks of ``bulk_batch_size`` rows; each chunk commits on its own.
+    
+    Unparseable rows are rejected in the per-row report like any other;
+    only a bad CSV header fails the request, before anything is posted.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = BULK_FORMATS.get(content_type)
+    
+    if not fmt:
+        raise HTTPException(
+            status_code=415,
+            detail="Send payments as text/csv or application/x-ndjson"
+        )
+    
+    results = []
+    batch = []
+    
+    rows = parse_rows(request.stream(), fmt)
+    
+    try:
+        first = await anext(rows, None)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    if first is not None:
+        batch.append(first)
+    
+    async for row in rows:
+        batch.append(row)
+        
+        if len(batch) >= settings.bulk_batch_size:
+            results.extend(await db.run(ingest_batch, batch))
+            batch = []
+    
+    if batch:
+        results.extend(await db.run(ingest_batch, batch))
+    
+    accepted = sum(1 for r in results if r.accepted)
+    
+    return BulkPaymentReport(
+        received=len(results),
+        accepted=accepted,
+        rejected=len(results) - accepted,
+        results=results
+    )
+
+
 @router.get("/schedule/{schedule_id}", response_model=List[PagoResponse])
 async def get_schedule_payments(
     schedule_id: int,
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_read_db)
 ):
-    schedule = db.query(PaymentSchedule).filter(
-        PaymentSchedule.schedule_id == schedule_id
-    ).first()
-    
-    if not schedule:
-        raise HTTPException(status_code=404, detail="Payment schedule not found")
-    
-    pagos = db.query(Pago).filter(
-        Pago.schedule_id == schedule_id
-    ).order_by(Pago.fecha_pago.desc()).all()
+    def _get_schedule_payments(session: Session):
+        schedule = session.query(PaymentSchedule).filter(
+            PaymentSchedule.schedule_id == schedule_id
+        ).first()
+        
+        if not schedule:
+            raise HTTPException(status_code=404, detail="Payment schedule not found")
+        
+        pagos = session.execute(pagos_history(schedule_id=schedule_id)).all()
+        
+        return [PagoResponse.model_validate(p) for p in pagos]
     
-    return pagos
+    return await db.run(_get_schedule_payments)
 
 
 @router.get("/credito/{credito_id}", response_model=List[PagoResponse])
 async def get_credito_payments(
     credito_id: int,
     estado: Optional[EstadoCuotaEnum] = Query(None, description="Filter by installment status"),
-    db: Session = Depends(get_db)
+    desde: Optional[date] = Query(None, description="First fecha_pago day"),
+    hasta: Optional[date] = Query(None, description="Last fecha_pago day"),
+    db: Database = Depends(get_read_db)
 ):
-    query = db.query(Pago).join(PaymentSchedule).filter(
-        PaymentSchedule.credito_id == credito_id
-    )
-    
-    if estado:
-        query = query.filter(PaymentSchedule.estado == estado.value)
-    
-    pagos = query.order_by(Pago.fecha_pago.desc()).all()
+    _check_range(desde, hasta)
+    
+    def _get_credito_payments(session: Session):
+        pagos = session.execute(pagos_history(
+            credito_id=credito_id,
+            desde=desde,
+            hasta=hasta,
+            estado=estado.value if estado else None
+        )).all()
+        
+        return [PagoResponse.model_validate(p) for p in pagos]
     
-    return pagos
+    return await db.run(_get_credito_payments)
 
 
 @router.get("/analytics/summary", response_model=dict)
 async def get_payments_summary(
     credito_id: Optional[int] = Query(None, description="Filter by credit ID"),
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_read_db)
 ):
-    from sqlalchemy import func, case
-    
-    query = db.query(
-        func.count(Pago.pago_id).label('total_payments'),
-        func.sum(Pago.monto).label('total_amount'),
-        func.avg(Pago.monto).label('average_amount'),
-        func.count(case((Pago.medio == 'app', 1))).label('app_payments'),
-        func.count(case((Pago.medio == 'efectivo', 1))).label('cash_payments'),
-        func.count(case((Pago.medio == 'link', 1))).label('link_payments')
-    ).join(PaymentSchedule)
-    
-    if credito_id:
-        query = query.filter(PaymentSchedule.credito_id == credito_id)
+    """
+    Payment totals per medio. Portfolio-wide totals come from the daily
+    rollup; a single credit's from its own pagos, archived months included.
+    """
+    from sqlalchemy import func
+    
+    def _get_stats(session: Session):
+        if not credito_id:
+            return PaymentRollupService(session).totals()
+        
+        history = pagos_history(credito_id=credito_id).order_by(None).subquery()
+        rows = session.query(
+            history.c.medio, func.count(history.c.pago_id), func.sum(history.c.monto)
+        ).group_by(history.c.medio).all()
+        
+        return {medio: (pagos, monto) for medio, pagos, monto in rows}
     
-    stats = query.first()
+    stats = await db.run(_get_stats)
+    total_payments = sum(pagos for pagos, _ in stats.values())
+    total_amount = sum(monto for _, monto in stats.values())
     
     return {
-        "total_payments": stats.total_payments or 0,
-        "total_amount": float(stats.total_amount or 0),
-        "average_amount": float(stats.average_amount or 0),
+        "total_payments": total_payments,
+        "total_amount": float(total_amount),
+        "average_amount": float(total_amount / total_payments) if total_payments else 0.0,
         "payment_methods": {
-            "app": stats.app_payments or 0,
-            "efectivo": stats.cash_payments or 0,
-            "link": stats.link_payments or 0
+            medio.value: stats.get(medio.value, (0, 0))[0] for medio in MedioPagoEnum
         }
     }
 
 
-@router.get("/overdue", response_model=List[PaymentScheduleResponse])
-async def get_overdue_payments(
-    days_overdue: int = Query(0, ge=0, description="Minimum days overdue"),
-    db: Session = Depends(get_db)
+@router.get("/analytics/series", response_model=List[PaymentSeriesPoint])
+async def get_payments_series(
+    desde: Optional[date] = Query(None, description="First fecha_pago day (default: 30 days before hasta)"),
+    hasta: Optional[date] = Query(None, description="Last fecha_pago day (default: today)"),
+    periodo: PeriodoEnum = Query(PeriodoEnum.DIA, description="Bucket per day or ISO week"),
+    group_by: List[PaymentGroupEnum] = Query([], description="Split by medio, producto and/or ciudad"),
+    medio: Optional[MedioPagoEnum] = Query(None),
+    producto: Optional[ProductoEnum] = Query(None),
+    ciudad: Optional[str] = Query(None, description="Filter by client city"),
+    db: Database = Depends(get_read_db)
 ):
-    from datetime import date, timedelta
-    
-    cutoff_date = date.today() - timedelta(days=days_overdue)
-    
-    overdue_schedules = db.query(PaymentSchedule).filter(
-        PaymentSchedule.estado.in_(['vencida', 'parcial']),
-        PaymentSchedule.fecha_vencimiento <= cutoff_date
-    ).order_by(PaymentSchedule.fecha_vencimiento).all()
-    
-    payment_service = PaymentService(db)
-    result = []
-    
-    for schedule in overdue_schedules:
-        payments = db.query(Pago).filter(
-            Pago.schedule_id == schedule.schedule_id
-        ).all()
-        
-        monto_pagado = sum(p.monto for p in payments) if payments else Decimal('0.00')
-        saldo_pendiente = schedule.valor_cuota - monto_pagado
-        dias_vencimiento = (date.today() - schedule.fecha_vencimiento).days
-        
-        schedule_response = PaymentScheduleResponse(
-            schedule_id=schedule.schedule_id,
-            credito_id=schedule.credito_id,
-            num_cuota=schedule.num_cuota,
-            fecha_vencimiento=schedule.fecha_vencimiento,
-            valor_cuota=schedule.valor_cuota,
-            estado=schedule.estado,
-            monto_pagado=monto_pagado,
-            saldo_pendiente=saldo_pendiente,
-            dias_vencimiento=dias_vencimiento,
-            pagos=[PagoResponse.model_validate(p) for p in payments]
-        )
-        
-        result.append(schedule_response)
-    
-    return result
+    """
+    Collections per day or week over any date range, read only from the
+    daily rollup, so the cost follows the range and not the pagos volume.
+    """
+    
+    hasta = hasta or date.today()
+    desde = desde or hasta - timedelta(days=29)
+    
+    _check_range(desde, hasta)
+    
+    points = await db.run(lambda session: PaymentRollupService(session).series(
+        desde=desde,
+        hasta=hasta,
+        periodo=periodo.value,
+        group_by=[group.value for group in group_by],
+        medio=medio.value if medio else None,
+        producto=producto.value if producto else None,
+        ciudad=ciudad
+    ))
+    
+    return FastJSONResponse(points)
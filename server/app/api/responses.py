@@ -0,0 +1,37 @@
+from typing import Any, Dict, Optional
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded in one pass by pydantic-core.
+    
+    For handlers that already build their payload as plain dicts/lists
+    shaped like the route's ``response_model``: returning a Response skips
+    FastAPI's response validation and ``jsonable_encoder``. Values are
+    encoded as pydantic encodes them in JSON mode (Decimal as string,
+    ISO dates and datetimes, enums by value), so the output is the same.
+    """
+    
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+def select_fields(value: Any, tree: Optional[Dict[str, Any]]) -> Any:
+    """
+    Project a plain document onto a ``field_selection`` tree. Lists are
+    projected item by item; a ``None`` subtree keeps the whole value.
+    """
+    
+    if tree is None:
+        return value
+    
+    if isinstance(value, list):
+        return [select_fields(item, tree) for item in value]
+    
+    if isinstance(value, dict):
+        return {key: select_fields(item, tree[key]) for key, item in value.items() if key in tree}
+    
+    return value
+
@@ -0,0 +1,284 @@
+"""
+Roda API - comandos de mantenimiento
+
+    python -m app.cli reconcile-ledger [--repair]
+    python -m app.cli simulate-schedules [--tea 0.30 | --tea-shift 0.02] [--producto e-bike]
+    python -m app.cli regenerate-schedules [--only-missing] [--producto e-bike]
+    python -m app.cli age-cuotas [--full] [--as-of 2024-06-30]
+    python -m app.cli refresh-portfolio [--rebuild] [--snapshot 2024-05-31]
+    python -m app.cli rebuild-worklist
+    python -m app.cli refresh-payment-rollup [--rebuild]
+    python -m app.cli ensure-partitions [--since 2023-01-01] [--months-ahead 3]
+    python -m app.cli archive-pagos [--before 2024-01-01] [--out-dir archive] [--dry-run]
+"""
+import argparse
+import sys
+import time
+from datetime import date
+from decimal import Decimal
+
+from app.core.database import SessionLocal
+from app.services.ledger_service import LedgerService
+from app.services.amortization_service import AmortizationService
+from app.services.aging_service import run_aging
+from app.services.cobranza_service import CobranzaService
+from app.services.partition_service import PartitionService
+from app.services.payment_rollup_service import PaymentRollupService
+from app.services.portfolio_service import PortfolioService
+
+
+def reconcile_ledger(args: argparse.Namespace) -> int:
+    db = SessionLocal()
+    try:
+        report = LedgerService(db).reconcile(repair=args.repair)
+    finally:
+        db.close()
+    
+    print(f"Cuotas with drift: {len(report.schedule_drift)}")
+    for row in report.schedule_drift[:args.limit]:
+        print(f"  schedule {row['schedule_id']} (credito {row['credito_id']}): "
+              f"monto_pagado {row['stored_monto_pagado']} -> {row['monto_pagado']}, "
+              f"saldo_pendiente {row['stored_saldo_pendiente']} -> {row['saldo_pendiente']}, "
+              f"estado {row['stored_estado']} -> {row['estado']}")
+    
+    print(f"Creditos with drift: {len(report.credit_drift)}")
+    for row in report.credit_drift[:args.limit]:
+        changes = [
+            f"{name} {row['stored_' + name]} -> {row[name]}"
+            for name in (
+                'monto_pagado', 'saldo_pendiente', 'cuotas_pendientes',
+                'cuotas_parciales', 'cuotas_pagadas', 'cuotas_vencidas',
+                'fecha_primera_impaga'
+            )
+            if row['stored_' + name] != row[name]
+        ]
+        print(f"  credito {row['credito_id']}: {', '.join(changes)}")
+    
+    if report.consistent:
+        print("Ledger is consistent with core.pagos")
+        return 0
+    
+    if report.repaired:
+        print("Ledger repaired")
+        return 0
+    
+    print("Run with --repair to fix the drift")
+    return 1
+
+
+def simulate_schedules(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        result = AmortizationService(db).simulate(
+            tea=args.tea,
+            tea_shift=args.tea_shift,
+            producto=args.producto
+        )
+    finally:
+        db.close()
+    
+    print(f"Creditos: {result.creditos} ({result.cuotas} cuotas)")
+    print(f"Inversion: {result.inversion}")
+    print(f"Scheduled cuotas: {result.total_actual}")
+    print(f"Simulated cuotas: {result.total_simulado} "
+          f"(interes {result.interes_simulado}, diff {result.total_simulado - result.total_actual})")
+    for producto, total in sorted(result.by_producto.items()):
+        print(f"  {producto}: {total}")
+    print(f"Done in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def regenerate_schedules(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        rewritten = AmortizationService(db).regenerate(
+            producto=args.producto,
+            only_missing=args.only_missing,
+            chunk_size=args.chunk_size
+        )
+    finally:
+        db.close()
+    
+    print(f"Schedules regenerated: {rewritten} creditos in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def age_cuotas(args: argparse.Namespace) -> int:
+    report = run_aging(today=args.as_of, full=args.full)
+    print(report)
+    return 1 if report.skipped else 0
+
+
+def refresh_portfolio(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        portfolio = PortfolioService(db)
+        
+        if args.rebuild:
+            portfolio.rebuild()
+            print("Portfolio rollup rebuilt from creditos")
+        else:
+            print(f"Portfolio deltas compacted: {portfolio.compact()}")
+        
+        if args.snapshot:
+            taken = portfolio.snapshot(args.snapshot)
+            if taken is None:
+                print("Snapshot skipped: another run holds the lock")
+                return 1
+            print(f"Month-end snapshot {args.snapshot}: {taken} creditos")
+    finally:
+        db.close()
+    
+    print(f"Done in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def rebuild_worklist(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        changed = CobranzaService(db).rebuild()
+    finally:
+        db.close()
+    
+    print(f"Collections worklist rebuilt: {changed} rows changed in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def refresh_payment_rollup(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        rollup = PaymentRollupService(db)
+        
+        if args.rebuild:
+            rollup.rebuild()
+            print("Payment rollup rebuilt from pagos")
+        else:
+            print(f"Payment rollup deltas compacted: {rollup.compact()}")
+    finally:
+        db.close()
+    
+    print(f"Done in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def ensure_partitions(args: argparse.Namespace) -> int:
+    db = SessionLocal()
+    try:
+        created = PartitionService(db).ensure(desde=args.since, months_ahead=args.months_ahead)
+    finally:
+        db.close()
+    
+    print(f"Pagos partitions created: {created}")
+    return 0
+
+
+def archive_pagos(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        partitions = PartitionService(db)
+        
+        if args.dry_run:
+            months = partitions.archivable(before=args.before)
+        else:
+            months = partitions.archive(out_dir=args.out_dir, before=args.before)
+    finally:
+        db.close()
+    
+    for month in months:
+        status = "archivable" if args.dry_run else f"archived to {month['archivo']}"
+        print(f"  {month['particion']}: {month['pagos']} pagos, {month['monto']} ({status})")
+    
+    print(f"{'Archivable' if args.dry_run else 'Archived'} months: {len(months)} "
+          f"in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Roda API maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    reconcile = subparsers.add_parser(
+        "reconcile-ledger",
+        help="Verify cuota/credit balances against core.pagos"
+    )
+    reconcile.add_argument("--repair", action="store_true", help="Rewrite drifted rows")
+    reconcile.add_argument("--limit", type=int, default=20, help="Drifted rows to print")
+    reconcile.set_defaults(func=reconcile_ledger)
+    
+    simulate = subparsers.add_parser(
+        "simulate-schedules",
+        help="Re-price the vigente portfolio without writing"
+    )
+    rate = simulate.add_mutually_exclusive_group()
+    rate.add_argument("--tea", type=Decimal, help="Price every credit at this TEA")
+    rate.add_argument("--tea-shift", type=Decimal, default=Decimal("0"), help="Add this to each credit's TEA")
+    simulate.add_argument("--producto", help="Only this producto")
+    simulate.set_defaults(func=simulate_schedules)
+    
+    regenerate = subparsers.add_parser(
+        "regenerate-schedules",
+        help="Rebuild the cuotas of vigente credits without payments"
+    )
+    regenerate.add_argument("--only-missing", action="store_true", help="Only credits with no cuotas")
+    regenerate.add_argument("--producto", help="Only this producto")
+    regenerate.add_argument("--chunk-size", type=int, default=5000, help="Credits per transaction")
+    regenerate.set_defaults(func=regenerate_schedules)
+    
+    aging = subparsers.add_parser(
+        "age-cuotas",
+        help="Mark due unpaid cuotas as vencida"
+    )
+    aging.add_argument("--full", action="store_true", help="Ignore the watermark and scan every due cuota")
+    aging.add_argument("--as-of", type=date.fromisoformat, help="Age as if today were this date")
+    aging.set_defaults(func=age_cuotas)
+    
+    portfolio = subparsers.add_parser(
+        "refresh-portfolio",
+        help="Compact or rebuild the aging-bucket rollup and take month-end snapshots"
+    )
+    portfolio.add_argument("--rebuild", action="store_true", help="Recompute the rollup from creditos")
+    portfolio.add_argument("--snapshot", type=date.fromisoformat, help="Take (or retake) the snapshot for this month-end")
+    portfolio.set_defaults(func=refresh_portfolio)
+    
+    worklist = subparsers.add_parser(
+        "rebuild-worklist",
+        help="Recompute the collections worklist from creditos"
+    )
+    worklist.set_defaults(func=rebuild_worklist)
+    
+    payment_rollup = subparsers.add_parser(
+        "refresh-payment-rollup",
+        help="Compact or rebuild the daily collections rollup"
+    )
+    payment_rollup.add_argument("--rebuild", action="store_true", help="Recompute the rollup from pagos")
+    payment_rollup.set_defaults(func=refresh_payment_rollup)
+    
+    ensure = subparsers.add_parser(
+        "ensure-partitions",
+        help="Create the monthly core.pagos partitions ahead of time"
+    )
+    ensure.add_argument("--since", type=date.fromisoformat, help="Also create the months from this day on")
+    ensure.add_argument("--months-ahead", type=int, help="Months past the current one (default PAGOS_PARTITIONS_AHEAD)")
+    ensure.set_defaults(func=ensure_partitions)
+    
+    archive = subparsers.add_parser(
+        "archive-pagos",
+        help="Move pagos months past the retention window to core.pagos_archivo and export them"
+    )
+    archive.add_argument("--before", type=date.fromisoformat, help="Only months ending by this day (default PAGOS_ARCHIVE_AFTER_MONTHS ago)")
+    archive.add_argument("--out-dir", help="Directory for the .csv.gz files (default PAGOS_ARCHIVE_DIR)")
+    archive.add_argument("--dry-run", action="store_true", help="List the months without archiving")
+    archive.set_defaults(func=archive_pagos)
+    
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
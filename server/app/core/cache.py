@@ -0,0 +1,301 @@
+import logging
+import select
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+from .config import settings
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("expires_at", "day", "views")
+    
+    def __init__(self, expires_at: float, day: date):
+        self.expires_at = expires_at
+        self.day = day
+        self.views: Dict[str, Any] = {}
+
+
+class CreditCache:
+    """
+    Bounded LRU + TTL cache of per-credit read views (schedule, summary, ...).
+    
+    Each key (a credito_id) holds a small dict of views so that one
+    ``invalidate`` drops everything derived from that credit. Entries also
+    expire when the calendar day changes, because views such as
+    ``dias_vencimiento`` are computed from ``date.today()``.
+    
+    Loads race with writes, so ``load`` only stores a value when no
+    invalidation for that key happened while the loader was running. Each
+    view has its own pending token, so loads of different views of one key
+    do not discard each other; stores that are discarded are counted as
+    ``dropped``.
+    
+    A loader reading from a replica may see data from before a write that
+    already invalidated the key. With ``replica=True`` the value is still
+    returned but only stored when the key was last invalidated more than
+    ``replica_staleness_seconds`` before the load started.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        enabled: bool = True,
+        replica_staleness_seconds: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+        today: Callable[[], date] = date.today
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.replica_staleness_seconds = replica_staleness_seconds
+        self._clock = clock
+        self._today = today
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._pending: Dict[Hashable, Dict[str, object]] = {}
+        self._invalidated_at: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._cleared_at = float("-inf")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.dropped = 0
+    
+    def load(self, key: Hashable, view: str, loader: Callable[[], T], replica: bool = False) -> T:
+        if not self.enabled:
+            return loader()
+        
+        with self._lock:
+            started = self._clock()
+            entry = self._live_entry(key)
+            if entry is not None and view in entry.views:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.views[view]
+            
+            self.misses += 1
+            token = self._pending.setdefault(key, {}).setdefault(view, object())
+        
+        try:
+            value = loader()
+        except BaseException:
+            with self._lock:
+                self._release(key, view, token)
+            raise
+        
+        if replica and self._recently_invalidated(key, started):
+            with self._lock:
+                self._release(key, view, token)
+                self.dropped += 1
+            return value
+        
+        self._store(key, view, value, token)
+        
+        return value
+    
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+            
+            if self.replica_staleness_seconds > 0:
+                now = self._clock()
+                self._invalidated_at[key] = now
+                self._invalidated_at.move_to_end(key)
+                
+                # Oldest first: drop marks that no longer matter
+                horizon = now - self.replica_staleness_seconds
+                while self._invalidated_at:
+                    oldest_key, at = next(iter(self._invalidated_at.items()))
+                    if at > horizon:
+                        break
+                    del self._invalidated_at[oldest_key]
+    
+    def invalidate_many(self, keys) -> None:
+        for key in keys:
+            self.invalidate(key)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._invalidated_at.clear()
+            self._cleared_at = self._clock()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "dropped": self.dropped,
+            }
+    
+    def _recently_invalidated(self, key: Hashable, started: float) -> bool:
+        horizon = started - self.replica_staleness_seconds
+        
+        with self._lock:
+            return max(self._invalidated_at.get(key, float("-inf")), self._cleared_at) > horizon
+    
+    def _live_entry(self, key: Hashable) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        if entry.expires_at <= self._clock() or entry.day != self._today():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        
+        return entry
+    
+    def _release(self, key: Hashable, view: str, token: object) -> bool:
+        """Drop ``view``'s pending token; False when an invalidation (or another load) already took it."""
+        
+        views = self._pending.get(key)
+        if views is None or views.get(view) is not token:
+            return False
+        
+        del views[view]
+        if not views:
+            del self._pending[key]
+        
+        return True
+    
+    def _store(self, key: Hashable, view: str, value: Any, token: object) -> None:
+        with self._lock:
+            if not self._release(key, view, token):
+                self.dropped += 1
+                return
+            
+            if value is None:
+                return
+            
+            entry = self._live_entry(key)
+            if entry is None:
+                entry = _Entry(self._clock() + self.ttl_seconds, self._today())
+                self._entries[key] = entry
+            
+            entry.views[view] = value
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._pending.pop(evicted, None)
+                self.evictions += 1
+
+
+class CacheInvalidationListener:
+    """
+    Applies the invalidations other processes publish on the ``credit_cache``
+    channel (sql/11_cache_creditos.sql), so writes made by the CLI, the
+    aging job or another API worker do not wait for the TTL.
+    
+    LISTENs on a dedicated connection detached from ``bind``'s pool, in a
+    daemon thread. Notifications sent while it is not connected are lost,
+    so the cache is cleared every time it (re)connects.
+    """
+    
+    def __init__(
+        self,
+        cache: CreditCache,
+        bind,
+        channel: str = "credit_cache",
+        idle_check_seconds: float = 30.0,
+        retry_seconds: float = 5.0
+    ):
+        self.cache = cache
+        self.bind = bind
+        self.channel = channel
+        self.idle_check_seconds = idle_check_seconds
+        self.retry_seconds = retry_seconds
+        self.listening = False
+        self.notifications = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="credit-cache-listener", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+    
+    def apply(self, payload: str) -> None:
+        self.notifications += 1
+        
+        if payload == "*":
+            self.cache.clear()
+        else:
+            self.cache.invalidate_many(int(key) for key in payload.split(","))
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"listening": self.listening, "notifications": self.notifications}
+    
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.warning("Cache invalidation listener disconnected", exc_info=True)
+            
+            self.listening = False
+            self._stop.wait(self.retry_seconds)
+    
+    def _listen(self) -> None:
+        connection = self.bind.raw_connection()
+        connection.detach()
+        
+        try:
+            dbapi = connection.dbapi_connection
+            dbapi.autocommit = True
+            cursor = dbapi.cursor()
+            cursor.execute(f"LISTEN {self.channel}")
+            
+            self.cache.clear()
+            self.listening = True
+            active = time.monotonic()
+            
+            # Short waits so stop() is noticed within a second
+            while not self._stop.is_set():
+                if select.select([dbapi], [], [], 1.0)[0]:
+                    dbapi.poll()
+                    active = time.monotonic()
+                elif time.monotonic() - active >= self.idle_check_seconds:
+                    # Idle: a round trip surfaces a dropped connection
+                    cursor.execute("SELECT 1")
+                    active = time.monotonic()
+                
+                while dbapi.notifies:
+                    self.apply(dbapi.notifies.pop(0).payload)
+        finally:
+            connection.close()
+
+
+credit_cache = CreditCache(
+    max_entries=settings.cache_max_entries,
+    ttl_seconds=settings.cache_ttl_seconds,
+    enabled=settings.cache_enabled,
+    replica_staleness_seconds=settings.replica_staleness_seconds if settings.replica_database_url else 0.0
+)
@@ -1,23 +1,293 @@
-from sqlalchemy import create_engine
+import threading
+from abc import ABC, abstractmethod
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Sequence, TypeVar
+from uuid import uuid4
+from sqlalchemy import Executable, Row, create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from starlette.concurrency import run_in_threadpool
 from .config import settings
 
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    echo=False
-)
+T = TypeVar("T")
+
+
+class CheckoutStats:
+    """Checkouts of a pool and how long they waited (queueing, connecting and pre-ping)."""
+    
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._lock = threading.Lock()
+    
+    def record(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+    
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_total": round(self.wait_seconds * 1000, 3),
+                "wait_ms_mean": round(self.wait_seconds * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.max_wait_seconds * 1000, 3),
+            }
+
+
+class _TimedCheckout:
+    """Pool mixin that times every ``connect()``."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+    
+    def recreate(self):
+        # Keep the counters when the pool is rebuilt (dispose, invalidation)
+        pool = super().recreate()
+        pool.checkout_stats = self.checkout_stats
+        return pool
+    
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.checkout_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.checkout_stats.record(time.perf_counter() - started)
+        return connection
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+class TimedNullPool(_TimedCheckout, NullPool):
+    pass
+
+
+def engine_options(is_async: bool = False, read_only: bool = False) -> Dict[str, Any]:
+    """
+    ``create_engine`` keyword arguments from the DB_* settings.
+    
+    ``DB_POOL_MODE=null`` opens a connection per checkout, for running behind
+    PgBouncer in transaction mode; ``DB_PGBOUNCER`` also turns off asyncpg's
+    prepared statement caches (statements get unique names) and the startup
+    parameters (``statement_timeout``, read-only transactions), which
+    PgBouncer rejects.
+    """
+    
+    options: Dict[str, Any] = {"pool_pre_ping": settings.db_pool_pre_ping, "echo": False}
+    connect_args: Dict[str, Any] = {}
+    startup: Dict[str, str] = {}
+    
+    if settings.db_statement_timeout_ms:
+        startup["statement_timeout"] = str(settings.db_statement_timeout_ms)
+    if read_only:
+        # A real standby refuses writes anyway; this also holds for a plain second database
+        startup["default_transaction_read_only"] = "on"
+    
+    if settings.db_pool_mode == "null":
+        options["poolclass"] = TimedNullPool
+    else:
+        options.update(
+            poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+    
+    if settings.db_pgbouncer:
+        if is_async:
+            connect_args.update(
+                statement_cache_size=0,
+                prepared_statement_cache_size=0,
+                prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+            )
+    elif startup:
+        if is_async:
+            connect_args["server_settings"] = startup
+        else:
+            connect_args["options"] = " ".join(f"-c {name}={value}" for name, value in startup.items())
+    
+    if connect_args:
+        options["connect_args"] = connect_args
+    
+    return options
+
+
+def pool_stats(bind) -> Dict[str, Any]:
+    """Live state of an engine's pool: occupancy (queue pools) and checkout waits."""
+    
+    pool = bind.pool
+    stats: Dict[str, Any] = {"pool": type(pool).__name__}
+    
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    
+    if isinstance(pool, _TimedCheckout):
+        stats.update(pool.checkout_stats.as_dict())
+    
+    return stats
+
+
+engine = create_engine(settings.database_url, **engine_options())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+
+if settings.db_mode == "async":
+    async_engine = create_async_engine(settings.resolved_async_database_url, **engine_options(is_async=True))
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
+# Optional read replica. Sessions on it carry ``info["replica"]`` so services
+# know their reads may lag the primary (see CreditCache.load).
+replica_engine = None
+ReplicaSessionLocal = None
+async_replica_engine = None
+AsyncReplicaSessionLocal = None
+
+if settings.replica_database_url:
+    replica_engine = create_engine(settings.replica_database_url, **engine_options(read_only=True))
+    ReplicaSessionLocal = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=replica_engine,
+        info={"replica": True}
+    )
+    
+    if settings.db_mode == "async":
+        async_replica_engine = create_async_engine(
+            settings.resolved_replica_async_database_url,
+            **engine_options(is_async=True, read_only=True)
+        )
+        AsyncReplicaSessionLocal = async_sessionmaker(
+            async_replica_engine,
+            autoflush=False,
+            expire_on_commit=False,
+            info={"replica": True}
+        )
+
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+class Database(ABC):
+    """
+    Request-scoped database handle used by the routers.
+    
+    ORM work is written as plain synchronous functions taking a ``Session``
+    and handed to ``run``; the handle decides how to execute them without
+    blocking the event loop. Functions must return fully loaded data
+    (schemas, dicts, scalars), never ORM objects with pending lazy loads.
+    
+    ``stream`` runs a Core statement on a server-side cursor and yields its
+    rows in chunks, for exports that must not load the result into memory.
+    It uses its own connection, so it can outlive the request session
+    while a ``StreamingResponse`` drains it.
+    """
+    
+    mode: str
+    
+    @abstractmethod
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``fn(session, *args, **kwargs)`` and return its result."""
+    
+    @abstractmethod
+    def stream(self, statement: Executable, chunk_size: int = 1000) -> AsyncIterator[Sequence[Row]]:
+        """Yield the rows of ``statement`` in chunks of ``chunk_size``."""
+
+
+class AsyncDatabase(Database):
+    """Runs ORM work on an ``AsyncSession`` (asyncpg) via ``run_sync``."""
+    
+    mode = "async"
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self.session.run_sync(fn, *args, **kwargs)
+    
+    async def stream(self, statement: Executable, chunk_size: int = 1000) -> AsyncIterator[Sequence[Row]]:
+        async with self.session.bind.connect() as conn:
+            result = await conn.stream(statement.execution_options(yield_per=chunk_size))
+            async for rows in result.partitions(chunk_size):
+                yield rows
+
+
+class ThreadpoolDatabase(Database):
+    """Fallback that runs ORM work on a sync ``Session`` in the threadpool."""
+    
+    mode = "threadpool"
+    
+    def __init__(self, session: Session):
+        self.session = session
+    
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+    
+    async def stream(self, statement: Executable, chunk_size: int = 1000) -> AsyncIterator[Sequence[Row]]:
+        conn = await run_in_threadpool(self.session.bind.connect)
+        try:
+            result = await run_in_threadpool(conn.execute, statement.execution_options(yield_per=chunk_size))
+            partitions = result.partitions(chunk_size)
+            
+            while True:
+                rows = await run_in_threadpool(next, partitions, None)
+                if rows is None:
+                    break
+                yield rows
+        finally:
+            await run_in_threadpool(conn.close)
+
+
+@asynccontextmanager
+async def open_database(replica: bool = False) -> AsyncIterator[Database]:
+    """A ``Database`` on the primary, or on the read replica when ``replica`` is set and configured."""
+    
+    async_factory, sync_factory = AsyncSessionLocal, SessionLocal
+    if replica and ReplicaSessionLocal is not None:
+        async_factory, sync_factory = AsyncReplicaSessionLocal, ReplicaSessionLocal
+    
+    if async_factory is not None:
+        async with async_factory() as session:
+            yield AsyncDatabase(session)
+    else:
+        db = sync_factory()
+        try:
+            yield ThreadpoolDatabase(db)
+        finally:
+            await run_in_threadpool(db.close)
+
+
+async def get_db() -> AsyncGenerator[Database, None]:
+    async with open_database() as db:
         yield db
-    finally:
-        db.close()
+
@@ -0,0 +1,211 @@
+"""
+In-process request and database metrics, exposed in Prometheus text format.
+
+``MetricsMiddleware`` (pure ASGI) times every HTTP request and labels it
+with the matched route template. While a request runs, a ``RequestStats``
+object is published in a ContextVar; engine events on the sync engine
+(and the async engine's sync core) add each SQL statement and its
+duration to it. The ContextVar is copied into the threadpool and into
+``run_sync`` greenlets, so both database modes are counted. Statements
+run outside a request (background jobs) are not counted.
+
+Metrics are per process; with several workers, scrape each one.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds")
+    
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+class Counter:
+    kind = "counter"
+    
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values: Dict[Labels, float] = {}
+    
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+    
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        return [(self.name, labels, value) for labels, value in self.values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class Histogram:
+    """Bucket counts are stored per bucket and made cumulative only when rendered."""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, help: str, buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.values: Dict[Labels, list] = {}
+    
+    def observe(self, labels: Labels, value: float) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+    
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        samples = []
+        
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                samples.append((f"{self.name}_bucket", labels + (("le", le),), cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        
+        return samples
+
+
+class Registry:
+    
+    def __init__(self):
+        self.metrics = []
+    
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        lines = []
+        
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by method, route template and status code"
+))
+requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+))
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", LATENCY_BUCKETS
+))
+request_db_statements = registry.register(Histogram(
+    "http_request_db_statements", "SQL statements executed per request by route", STATEMENT_BUCKETS
+))
+request_db_duration = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request by route", LATENCY_BUCKETS
+))
+
+
+class MetricsMiddleware:
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        requests_in_flight.inc(amount=1)
+        started = time.perf_counter()
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            requests_in_flight.inc(amount=-1)
+            _request_stats.reset(token)
+            
+            route = scope.get("route")
+            route_labels = (("method", scope["method"]), ("route", route.path if route else "unmatched"))
+            
+            requests_total.inc(route_labels + (("status", str(status)),))
+            request_duration.observe(route_labels, elapsed)
+            request_db_statements.observe(route_labels, stats.statements)
+            request_db_duration.observe(route_labels, stats.db_seconds)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _request_stats.get() is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    started = getattr(context, "_metrics_started", None)
+    
+    if stats is not None and started is not None:
+        stats.statements += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count statements and DB time of ``engine`` into the current request's stats."""
+    
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    
+    escaped = (
+        f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,192 @@
+"""
+Opt-in SQL profiler (``QUERY_PROFILER=true``).
+
+Every statement executed through an instrumented engine is reduced to a
+fingerprint (literals and bind parameters replaced, IN/VALUES lists
+collapsed) and timed. Per fingerprint it keeps the count, total and max
+time and the last ``SAMPLE_SIZE`` durations, from which p50/p99 are read.
+
+Read-only statements slower than ``SLOW_QUERY_MS`` get their plan
+captured with EXPLAIN (ANALYZE, BUFFERS) on the same connection, inside a
+savepoint, at most once per fingerprint every ``EXPLAIN_INTERVAL_SECONDS``.
+A SELECT/WITH that writes anywhere (a data-modifying CTE such as
+``WITH upd AS (UPDATE ...)``) only gets a plain EXPLAIN: ANALYZE would run
+its writes a second time.
+"""
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .config import settings
+
+SAMPLE_SIZE = 512
+MAX_FINGERPRINTS = 1000
+EXPLAIN_INTERVAL_SECONDS = 60.0
+OTHER = "<other>"
+
+_NORMALIZERS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),                    # string literals
+    (re.compile(r"%\(\w+\)s|%s|\$\d+|:\w+|\?"), "?"),        # bind parameters
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),                 # numeric literals
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),    # IN (?, ?, ...)
+    (re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+"), "(...)"),  # VALUES (...), (...)
+    (re.compile(r"\s+"), " "),
+]
+
+_NOT_EXPLAINABLE = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE)\b|\bnextval\b|\bpg_\w*advisory", re.IGNORECASE)
+_WRITES = re.compile(r"\b(?:INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+
+def fingerprint(statement: str) -> str:
+    for pattern, replacement in _NORMALIZERS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+class QueryStats:
+    __slots__ = ("count", "total", "max", "samples", "statement", "plan", "plan_ms", "plan_at")
+    
+    def __init__(self, statement: str):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+        self.statement = statement
+        self.plan: Optional[str] = None
+        self.plan_ms: Optional[float] = None
+        self.plan_at = 0.0
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class QueryProfiler:
+    
+    def __init__(self, slow_ms: float = 100.0, explain_analyze: bool = True):
+        self.slow_ms = slow_ms
+        self.explain_analyze = explain_analyze
+        self.started_at = time.time()
+        self._stats: Dict[str, QueryStats] = {}
+        self._lock = threading.Lock()
+    
+    def instrument(self, engine: Engine) -> None:
+        if not event.contains(engine, "before_cursor_execute", self._before):
+            event.listen(engine, "before_cursor_execute", self._before)
+            event.listen(engine, "after_cursor_execute", self._after)
+    
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self.started_at = time.time()
+    
+    def report(self, order_by: str = "total", limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            snapshot = [
+                (key, stats.count, stats.total, stats.max, sorted(stats.samples),
+                 stats.statement, stats.plan, stats.plan_ms, stats.plan_at)
+                for key, stats in self._stats.items()
+            ]
+        
+        rows = []
+        for key, count, total, maximum, ordered, statement, plan, plan_ms, plan_at in snapshot:
+            rows.append({
+                "fingerprint": key,
+                "count": count,
+                "total_ms": round(total, 3),
+                "mean_ms": round(total / count, 3) if count else 0.0,
+                "p50_ms": round(percentile(ordered, 0.50), 3),
+                "p99_ms": round(percentile(ordered, 0.99), 3),
+                "max_ms": round(maximum, 3),
+                "example": statement,
+                "plan": plan,
+                "plan_ms": plan_ms,
+                "plan_captured_at": plan_at or None,
+            })
+        
+        key = {"total": "total_ms", "p99": "p99_ms", "count": "count", "mean": "mean_ms"}.get(order_by, "total_ms")
+        rows.sort(key=lambda row: row[key], reverse=True)
+        
+        return rows[:limit]
+    
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._profiler_started = time.perf_counter()
+    
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_profiler_started", None)
+        if started is None:
+            return
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        key = fingerprint(statement)
+        
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= MAX_FINGERPRINTS:
+                    key = OTHER
+                    stats = self._stats.get(OTHER)
+                if stats is None:
+                    stats = self._stats[key] = QueryStats(statement)
+            
+            stats.count += 1
+            stats.total += elapsed_ms
+            stats.max = max(stats.max, elapsed_ms)
+            stats.samples.append(elapsed_ms)
+            
+            explain = (
+                elapsed_ms >= self.slow_ms
+                and key != OTHER
+                and time.time() - stats.plan_at >= EXPLAIN_INTERVAL_SECONDS
+                and self._explainable(statement, context, executemany)
+            )
+            if explain:
+                stats.plan_at = time.time()
+        
+        if explain:
+            plan = self._explain(conn, statement, parameters)
+            with self._lock:
+                stats.statement = statement
+                stats.plan = plan
+                stats.plan_ms = round(elapsed_ms, 3)
+    
+    @staticmethod
+    def _explainable(statement: str, context, executemany: bool) -> bool:
+        head = statement.lstrip()[:6].upper()
+        
+        return (
+            not executemany
+            and (head.startswith("SELECT") or head.startswith("WITH"))
+            and not context.execution_options.get("stream_results")
+            and not context.execution_options.get("yield_per")
+            and _NOT_EXPLAINABLE.search(statement) is None
+        )
+    
+    def _explain(self, conn, statement: str, parameters) -> str:
+        analyze = self.explain_analyze and _WRITES.search(statement) is None
+        options = "ANALYZE, BUFFERS" if analyze else "COSTS"
+        cursor = conn.connection.dbapi_connection.cursor()
+        
+        try:
+            cursor.execute("SAVEPOINT query_profiler")
+            try:
+                cursor.execute(f"EXPLAIN ({options}) {statement}", parameters)
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+            finally:
+                cursor.execute("ROLLBACK TO SAVEPOINT query_profiler")
+                cursor.execute("RELEASE SAVEPOINT query_profiler")
+            return plan
+        except Exception as e:
+            return f"EXPLAIN failed: {e}"
+        finally:
+            cursor.close()
+
+
+profiler = QueryProfiler(
+    slow_ms=settings.slow_query_ms,
+    explain_analyze=settings.slow_query_explain_analyze
+)
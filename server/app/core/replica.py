@@ -0,0 +1,213 @@
+"""
+Read-replica routing.
+
+GET handlers take ``Depends(get_read_db)`` instead of ``get_db``. Their
+reads go to ``REPLICA_DATABASE_URL`` unless
+
+* no replica is configured,
+* the replica lags the primary by more than ``REPLICA_MAX_LAG_SECONDS``
+  or its lag cannot be measured (it is down), or
+* the client wrote recently: ``ReplicaRoutingMiddleware`` sets a
+  short-lived cookie on successful non-GET responses, and requests
+  carrying it read from the primary, so a client sees its own payment
+  right after posting it.
+
+Lag is measured on the replica itself at most once per
+``REPLICA_LAG_CHECK_SECONDS`` per process. Responses of routed reads carry
+``X-Read-Source: replica|primary``.
+"""
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, Callable, Dict, Optional
+from fastapi import Request
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from .config import settings
+from .database import Database, open_database, replica_engine
+from .metrics import Counter, registry
+
+PRIMARY_COOKIE = "roda_read_primary"
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Seconds the replica has not yet replayed. A standby that has replayed
+# everything it received is current even if the primary has been idle.
+LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+read_routing_total = registry.register(Counter(
+    "db_read_routing_total", "Routed reads by target (replica|primary) and reason"
+))
+
+
+class ReplicaMonitor:
+    """
+    Cached replication lag of the read replica.
+    
+    ``usable`` re-measures when the last measurement is older than
+    ``check_interval`` seconds. One caller measures at a time; concurrent
+    callers use the previous value, and until the first measurement the
+    replica is not used.
+    """
+    
+    def __init__(
+        self,
+        bind,
+        max_lag_seconds: float,
+        check_interval: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.bind = bind
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.lag_seconds: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+    
+    @property
+    def enabled(self) -> bool:
+        return self.bind is not None
+    
+    def due(self) -> bool:
+        return self.checked_at is None or self._clock() - self.checked_at >= self.check_interval
+    
+    def check(self) -> None:
+        if not self._lock.acquire(blocking=False):
+            return
+        
+        try:
+            with self.bind.connect() as conn:
+                self.lag_seconds = float(conn.execute(LAG_SQL).scalar())
+            self.error = None
+        except Exception as e:
+            self.lag_seconds = None
+            self.error = str(e).splitlines()[0]
+        finally:
+            self.checked_at = self._clock()
+            self._lock.release()
+    
+    async def usable(self) -> bool:
+        if not self.enabled:
+            return False
+        
+        if self.due():
+            await run_in_threadpool(self.check)
+        
+        return self.lag_seconds is not None and self.lag_seconds <= self.max_lag_seconds
+    
+    def stats(self) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        
+        return {
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+            "usable": self.lag_seconds is not None and self.lag_seconds <= self.max_lag_seconds,
+            "error": self.error,
+        }
+
+
+replica_monitor = ReplicaMonitor(
+    replica_engine,
+    max_lag_seconds=settings.replica_max_lag_seconds,
+    check_interval=settings.replica_lag_check_seconds
+)
+
+
+class _ReadSource:
+    __slots__ = ("value",)
+    
+    def __init__(self):
+        self.value: Optional[str] = None
+
+
+_read_source: ContextVar[Optional[_ReadSource]] = ContextVar("read_source", default=None)
+
+
+def pinned_to_primary(cookie: Optional[str], now: Optional[float] = None) -> bool:
+    """Whether a ``PRIMARY_COOKIE`` value (a unix expiry time) is still in force."""
+    
+    try:
+        return cookie is not None and float(cookie) > (time.time() if now is None else now)
+    except ValueError:
+        return False
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[Database, None]:
+    """``get_db`` for read-only handlers: the replica when it is safe to read from it."""
+    
+    if not replica_monitor.enabled:
+        reason = None
+    elif pinned_to_primary(request.cookies.get(PRIMARY_COOKIE)):
+        reason = "recent_write"
+    elif not await replica_monitor.usable():
+        reason = "lag" if replica_monitor.error is None else "unavailable"
+    else:
+        reason = "ok"
+    
+    replica = reason == "ok"
+    target = "replica" if replica else "primary"
+    
+    if reason is not None:
+        read_routing_total.inc((("target", target), ("reason", reason)))
+    
+    source = _read_source.get()
+    if source is not None:
+        source.value = target
+    
+    async with open_database(replica=replica) as db:
+        yield db
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Pure ASGI middleware that pins writers to the primary (``PRIMARY_COOKIE``
+    on successful non-GET responses) and reports where a routed read went.
+    Read-only POSTs (handlers on ``get_read_db``) do not pin.
+    """
+    
+    def __init__(self, app, pin_seconds: Optional[float] = None):
+        self.app = app
+        # A replica read can be up to max lag + one check interval behind
+        self.pin_seconds = math.ceil(settings.replica_staleness_seconds if pin_seconds is None else pin_seconds)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        source = _ReadSource()
+        token = _read_source.set(source)
+        writes = scope["method"] not in SAFE_METHODS
+        
+        async def send_with_routing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                
+                if source.value is not None:
+                    headers.append((b"x-read-source", source.value.encode()))
+                
+                if writes and source.value is None and message["status"] < 400:
+                    expires = int(time.time()) + self.pin_seconds
+                    headers.append((
+                        b"set-cookie",
+                        f"{PRIMARY_COOKIE}={expires}; Max-Age={self.pin_seconds}; Path=/; HttpOnly; SameSite=Lax".encode()
+                    ))
+                
+                message = {**message, "headers": headers}
+            
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_routing)
+        finally:
+            _read_source.reset(token)
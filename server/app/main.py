@@ -1,17 +1,42 @@
+import asyncio
+import logging
+import os
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 
-from app.api.endpoints import clientes, creditos, payments
+from app.api.endpoints import clientes, cobranza, creditos, debug, exports, payments
+from app.core.cache import CacheInvalidationListener, credit_cache
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, async_engine, replica_engine, async_replica_engine, Base, pool_stats
+from app.core.metrics import MetricsMiddleware, instrument_engine, registry
+from app.core.profiler import profiler
+from app.core.replica import ReplicaRoutingMiddleware, replica_monitor
+from app.services.aging_service import aging_loop
+
+
+# uvicorn only configures its own loggers; without a handler here the app's
+# INFO lines (aging runs, cache listener reconnects) never reach the console.
+app_logger = logging.getLogger("app")
+app_logger.setLevel(settings.log_level.upper())
+if not app_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(levelname)s:     %(name)s - %(message)s"))
+    app_logger.addHandler(handler)
+    app_logger.propagate = False
+
+cache_listener = None
+if credit_cache.enabled and settings.cache_listen and engine.dialect.name == "postgresql":
+    cache_listener = CacheInvalidationListener(credit_cache, engine)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Starting Roda API")
-    print(f"Database: {settings.database_url.split('@')[-1]}")
+    print(f"Database: {settings.database_url.split('@')[-1]} ({settings.db_mode})")
+    if settings.replica_database_url:
+        print(f"Read replica: {settings.replica_database_url.split('@')[-1]}")
     
     try:
         Base.metadata.create_all(bind=engine)
@@ -19,9 +44,26 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"Database connection issue: {e}")
     
+    if cache_listener is not None:
+        cache_listener.start()
+    
+    aging_task = None
+    if settings.aging_interval_seconds > 0:
+        aging_task = asyncio.create_task(aging_loop(settings.aging_interval_seconds))
+    
     yield
     
     print("Shutting down Roda API")
+    
+    if aging_task is not None:
+        aging_task.cancel()
+    
+    if cache_listener is not None:
+        cache_listener.stop()
+    
+    for bind in (async_engine, async_replica_engine):
+        if bind is not None:
+            await bind.dispose()
 
 
 app = FastAPI(
@@ -41,6 +83,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
+if replica_engine is not None:
+    app.add_middleware(ReplicaRoutingMiddleware)
+
+sync_engines = [engine, replica_engine] + [
+    bind.sync_engine for bind in (async_engine, async_replica_engine) if bind is not None
+]
+
+for bind in filter(None, sync_engines):
+    instrument_engine(bind)
+    if settings.query_profiler:
+        profiler.instrument(bind)
+
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -68,13 +124,38 @@ async def general_exception_handler(request, exc):
 
 @app.get("/health")
 async def health_check():
+    # Pools are per worker process; pid tells the workers apart
+    database = {
+        "pid": os.getpid(),
+        "sync": pool_stats(engine),
+        "async": pool_stats(async_engine) if async_engine is not None else None,
+        "replica": None
+    }
+    
+    if replica_engine is not None:
+        database["replica"] = {
+            **replica_monitor.stats(),
+            "sync": pool_stats(replica_engine),
+            "async": pool_stats(async_replica_engine) if async_replica_engine is not None else None
+        }
+    
     return {
         "status": "healthy",
         "service": "Roda API",
-        "version": settings.api_version
+        "version": settings.api_version,
+        "cache": {
+            **credit_cache.stats(),
+            "listener": cache_listener.stats() if cache_listener is not None else None
+        },
+        "database": database
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root():
     return {
@@ -107,6 +188,26 @@ app.include_router(
     responses={404: {"description": "Not found"}}
 )
 
+app.include_router(
+    cobranza.router,
+    prefix="/api/v1/cobranza",
+    tags=["Cobranza"],
+    responses={404: {"description": "Not found"}}
+)
+
+app.include_router(
+    exports.router,
+    prefix="/api/v1/exports",
+    tags=["Exportaciones"]
+)
+
+app.include_router(
+    debug.router,
+    prefix="/debug",
+    include_in_schema=False
+)
+
+
 
 if __name__ == "__main__":
     import uvicorn
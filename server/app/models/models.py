@@ -31,6 +31,17 @@ class Credito(Base):
     fecha_desembolso = Column(Date, nullable=False)
     fecha_inicio_pago = Column(Date, nullable=False)
     estado = Column(Text, nullable=False, default="vigente")
+    monto_pagado = Column(Numeric(12, 2), nullable=False, default=0, server_default="0")
+    saldo_pendiente = Column(
+        Numeric(12, 2),
+        nullable=False,
+        default=lambda ctx: ctx.get_current_parameters()["inversion"]
+    )
+    cuotas_pendientes = Column(Integer, nullable=False, default=0, server_default="0")
+    cuotas_parciales = Column(Integer, nullable=False, default=0, server_default="0")
+    cuotas_pagadas = Column(Integer, nullable=False, default=0, server_default="0")
+    cuotas_vencidas = Column(Integer, nullable=False, default=0, server_default="0")
+    fecha_primera_impaga = Column(Date)
     
     cliente = relationship("Cliente", back_populates="creditos")
     payment_schedule = relationship("PaymentSchedule", back_populates="credito")
@@ -46,6 +57,12 @@ class PaymentSchedule(Base):
     fecha_vencimiento = Column(Date, nullable=False)
     valor_cuota = Column(Numeric(12, 2), nullable=False)
     estado = Column(Text, nullable=False, default="pendiente")
+    monto_pagado = Column(Numeric(12, 2), nullable=False, default=0, server_default="0")
+    saldo_pendiente = Column(
+        Numeric(12, 2),
+        nullable=False,
+        default=lambda ctx: ctx.get_current_parameters()["valor_cuota"]
+    )
     
     credito = relationship("Credito", back_populates="payment_schedule")
     pagos = relationship("Pago", back_populates="schedule")
@@ -53,12 +70,25 @@ class PaymentSchedule(Base):
 
 class Pago(Base):
     __tablename__ = "pagos"
-    __table_args__ = {"schema": "core"}
+    # Monthly partitions are created by sql/10_pagos_particiones.sql and the aging job
+    __table_args__ = {"schema": "core", "postgresql_partition_by": "RANGE (fecha_pago)"}
     
-    pago_id = Column(BigInteger, primary_key=True, index=True)
+    pago_id = Column(BigInteger, primary_key=True, autoincrement=True, index=True)
     schedule_id = Column(BigInteger, ForeignKey("core.payment_schedule.schedule_id"), nullable=False)
-    fecha_pago = Column(DateTime(timezone=True), nullable=False)
+    fecha_pago = Column(DateTime(timezone=True), primary_key=True, nullable=False)
     monto = Column(Numeric(12, 2), nullable=False)
     medio = Column(Text)
     
     schedule = relationship("PaymentSchedule", back_populates="pagos")
+
+
+class PagoArchivo(Base):
+    __tablename__ = "pagos_archivo"
+    # Months moved out of core.pagos by PartitionService.archive (read-only history)
+    __table_args__ = {"schema": "core", "postgresql_partition_by": "RANGE (fecha_pago)"}
+    
+    pago_id = Column(BigInteger, primary_key=True)
+    schedule_id = Column(BigInteger, nullable=False)
+    fecha_pago = Column(DateTime(timezone=True), primary_key=True, nullable=False)
+    monto = Column(Numeric(12, 2), nullable=False)
+    medio = Column(Text)
@@ -1,4 +1,5 @@
 from datetime import datetime
+from decimal import Decimal
 from typing import Optional, List
 from pydantic import BaseModel
 
@@ -38,5 +39,17 @@ class ClienteWithCreditos(ClienteResponse):
         from_attributes = True
 
 
-from .credito import CreditoResponse
+class ClienteDashboard(ClienteResponse):
+    """A client's profile, credits with balances and the next cuota due across all of them."""
+    
+    monto_pagado: Decimal
+    saldo_pendiente: Decimal
+    cuotas_vencidas: int
+    dias_mora: int
+    next_payment: Optional['NextCuota'] = None
+    creditos: List['CreditoDashboard'] = []
+
+
+from .credito import CreditoDashboard, CreditoResponse, NextCuota
 ClienteWithCreditos.model_rebuild()
+ClienteDashboard.model_rebuild()
@@ -0,0 +1,38 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional, List
+from pydantic import BaseModel
+
+
+class CobranzaItem(BaseModel):
+    credito_id: int
+    cliente_id: int
+    nombre: str
+    producto: str
+    prioridad: Decimal
+    dias_mora: int
+    dias_sin_pago: int
+    saldo_pendiente: Decimal
+    cuotas_vencidas: int
+    fecha_primera_impaga: date
+    ultimo_pago: Optional[date] = None
+    agente: Optional[str] = None
+    reservado_hasta: Optional[datetime] = None
+
+
+class CobranzaLeaseRequest(BaseModel):
+    """``segundos`` defaults to ``COBRANZA_LEASE_SECONDS``."""
+    
+    agente: str
+    cantidad: int = 10
+    segundos: Optional[int] = None
+
+
+class CobranzaReleaseRequest(BaseModel):
+    agente: str
+    posponer_minutos: int = 0
+
+
+class CobranzaLease(BaseModel):
+    agente: str
+    items: List[CobranzaItem]
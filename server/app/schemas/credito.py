@@ -62,6 +62,67 @@ class CreditoSummary(BaseModel):
         from_attributes = True
 
 
+class NextCuota(BaseModel):
+    schedule_id: int
+    credito_id: int
+    num_cuota: int
+    fecha_vencimiento: date
+    valor_cuota: Decimal
+    estado: str
+    monto_pagado: Decimal
+    saldo_pendiente: Decimal
+    dias_vencimiento: int
+
+
+class CreditoBatchSummary(CreditoSummary):
+    cliente_id: int
+    dias_mora: int
+    next_payment: Optional[NextCuota] = None
+
+
+class CreditoDashboard(CreditoBatchSummary):
+    tea: Decimal
+    fecha_desembolso: date
+    fecha_inicio_pago: date
+
+
+class CreditoSummaryBatchRequest(BaseModel):
+    """Either explicit ``credito_ids`` or a filter; filters also narrow an id list."""
+    
+    credito_ids: Optional[List[int]] = None
+    cliente_id: Optional[int] = None
+    producto: Optional[ProductoEnum] = None
+    estado: Optional[EstadoCreditoEnum] = None
+    limit: int = 200
+
+
+class CreditoSummaryBatch(BaseModel):
+    items: List[CreditoBatchSummary]
+    missing: List[int] = []
+
+
+class AgingGroupEnum(str, Enum):
+    PRODUCTO = "producto"
+    CIUDAD = "ciudad"
+
+
+class AgingBucket(BaseModel):
+    bucket: str
+    producto: Optional[str] = None
+    ciudad: Optional[str] = None
+    creditos: int
+    saldo_pendiente: Decimal
+
+
+class RollRate(BaseModel):
+    mes: date
+    tramo_desde: str
+    tramo_hasta: str
+    creditos: int
+    saldo_pendiente: Decimal
+    tasa: Optional[Decimal] = None
+
+
 class CreditoWithSchedule(CreditoResponse):
     payment_schedule: List['PaymentScheduleResponse'] = []
     summary: Optional[CreditoSummary] = None
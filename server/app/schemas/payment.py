@@ -18,6 +18,17 @@ class MedioPagoEnum(str, Enum):
     LINK = "link"
 
 
+class PeriodoEnum(str, Enum):
+    DIA = "dia"
+    SEMANA = "semana"
+
+
+class PaymentGroupEnum(str, Enum):
+    MEDIO = "medio"
+    PRODUCTO = "producto"
+    CIUDAD = "ciudad"
+
+
 class PaymentScheduleBase(BaseModel):
     credito_id: int
     num_cuota: int
@@ -43,6 +54,16 @@ class PaymentScheduleResponse(PaymentScheduleInDB):
         from_attributes = True
 
 
+class OverdueCuotaResponse(PaymentScheduleInDB):
+    cliente_id: int
+    cliente_nombre: str
+    ciudad: Optional[str] = None
+    producto: str
+    monto_pagado: Decimal
+    saldo_pendiente: Decimal
+    dias_vencimiento: int
+
+
 class PagoBase(BaseModel):
     schedule_id: int
     fecha_pago: datetime
@@ -65,6 +86,21 @@ class PagoResponse(PagoInDB):
     pass
 
 
+class BulkPaymentResult(BaseModel):
+    row: int
+    accepted: bool
+    schedule_id: Optional[int] = None
+    pago_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkPaymentReport(BaseModel):
+    received: int
+    accepted: int
+    rejected: int
+    results: List[BulkPaymentResult]
+
+
 class PaymentSummary(BaseModel):
     total_cuotas: int
     cuotas_pagadas: int
@@ -79,4 +115,13 @@ class PaymentSummary(BaseModel):
         from_attributes = True
 
 
+class PaymentSeriesPoint(BaseModel):
+    periodo: date
+    medio: Optional[str] = None
+    producto: Optional[str] = None
+    ciudad: Optional[str] = None
+    pagos: int
+    monto: Decimal
+
+
 PaymentScheduleResponse.model_rebuild()
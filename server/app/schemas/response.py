@@ -6,12 +6,22 @@ T = TypeVar('T')
 
 class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     size: int
-    pages: int
+    pages: Optional[int] = None
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class CursorPage(BaseModel, Generic[T]):
+    items: List[T]
+    size: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+    has_next: bool
 
 
 class APIResponse(BaseModel, Generic[T]):
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.cache import credit_cache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.cobranza_service import CobranzaService
+from app.services.partition_service import PartitionService
+from app.services.payment_rollup_service import PaymentRollupService
+from app.services.portfolio_service import PortfolioService
+
+JOB_NAME = "aging"
+
+logger = logging.getLogger(__name__)
+
+# Moves every due 'pendiente' cuota to 'vencida' and the matching credit
+# counters in one statement. Rows locked by an in-flight payment are skipped:
+# that payment recomputes the estado itself.
+AGING_SQL = """
+    WITH due AS (
+        SELECT schedule_id
+        FROM core.payment_schedule
+        WHERE estado = 'pendiente'
+          AND fecha_vencimiento < :today
+          {since_filter}
+        ORDER BY schedule_id
+        FOR UPDATE SKIP LOCKED
+    ), aged AS (
+        UPDATE core.payment_schedule ps
+        SET estado = 'vencida'
+        FROM due
+        WHERE ps.schedule_id = due.schedule_id
+        RETURNING ps.credito_id
+    ), per_credit AS (
+        SELECT credito_id, COUNT(*) AS cuotas
+        FROM aged
+        GROUP BY credito_id
+    )
+    UPDATE core.creditos c
+    SET cuotas_pendientes = c.cuotas_pendientes - pc.cuotas,
+        cuotas_vencidas = c.cuotas_vencidas + pc.cuotas
+    FROM per_credit pc
+    WHERE c.credito_id = pc.credito_id
+    RETURNING c.credito_id, pc.cuotas
+"""
+
+
+@dataclass
+class AgingReport:
+    today: date
+    since: Optional[date] = None
+    rows_changed: int = 0
+    creditos: int = 0
+    duration_ms: float = 0.0
+    skipped: bool = False
+    deltas_compacted: int = 0
+    worklist_enrolled: int = 0
+    payment_deltas_compacted: int = 0
+    partitions_created: int = 0
+    snapshot: Optional[date] = None
+    
+    def __str__(self) -> str:
+        if self.skipped:
+            return "Aging skipped: another run holds the lock"
+        
+        window = f"{self.since} .. {self.today}" if self.since else f"< {self.today}"
+        message = (f"Aged {self.rows_changed} cuotas on {self.creditos} creditos "
+                   f"(due {window}) in {self.duration_ms:.1f} ms; "
+                   f"{self.deltas_compacted} portfolio and {self.payment_deltas_compacted} "
+                   f"payment rollup deltas compacted; "
+                   f"{self.worklist_enrolled} creditos added to the collections worklist")
+        
+        if self.partitions_created:
+            message += f"; {self.partitions_created} pagos partitions created"
+        
+        if self.snapshot:
+            message += f"; month-end snapshot {self.snapshot} taken"
+        
+        return message
+
+
+class AgingService:
+    """
+    Marks unpaid cuotas as 'vencida' once their due date has passed.
+    
+    Runs are incremental: only cuotas due since the last run's watermark
+    (minus ``aging_lookback_days`` to pick up stragglers) are scanned.
+    Runs are idempotent, and a transaction-level advisory lock keeps
+    concurrent runs (several workers, the CLI) from overlapping.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def run(self, today: Optional[date] = None, full: bool = False) -> AgingReport:
+        started = time.perf_counter()
+        report = AgingReport(today=today or date.today())
+        
+        locked = self.db.execute(
+            text("SELECT pg_try_advisory_xact_lock(hashtext('core.' || :job))"),
+            {"job": JOB_NAME}
+        ).scalar()
+        
+        if not locked:
+            self.db.rollback()
+            report.skipped = True
+            return report
+        
+        watermark = None if full else self.db.execute(
+            text("SELECT watermark FROM core.job_watermarks WHERE job = :job"),
+            {"job": JOB_NAME}
+        ).scalar()
+        
+        params = {"today": report.today}
+        since_filter = ""
+        
+        if watermark is not None:
+            report.since = min(watermark, report.today) - timedelta(days=settings.aging_lookback_days)
+            params["since"] = report.since
+            since_filter = "AND fecha_vencimiento >= :since"
+        
+        aged = self.db.execute(text(AGING_SQL.format(since_filter=since_filter)), params).all()
+        report.rows_changed = sum(cuotas for _, cuotas in aged)
+        report.creditos = len(aged)
+        
+        self.db.execute(
+            text("""
+                INSERT INTO core.job_watermarks (job, watermark, last_run_at, rows_changed)
+                VALUES (:job, :today, now(), :rows_changed)
+                ON CONFLICT (job) DO UPDATE
+                SET watermark = GREATEST(core.job_watermarks.watermark, EXCLUDED.watermark),
+                    last_run_at = EXCLUDED.last_run_at,
+                    rows_changed = EXCLUDED.rows_changed
+            """),
+            {"job": JOB_NAME, "today": report.today, "rows_changed": report.rows_changed}
+        )
+        self.db.commit()
+        
+        credit_cache.invalidate_many(credito_id for credito_id, _ in aged)
+        
+        report.duration_ms = (time.perf_counter() - started) * 1000
+        
+        return report
+
+
+def run_aging(today: Optional[date] = None, full: bool = False) -> AgingReport:
+    """
+    Age cuotas, enroll newly delinquent credits in the collections worklist,
+    then fold portfolio and payment rollup deltas, create upcoming pagos
+    partitions and take a due month-end snapshot.
+    """
+    
+    db = SessionLocal()
+    try:
+        report = AgingService(db).run(today=today, full=full)
+        
+        if not report.skipped:
+            report.worklist_enrolled = CobranzaService(db).enroll(today=report.today, since=report.since)
+            
+            portfolio = PortfolioService(db)
+            report.deltas_compacted = portfolio.compact()
+            report.payment_deltas_compacted = PaymentRollupService(db).compact()
+            report.partitions_created = PartitionService(db).ensure()
+            
+            mes = portfolio.snapshot_due(report.today)
+            if mes and portfolio.snapshot(mes) is not None:
+                report.snapshot = mes
+        
+        return report
+    finally:
+        db.close()
+
+
+async def aging_loop(interval_seconds: float) -> None:
+    """Background task started from the app lifespan: age cuotas every interval."""
+    
+    while True:
+        try:
+            report = await asyncio.to_thread(run_aging)
+            logger.info("Aging run: %s", report)
+        except Exception:
+            logger.exception("Aging run failed")
+        
+        await asyncio.sleep(interval_seconds)
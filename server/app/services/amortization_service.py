@@ -0,0 +1,316 @@
+import calendar
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP, localcontext
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.orm import Session
+from app.core.cache import credit_cache
+from app.models.models import Credito, PaymentSchedule
+from app.services.payment_service import ESTADO_COUNTERS, PaymentService
+
+CENT = Decimal("0.01")
+ONE = Decimal(1)
+
+
+def monthly_rate(tea: Decimal) -> Decimal:
+    """Effective monthly rate equivalent to an effective annual rate: (1 + TEA)^(1/12) - 1."""
+    
+    with localcontext() as ctx:
+        ctx.prec = 34
+        return (ONE + Decimal(tea)) ** (ONE / 12) - ONE
+
+
+def add_months(start: date, months: int) -> date:
+    """Same day ``months`` later, clamped to the last day of shorter months."""
+    
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+
+@lru_cache(maxsize=4096)
+def due_dates(fecha_inicio_pago: date, cuotas_totales: int) -> Tuple[date, ...]:
+    return tuple(add_months(fecha_inicio_pago, n) for n in range(cuotas_totales))
+
+
+@dataclass(frozen=True)
+class AnnuityFactors:
+    """
+    Per-(TEA, plazo) constants of the French annuity.
+    
+    With f = 1 + i, the level cuota is ``P * payment`` and the balance left
+    before the last cuota is ``P * growth - C * accrued``; every credit with
+    the same terms shares these, so a portfolio run computes them once per
+    distinct (tea, cuotas_totales) pair.
+    """
+    rate: Decimal
+    payment: Decimal
+    growth: Decimal
+    accrued: Decimal
+    
+    @classmethod
+    def for_terms(cls, tea: Decimal, cuotas_totales: int) -> "AnnuityFactors":
+        return _annuity_factors(Decimal(tea), int(cuotas_totales))
+    
+    def amounts(self, inversion: Decimal) -> Tuple[Decimal, Decimal]:
+        """Level cuota and last cuota for a principal, both rounded to cents."""
+        
+        with localcontext() as ctx:
+            ctx.prec = 34
+            cuota = (inversion * self.payment).quantize(CENT, ROUND_HALF_UP)
+            remaining = inversion * self.growth - cuota * self.accrued
+            last = (remaining * (ONE + self.rate)).quantize(CENT, ROUND_HALF_UP)
+        
+        return cuota, last
+
+
+@lru_cache(maxsize=4096)
+def _annuity_factors(tea: Decimal, cuotas_totales: int) -> AnnuityFactors:
+    if cuotas_totales < 1:
+        raise ValueError("cuotas_totales must be at least 1")
+    
+    rate = monthly_rate(tea)
+    
+    with localcontext() as ctx:
+        ctx.prec = 34
+        
+        if rate == 0:
+            return AnnuityFactors(
+                rate=rate,
+                payment=ONE / cuotas_totales,
+                growth=ONE,
+                accrued=Decimal(cuotas_totales - 1)
+            )
+        
+        factor = ONE + rate
+        growth = factor ** (cuotas_totales - 1)
+        
+        return AnnuityFactors(
+            rate=rate,
+            payment=rate / (ONE - factor ** -cuotas_totales),
+            growth=growth,
+            accrued=(growth - ONE) / rate
+        )
+
+
+@dataclass(frozen=True)
+class CuotaPlan:
+    num_cuota: int
+    fecha_vencimiento: date
+    valor_cuota: Decimal
+
+
+def build_schedule(
+    inversion: Decimal,
+    cuotas_totales: int,
+    tea: Decimal,
+    fecha_inicio_pago: date
+) -> List[CuotaPlan]:
+    """
+    French amortization: level monthly cuotas rounded to cents, with the
+    last cuota absorbing the rounding so the plan amortizes the principal
+    exactly. Cuota k is due ``k - 1`` months after ``fecha_inicio_pago``.
+    """
+    
+    cuota, last = AnnuityFactors.for_terms(tea, cuotas_totales).amounts(Decimal(inversion))
+    
+    return [
+        CuotaPlan(
+            num_cuota=n,
+            fecha_vencimiento=fecha_vencimiento,
+            valor_cuota=last if n == cuotas_totales else cuota
+        )
+        for n, fecha_vencimiento in enumerate(due_dates(fecha_inicio_pago, cuotas_totales), start=1)
+    ]
+
+
+@dataclass
+class PortfolioSimulation:
+    creditos: int = 0
+    cuotas: int = 0
+    inversion: Decimal = Decimal("0")
+    total_actual: Decimal = Decimal("0")
+    total_simulado: Decimal = Decimal("0")
+    by_producto: Dict[str, Decimal] = field(default_factory=dict)
+    
+    @property
+    def interes_simulado(self) -> Decimal:
+        return self.total_simulado - self.inversion
+
+
+class AmortizationService:
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def create_schedule(self, credito: Credito) -> List[CuotaPlan]:
+        """
+        Generate and insert the cuotas of a new credit in one multi-row INSERT
+        and set its estado counters. ``credito`` must be flushed (have an id);
+        the caller commits.
+        """
+        
+        plan = build_schedule(credito.inversion, credito.cuotas_totales, credito.tea, credito.fecha_inicio_pago)
+        rows = self._schedule_rows(credito.credito_id, plan)
+        
+        self.db.execute(insert(PaymentSchedule), rows)
+        
+        counts = Counter(row["estado"] for row in rows)
+        for estado, counter in ESTADO_COUNTERS.items():
+            setattr(credito, counter, counts.get(estado, 0))
+        credito.fecha_primera_impaga = plan[0].fecha_vencimiento
+        
+        return plan
+    
+    def simulate(
+        self,
+        tea: Optional[Decimal] = None,
+        tea_shift: Decimal = Decimal("0"),
+        producto: Optional[str] = None
+    ) -> PortfolioSimulation:
+        """
+        Re-price the vigente portfolio without writing: every credit is
+        rebuilt at ``tea`` (or its own TEA plus ``tea_shift``) and compared
+        with the cuotas currently scheduled.
+        """
+        
+        result = PortfolioSimulation()
+        actual = self._scheduled_totals(producto)
+        
+        for row in self._portfolio(producto):
+            rate = tea if tea is not None else row.tea + tea_shift
+            cuota, last = AnnuityFactors.for_terms(rate, row.cuotas_totales).amounts(row.inversion)
+            total = cuota * (row.cuotas_totales - 1) + last
+            
+            result.creditos += 1
+            result.cuotas += row.cuotas_totales
+            result.inversion += row.inversion
+            result.total_simulado += total
+            result.total_actual += actual.get(row.credito_id, Decimal("0"))
+            result.by_producto[row.producto] = result.by_producto.get(row.producto, Decimal("0")) + total
+        
+        return result
+    
+    def regenerate(
+        self,
+        producto: Optional[str] = None,
+        only_missing: bool = False,
+        chunk_size: int = 5000
+    ) -> int:
+        """
+        Rewrite the schedules of vigente credits that have no payments yet,
+        ``chunk_size`` credits per transaction. With ``only_missing`` only
+        credits without any cuota are filled in. Returns credits rewritten.
+        """
+        
+        query = self.db.query(
+            Credito.credito_id,
+            Credito.inversion,
+            Credito.cuotas_totales,
+            Credito.tea,
+            Credito.fecha_inicio_pago
+        ).filter(
+            Credito.estado == 'vigente',
+            Credito.monto_pagado == 0
+        )
+        
+        if producto:
+            query = query.filter(Credito.producto == producto)
+        
+        if only_missing:
+            query = query.filter(
+                ~self.db.query(PaymentSchedule.schedule_id).filter(
+                    PaymentSchedule.credito_id == Credito.credito_id
+                ).exists()
+            )
+        
+        creditos = query.order_by(Credito.credito_id).all()
+        
+        for start in range(0, len(creditos), chunk_size):
+            self._rewrite(creditos[start:start + chunk_size])
+        
+        return len(creditos)
+    
+    def _rewrite(self, creditos) -> None:
+        
+        ids = [c.credito_id for c in creditos]
+        rows = []
+        counters = []
+        
+        for c in creditos:
+            credit_rows = self._schedule_rows(
+                c.credito_id,
+                build_schedule(c.inversion, c.cuotas_totales, c.tea, c.fecha_inicio_pago)
+            )
+            rows.extend(credit_rows)
+            
+            counts = Counter(row["estado"] for row in credit_rows)
+            counters.append({
+                "credito_id": c.credito_id,
+                "saldo_pendiente": c.inversion,
+                "fecha_primera_impaga": credit_rows[0]["fecha_vencimiento"],
+                **{counter: counts.get(estado, 0) for estado, counter in ESTADO_COUNTERS.items()}
+            })
+        
+        # Lock the credits first so a payment cannot land between the delete
+        # and the insert; credits that got paid meanwhile are left alone.
+        locked = {
+            credito_id for credito_id, in self.db.query(Credito.credito_id).filter(
+                Credito.credito_id.in_(ids),
+                Credito.monto_pagado == 0
+            ).order_by(Credito.credito_id).with_for_update()
+        }
+        
+        self.db.execute(
+            delete(PaymentSchedule).where(PaymentSchedule.credito_id.in_(locked)),
+            execution_options={"synchronize_session": False}
+        )
+        self.db.execute(insert(PaymentSchedule), [r for r in rows if r["credito_id"] in locked])
+        self.db.execute(update(Credito), [c for c in counters if c["credito_id"] in locked])
+        self.db.commit()
+        
+        credit_cache.invalidate_many(locked)
+    
+    @staticmethod
+    def _schedule_rows(credito_id: int, plan: Iterable[CuotaPlan]) -> List[dict]:
+        return [
+            {
+                "credito_id": credito_id,
+                "num_cuota": cuota.num_cuota,
+                "fecha_vencimiento": cuota.fecha_vencimiento,
+                "valor_cuota": cuota.valor_cuota,
+                "monto_pagado": Decimal("0"),
+                "saldo_pendiente": cuota.valor_cuota,
+                "estado": PaymentService.schedule_status(cuota.valor_cuota, Decimal("0"), cuota.fecha_vencimiento),
+            }
+            for cuota in plan
+        ]
+    
+    def _portfolio(self, producto: Optional[str]) -> Iterator:
+        query = self.db.query(
+            Credito.credito_id,
+            Credito.producto,
+            Credito.inversion,
+            Credito.cuotas_totales,
+            Credito.tea
+        ).filter(Credito.estado == 'vigente')
+        
+        if producto:
+            query = query.filter(Credito.producto == producto)
+        
+        return query.yield_per(10000)
+    
+    def _scheduled_totals(self, producto: Optional[str]) -> Dict[int, Decimal]:
+        query = self.db.query(
+            PaymentSchedule.credito_id,
+            func.sum(PaymentSchedule.valor_cuota)
+        ).join(Credito).filter(Credito.estado == 'vigente')
+        
+        if producto:
+            query = query.filter(Credito.producto == producto)
+        
+        return dict(query.group_by(PaymentSchedule.credito_id).all())
@@ -0,0 +1,313 @@
+import csv
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy import Date, Integer, Numeric, case, column, insert, literal, update, values
+from sqlalchemy.orm import Session
+from app.core.cache import credit_cache
+from app.models.models import Credito, Pago, PaymentSchedule
+from app.schemas.payment import BulkPaymentResult, MedioPagoEnum
+from app.services.payment_service import ESTADO_COUNTERS, oldest_unpaid_due_date
+
+CSV_COLUMNS = ("schedule_id", "monto", "medio", "fecha_pago")
+MEDIOS = {m.value for m in MedioPagoEnum}
+
+
+@dataclass
+class BulkRow:
+    row: int
+    schedule_id: Optional[int] = None
+    monto: Optional[Decimal] = None
+    medio: Optional[str] = None
+    fecha_pago: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a streamed request body into raw lines without buffering it whole."""
+    
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    
+    if pending:
+        yield pending.rstrip(b"\r")
+
+
+async def parse_rows(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[BulkRow]:
+    """
+    Parse CSV (header required, columns from CSV_COLUMNS) or NDJSON payment rows.
+    
+    Rows are numbered from 1 in data order (blank lines and the CSV header
+    are skipped); malformed rows are yielded with ``error`` set. Only a bad
+    CSV header raises ValueError, and it does so before the first row, so
+    callers posting rows as they arrive never fail halfway through.
+    """
+    
+    header: Optional[List[str]] = None
+    number = 0
+    
+    async for raw in iter_lines(chunks):
+        try:
+            line = raw.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            if fmt == "csv" and header is None:
+                raise ValueError("CSV header is not valid UTF-8")
+            number += 1
+            yield BulkRow(row=number, error="Malformed row: not valid UTF-8")
+            continue
+        
+        if not line.strip():
+            continue
+        
+        if fmt == "csv" and header is None:
+            header = [name.strip().lower() for name in next(csv.reader([line]))]
+            missing = {"schedule_id", "monto"} - set(header)
+            if missing:
+                raise ValueError(f"CSV header is missing columns: {', '.join(sorted(missing))}")
+            continue
+        
+        number += 1
+        
+        try:
+            if fmt == "csv":
+                record = dict(zip(header, next(csv.reader([line]))))
+            else:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+        except (ValueError, RecursionError, csv.Error) as exc:
+            yield BulkRow(row=number, error=f"Malformed row: {exc}")
+            continue
+        
+        yield _validate(number, record)
+
+
+def _validate(number: int, record: dict) -> BulkRow:
+    row = BulkRow(row=number)
+    
+    schedule_id = record.get("schedule_id")
+    if isinstance(schedule_id, str) and schedule_id.strip().isdigit():
+        schedule_id = int(schedule_id.strip())
+    if not isinstance(schedule_id, int) or isinstance(schedule_id, bool) or not 0 < schedule_id < 2 ** 63:
+        row.error = "schedule_id must be an integer id"
+        return row
+    row.schedule_id = schedule_id
+    
+    monto = record.get("monto")
+    if isinstance(monto, bool) or not isinstance(monto, (str, int, float)):
+        row.error = "monto must be a number"
+        return row
+    try:
+        row.monto = Decimal(str(monto).strip())
+    except InvalidOperation:
+        row.error = "monto must be a number"
+        return row
+    
+    if not row.monto.is_finite() or row.monto <= 0:
+        row.error = "Payment amount must be positive"
+        return row
+    
+    if row.monto != row.monto.quantize(Decimal("0.01")):
+        row.error = "Payment amount has more than 2 decimals"
+        return row
+    
+    medio = record.get("medio")
+    if medio is not None and not isinstance(medio, str):
+        row.error = "medio must be a string"
+        return row
+    medio = (medio or "").strip() or None
+    if medio is not None and medio not in MEDIOS:
+        row.error = f"Invalid medio '{medio}'"
+        return row
+    row.medio = medio
+    
+    fecha_pago = record.get("fecha_pago")
+    if fecha_pago is not None and not isinstance(fecha_pago, str):
+        row.error = "fecha_pago must be an ISO 8601 string"
+        return row
+    fecha_pago = (fecha_pago or "").strip()
+    if fecha_pago:
+        try:
+            row.fecha_pago = datetime.fromisoformat(fecha_pago)
+        except ValueError:
+            row.error = f"Invalid fecha_pago '{fecha_pago}'"
+    
+    return row
+
+
+def ingest_batch(db: Session, rows: List[BulkRow]) -> List[BulkPaymentResult]:
+    """
+    Validate and post one batch of payments with a constant number of statements.
+    
+    1. Lock every referenced cuota (one SELECT ... FOR UPDATE, in id order).
+    2. Check rows against the running remaining balance, in input order.
+    3. Insert accepted pagos (one multi-row INSERT ... RETURNING).
+    4. Apply amounts and recompute estado for all touched cuotas (one UPDATE).
+    5. Lock the touched credits in id order and move their totals and
+       estado counters (one SELECT ... FOR UPDATE, one UPDATE).
+    """
+    
+    results: Dict[int, BulkPaymentResult] = {}
+    candidates = []
+    
+    for row in rows:
+        if row.error:
+            results[row.row] = BulkPaymentResult(row=row.row, accepted=False, schedule_id=row.schedule_id, error=row.error)
+        else:
+            candidates.append(row)
+    
+    schedule_ids = sorted({row.schedule_id for row in candidates})
+    schedules = {}
+    
+    if schedule_ids:
+        schedules = {
+            s.schedule_id: s
+            for s in db.query(
+                PaymentSchedule.schedule_id,
+                PaymentSchedule.credito_id,
+                PaymentSchedule.saldo_pendiente,
+                PaymentSchedule.estado,
+                Credito.fecha_desembolso
+            ).join(
+                Credito, Credito.credito_id == PaymentSchedule.credito_id
+            ).filter(
+                PaymentSchedule.schedule_id.in_(schedule_ids)
+            ).order_by(PaymentSchedule.schedule_id).with_for_update(of=PaymentSchedule)
+        }
+    
+    remaining = {schedule_id: s.saldo_pendiente for schedule_id, s in schedules.items()}
+    applied: Dict[int, Decimal] = {}
+    accepted = []
+    now = datetime.now()
+    
+    for row in candidates:
+        if row.schedule_id not in schedules:
+            results[row.row] = BulkPaymentResult(
+                row=row.row, accepted=False, schedule_id=row.schedule_id, error="Payment schedule not found"
+            )
+        elif (row.fecha_pago or now).date() < schedules[row.schedule_id].fecha_desembolso:
+            results[row.row] = BulkPaymentResult(
+                row=row.row, accepted=False, schedule_id=row.schedule_id,
+                error=f"Payment date is before the credit's disbursement ({schedules[row.schedule_id].fecha_desembolso})"
+            )
+        elif row.monto > remaining[row.schedule_id]:
+            results[row.row] = BulkPaymentResult(
+                row=row.row, accepted=False, schedule_id=row.schedule_id,
+                error=f"Payment amount exceeds remaining balance. Remaining: {remaining[row.schedule_id]}"
+            )
+        else:
+            remaining[row.schedule_id] -= row.monto
+            applied[row.schedule_id] = applied.get(row.schedule_id, Decimal("0")) + row.monto
+            accepted.append(row)
+    
+    if accepted:
+        pago_ids = db.scalars(
+            insert(Pago).returning(Pago.pago_id, sort_by_parameter_order=True),
+            [
+                {
+                    "schedule_id": row.schedule_id,
+                    "fecha_pago": row.fecha_pago or now,
+                    "monto": row.monto,
+                    "medio": row.medio,
+                }
+                for row in accepted
+            ],
+            execution_options={"render_nulls": True}
+        ).all()
+        
+        for row, pago_id in zip(accepted, pago_ids):
+            results[row.row] = BulkPaymentResult(
+                row=row.row, accepted=True, schedule_id=row.schedule_id, pago_id=pago_id
+            )
+        
+        new_status = _apply_schedule_amounts(db, applied)
+        _apply_credit_amounts(db, schedules, applied, new_status)
+    
+    db.commit()
+    
+    credit_cache.invalidate_many({schedules[schedule_id].credito_id for schedule_id in applied})
+    
+    return [results[row.row] for row in rows]
+
+
+def _apply_schedule_amounts(db: Session, applied: Dict[int, Decimal]) -> Dict[int, str]:
+    
+    amounts = values(
+        column("schedule_id", Integer),
+        column("monto", Numeric(12, 2)),
+        name="amounts"
+    ).data(list(applied.items()))
+    
+    monto_pagado = PaymentSchedule.monto_pagado + amounts.c.monto
+    
+    returned = db.execute(
+        update(PaymentSchedule).where(
+            PaymentSchedule.schedule_id == amounts.c.schedule_id
+        ).values(
+            monto_pagado=monto_pagado,
+            saldo_pendiente=PaymentSchedule.saldo_pendiente - amounts.c.monto,
+            estado=case(
+                (monto_pagado >= PaymentSchedule.valor_cuota, "pagada"),
+                (monto_pagado > 0, "parcial"),
+                (PaymentSchedule.fecha_vencimiento < literal(date.today(), Date), "vencida"),
+                else_="pendiente"
+            )
+        ).returning(PaymentSchedule.schedule_id, PaymentSchedule.estado),
+        execution_options={"synchronize_session": False}
+    )
+    
+    return {schedule_id: estado for schedule_id, estado in returned}
+
+
+def _apply_credit_amounts(db: Session, schedules, applied: Dict[int, Decimal], new_status: Dict[int, str]):
+    
+    deltas: Dict[int, Dict[str, object]] = {}
+    
+    for schedule_id, monto in applied.items():
+        schedule = schedules[schedule_id]
+        delta = deltas.setdefault(
+            schedule.credito_id,
+            {"monto": Decimal("0"), **{counter: 0 for counter in ESTADO_COUNTERS.values()}}
+        )
+        delta["monto"] += monto
+        
+        if new_status[schedule_id] != schedule.estado:
+            delta[ESTADO_COUNTERS[schedule.estado]] -= 1
+            delta[ESTADO_COUNTERS[new_status[schedule_id]]] += 1
+    
+    # Lock credits in id order so concurrent batches cannot deadlock on them
+    db.query(Credito.credito_id).filter(
+        Credito.credito_id.in_(sorted(deltas))
+    ).order_by(Credito.credito_id).with_for_update().all()
+    
+    counters = list(ESTADO_COUNTERS.values())
+    changes = values(
+        column("credito_id", Integer),
+        column("monto", Numeric(12, 2)),
+        *[column(counter, Integer) for counter in counters],
+        name="changes"
+    ).data([
+        (credito_id, delta["monto"], *[delta[counter] for counter in counters])
+        for credito_id, delta in sorted(deltas.items())
+    ])
+    
+    db.execute(
+        update(Credito).where(
+            Credito.credito_id == changes.c.credito_id
+        ).values(
+            monto_pagado=Credito.monto_pagado + changes.c.monto,
+            saldo_pendiente=Credito.saldo_pendiente - changes.c.monto,
+            fecha_primera_impaga=case(
+                (changes.c.cuotas_pagadas > 0, oldest_unpaid_due_date()),
+                else_=Credito.fecha_primera_impaga
+            ),
+            **{counter: getattr(Credito, counter) + changes.c[counter] for counter in counters}
+        ),
+        execution_options={"synchronize_session": False}
+    )
@@ -0,0 +1,95 @@
+import re
+from decimal import Decimal
+from typing import Any, Dict, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session, Query
+from app.models.models import Cliente, Credito
+from app.schemas.cliente import ClienteResponse
+from app.services.payment_service import PaymentService
+
+DOCUMENT_SEPARATORS = re.compile(r"[\s.\-]")
+
+
+def normalized(expression):
+    """Lower-cased, accent-free form matching the expression indexes in sql/05_client_search.sql."""
+    return func.core.f_unaccent(func.lower(expression))
+
+
+def escape_like(value: str) -> str:
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+class ClienteService:
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def search_query(
+        self,
+        search: Optional[str] = None,
+        ciudad: Optional[str] = None,
+        ranked: bool = True
+    ) -> Query:
+        """
+        Client list query with index-backed search.
+        
+        Document numbers (digits, optionally with dots/dashes/spaces) use an
+        exact-prefix match on num_doc. Anything else is matched against the
+        accent-insensitive name with trigrams: substring or word similarity,
+        ranked by word similarity when ``ranked`` is set. ``ciudad`` is an
+        accent-insensitive prefix match.
+        """
+        
+        query = self.db.query(Cliente)
+        
+        if search and search.strip():
+            term = search.strip()
+            document = DOCUMENT_SEPARATORS.sub("", term)
+            
+            if document.isdigit():
+                query = query.filter(Cliente.num_doc.like(f"{document}%"))
+            else:
+                nombre = normalized(Cliente.nombre)
+                needle = normalized(term)
+                query = query.filter(
+                    nombre.like("%" + normalized(escape_like(term)) + "%", escape="!") |
+                    needle.op("<%")(nombre)
+                )
+                
+                if ranked:
+                    query = query.order_by(func.word_similarity(needle, nombre).desc())
+        
+        if ciudad and ciudad.strip():
+            query = query.filter(
+                normalized(Cliente.ciudad).like(normalized(escape_like(ciudad.strip())) + "%", escape="!")
+            )
+        
+        return query
+    
+    def get_dashboard(self, cliente_id: int) -> Optional[Dict[str, Any]]:
+        """
+        A client's profile, credits with balances and next unpaid cuota, and
+        totals across credits, as a plain dict shaped like ``ClienteDashboard``.
+        Two statements whatever the number of credits.
+        """
+        
+        cliente = self.db.query(Cliente).filter(Cliente.cliente_id == cliente_id).first()
+        if not cliente:
+            return None
+        
+        creditos = PaymentService(self.db).get_credit_summaries(
+            cliente_id=cliente_id,
+            extra_columns=(Credito.tea, Credito.fecha_desembolso, Credito.fecha_inicio_pago)
+        )
+        pending = [credito['next_payment'] for credito in creditos if credito['next_payment']]
+        
+        return {
+            **ClienteResponse.model_validate(cliente).model_dump(),
+            'monto_pagado': sum((credito['monto_pagado'] for credito in creditos), Decimal('0.00')),
+            'saldo_pendiente': sum((credito['saldo_pendiente'] for credito in creditos), Decimal('0.00')),
+            'cuotas_vencidas': sum(credito['cuotas_vencidas'] for credito in creditos),
+            'dias_mora': max((credito['dias_mora'] for credito in creditos), default=0),
+            'next_payment': min(pending, key=lambda cuota: (cuota['fecha_vencimiento'], cuota['credito_id']), default=None),
+            'creditos': creditos,
+        }
+
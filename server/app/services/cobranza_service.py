@@ -0,0 +1,162 @@
+from datetime import date
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Worklist rows with the priority and day counts as of :today
+ITEM_COLUMNS = """
+    q.credito_id, q.cliente_id, cl.nombre, c.producto,
+    core.f_cobranza_prioridad(q.prioridad_base, CAST(:today AS date)) AS prioridad,
+    CAST(:today AS date) - q.fecha_primera_impaga AS dias_mora,
+    CAST(:today AS date) - COALESCE(q.ultimo_pago, c.fecha_desembolso) AS dias_sin_pago,
+    q.saldo_pendiente, c.cuotas_vencidas, q.fecha_primera_impaga, q.ultimo_pago,
+    q.agente, q.reservado_hasta
+"""
+
+# Skips rows another agent is leasing right now instead of waiting on them
+LEASE_SQL = f"""
+    WITH siguientes AS (
+        SELECT credito_id
+        FROM core.cola_cobranza
+        WHERE reservado_hasta IS NULL OR reservado_hasta <= now()
+        ORDER BY prioridad_base DESC, credito_id
+        LIMIT :cantidad
+        FOR UPDATE SKIP LOCKED
+    ), reservados AS (
+        UPDATE core.cola_cobranza q
+        SET agente = :agente,
+            reservado_hasta = now() + make_interval(secs => :segundos)
+        FROM siguientes
+        WHERE q.credito_id = siguientes.credito_id
+        RETURNING q.*
+    )
+    SELECT {ITEM_COLUMNS}
+    FROM reservados q
+    JOIN core.creditos c ON c.credito_id = q.credito_id
+    JOIN core.clientes cl ON cl.cliente_id = q.cliente_id
+    ORDER BY q.prioridad_base DESC, q.credito_id
+"""
+
+
+class CobranzaService:
+    """
+    Collections worklist served from core.cola_cobranza, which triggers on
+    creditos and the aging job keep current (see sql/08_cola_cobranza.sql).
+    Agents lease the highest-priority rows; a lease expires on its own, so a
+    crashed client never strands its credits.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def worklist(
+        self,
+        limit: int,
+        agente: Optional[str] = None,
+        today: Optional[date] = None
+    ) -> List[Dict[str, Any]]:
+        """Top of the worklist, or the rows ``agente`` holds, without leasing anything."""
+        
+        params: Dict[str, Any] = {"today": today or date.today(), "limit": limit}
+        filters = ""
+        
+        if agente:
+            filters = "WHERE q.agente = :agente"
+            params["agente"] = agente
+        
+        rows = self.db.execute(text(f"""
+            SELECT {ITEM_COLUMNS}
+            FROM core.cola_cobranza q
+            JOIN core.creditos c ON c.credito_id = q.credito_id
+            JOIN core.clientes cl ON cl.cliente_id = q.cliente_id
+            {filters}
+            ORDER BY q.prioridad_base DESC, q.credito_id
+            LIMIT :limit
+        """), params).all()
+        
+        return [dict(row._mapping) for row in rows]
+    
+    def lease(self, agente: str, cantidad: int, segundos: int) -> List[Dict[str, Any]]:
+        """
+        Lease the next ``cantidad`` available credits to ``agente`` for
+        ``segundos``. Concurrent agents get disjoint rows.
+        """
+        
+        rows = self.db.execute(text(LEASE_SQL), {
+            "agente": agente,
+            "cantidad": cantidad,
+            "segundos": float(segundos),
+            "today": date.today(),
+        }).all()
+        self.db.commit()
+        
+        return [dict(row._mapping) for row in rows]
+    
+    def release(self, credito_id: int, agente: str, posponer_minutos: int = 0) -> bool:
+        """
+        Return a leased credit to the worklist, optionally snoozed for
+        ``posponer_minutos``. False if ``agente`` does not hold it.
+        """
+        
+        released = self.db.execute(text("""
+            UPDATE core.cola_cobranza
+            SET agente = NULL,
+                reservado_hasta = CASE
+                    WHEN :minutos > 0 THEN now() + make_interval(mins => :minutos)
+                END
+            WHERE credito_id = :credito_id AND agente = :agente
+            RETURNING credito_id
+        """), {"credito_id": credito_id, "agente": agente, "minutos": posponer_minutos}).first()
+        self.db.commit()
+        
+        return released is not None
+    
+    def enroll(self, today: Optional[date] = None, since: Optional[date] = None) -> int:
+        """
+        Add credits whose oldest unpaid cuota fell due before ``today`` (and
+        on or after ``since``) and are not in the worklist yet. Run by the
+        aging job; payments are picked up by the trigger.
+        """
+        
+        params: Dict[str, Any] = {"today": today or date.today()}
+        since_filter = ""
+        
+        if since is not None:
+            params["since"] = since
+            since_filter = "AND c.fecha_primera_impaga >= :since"
+        
+        enrolled = self.db.execute(text(f"""
+            SELECT core.refrescar_cola_cobranza(ARRAY(
+                SELECT c.credito_id
+                FROM core.creditos c
+                WHERE c.estado = 'vigente'
+                  AND c.fecha_primera_impaga < :today
+                  {since_filter}
+                  AND NOT EXISTS (SELECT 1 FROM core.cola_cobranza q WHERE q.credito_id = c.credito_id)
+            ), :today)
+        """), params).scalar()
+        self.db.commit()
+        
+        return enrolled
+    
+    def rebuild(self, today: Optional[date] = None) -> int:
+        """Recompute every row from creditos (after bulk loads or to fix drift). Leases are kept."""
+        
+        params = {"today": today or date.today()}
+        
+        self.db.execute(text("""
+            DELETE FROM core.cola_cobranza q
+            USING core.creditos c
+            WHERE c.credito_id = q.credito_id
+              AND (c.estado <> 'vigente' OR c.fecha_primera_impaga IS NULL
+                   OR c.fecha_primera_impaga >= :today)
+        """), params)
+        rows = self.db.execute(text("""
+            SELECT core.refrescar_cola_cobranza(ARRAY(
+                SELECT credito_id FROM core.creditos
+                WHERE estado = 'vigente' AND fecha_primera_impaga < :today
+            ), :today)
+        """), params).scalar()
+        self.db.commit()
+        
+        return rows
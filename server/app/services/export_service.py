@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date
+from typing import AsyncIterator, Optional, Sequence
+from sqlalchemy import Row, Select, select
+from app.models.models import Credito, PaymentSchedule
+from app.services.payment_service import pagos_union
+
+SCHEDULE_COLUMNS = (
+    PaymentSchedule.schedule_id,
+    PaymentSchedule.credito_id,
+    Credito.producto,
+    PaymentSchedule.num_cuota,
+    PaymentSchedule.fecha_vencimiento,
+    PaymentSchedule.valor_cuota,
+    PaymentSchedule.monto_pagado,
+    PaymentSchedule.saldo_pendiente,
+    PaymentSchedule.estado,
+)
+
+
+def schedule_export_query(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    credito_id: Optional[int] = None,
+    producto: Optional[str] = None,
+    estado: Optional[str] = None
+) -> Select:
+    """Cuotas with ``desde <= fecha_vencimiento <= hasta``, in schedule_id order."""
+    
+    query = select(*SCHEDULE_COLUMNS).join(Credito, Credito.credito_id == PaymentSchedule.credito_id)
+    
+    if desde:
+        query = query.where(PaymentSchedule.fecha_vencimiento >= desde)
+    if hasta:
+        query = query.where(PaymentSchedule.fecha_vencimiento <= hasta)
+    if credito_id:
+        query = query.where(PaymentSchedule.credito_id == credito_id)
+    if producto:
+        query = query.where(Credito.producto == producto)
+    if estado:
+        query = query.where(PaymentSchedule.estado == estado)
+    
+    return query.order_by(PaymentSchedule.schedule_id)
+
+
+def pagos_export_query(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    credito_id: Optional[int] = None,
+    producto: Optional[str] = None,
+    estado: Optional[str] = None,
+    medio: Optional[str] = None
+) -> Select:
+    """
+    Pagos made on ``desde .. hasta`` (inclusive days), archived months
+    included, in (fecha_pago, pago_id) order.
+    """
+    
+    pagos = pagos_union(credito_id=credito_id or None, medio=medio, desde=desde, hasta=hasta)
+    query = select(
+        pagos.c.pago_id,
+        pagos.c.schedule_id,
+        PaymentSchedule.credito_id,
+        Credito.producto,
+        PaymentSchedule.num_cuota,
+        pagos.c.fecha_pago,
+        pagos.c.monto,
+        pagos.c.medio,
+        PaymentSchedule.estado.label("estado_cuota"),
+    ).join(
+        PaymentSchedule, PaymentSchedule.schedule_id == pagos.c.schedule_id
+    ).join(
+        Credito, Credito.credito_id == PaymentSchedule.credito_id
+    )
+    
+    if producto:
+        query = query.where(Credito.producto == producto)
+    if estado:
+        query = query.where(PaymentSchedule.estado == estado)
+    
+    return query.order_by(pagos.c.fecha_pago, pagos.c.pago_id)
+
+
+async def encode_csv(columns: Sequence[str], chunks: AsyncIterator[Sequence[Row]]) -> AsyncIterator[bytes]:
+    """One CSV byte block per fetched chunk, header first."""
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    
+    async for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def encode_ndjson(columns: Sequence[str], chunks: AsyncIterator[Sequence[Row]]) -> AsyncIterator[bytes]:
+    """One JSON object per line; Decimals as strings so amounts stay exact."""
+    
+    async for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=_json_default) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+
+async def gzip_stream(blocks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    
+    async for block in blocks:
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    
+    yield compressor.flush()
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,132 @@
+from dataclasses import dataclass, field
+from typing import List, Dict, Any
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Ledger values recomputed from the raw pagos table (plus the per-cuota totals
+# of archived partitions); both reconcile queries select only the rows whose
+# stored values differ. The cuota estado follows PaymentService.schedule_status;
+# a 'pendiente' cuota already due is the aging job's to move, not drift.
+SCHEDULE_DRIFT_SQL = """
+    SELECT ps.schedule_id, ps.credito_id,
+           ps.monto_pagado AS stored_monto_pagado, t.total AS monto_pagado,
+           ps.saldo_pendiente AS stored_saldo_pendiente, ps.valor_cuota - t.total AS saldo_pendiente,
+           ps.estado AS stored_estado, e.estado
+    FROM core.payment_schedule ps
+    JOIN (
+        SELECT s.schedule_id, COALESCE(SUM(p.monto), 0) + COALESCE(MAX(a.monto), 0) AS total
+        FROM core.payment_schedule s
+        LEFT JOIN core.pagos p ON p.schedule_id = s.schedule_id
+        LEFT JOIN core.pagos_archivados a ON a.schedule_id = s.schedule_id
+        GROUP BY s.schedule_id
+    ) t ON t.schedule_id = ps.schedule_id
+    CROSS JOIN LATERAL (
+        SELECT CASE
+                   WHEN t.total >= ps.valor_cuota THEN 'pagada'
+                   WHEN t.total > 0 THEN 'parcial'
+                   WHEN ps.fecha_vencimiento < CURRENT_DATE THEN 'vencida'
+                   ELSE 'pendiente'
+               END AS estado
+    ) e
+    WHERE ps.monto_pagado <> t.total
+       OR ps.saldo_pendiente <> ps.valor_cuota - t.total
+       OR (ps.estado <> e.estado AND NOT (ps.estado = 'pendiente' AND e.estado = 'vencida'))
+"""
+
+CREDIT_TOTALS_SQL = """
+    SELECT c.credito_id,
+           COALESCE(SUM(s.monto_pagado), 0) AS monto_pagado,
+           c.inversion - COALESCE(SUM(s.monto_pagado), 0) AS saldo_pendiente,
+           COUNT(s.schedule_id) FILTER (WHERE s.estado = 'pendiente') AS cuotas_pendientes,
+           COUNT(s.schedule_id) FILTER (WHERE s.estado = 'parcial') AS cuotas_parciales,
+           COUNT(s.schedule_id) FILTER (WHERE s.estado = 'pagada') AS cuotas_pagadas,
+           COUNT(s.schedule_id) FILTER (WHERE s.estado = 'vencida') AS cuotas_vencidas,
+           MIN(s.fecha_vencimiento) FILTER (WHERE s.estado <> 'pagada') AS fecha_primera_impaga
+    FROM core.creditos c
+    LEFT JOIN core.payment_schedule s ON s.credito_id = c.credito_id
+    GROUP BY c.credito_id
+"""
+
+CREDIT_DRIFT_SQL = f"""
+    SELECT c.credito_id,
+           c.monto_pagado AS stored_monto_pagado, t.monto_pagado,
+           c.saldo_pendiente AS stored_saldo_pendiente, t.saldo_pendiente,
+           c.cuotas_pendientes AS stored_cuotas_pendientes, t.cuotas_pendientes,
+           c.cuotas_parciales AS stored_cuotas_parciales, t.cuotas_parciales,
+           c.cuotas_pagadas AS stored_cuotas_pagadas, t.cuotas_pagadas,
+           c.cuotas_vencidas AS stored_cuotas_vencidas, t.cuotas_vencidas,
+           c.fecha_primera_impaga AS stored_fecha_primera_impaga, t.fecha_primera_impaga
+    FROM core.creditos c
+    JOIN ({CREDIT_TOTALS_SQL}) t ON t.credito_id = c.credito_id
+    WHERE (c.monto_pagado, c.saldo_pendiente, c.cuotas_pendientes,
+           c.cuotas_parciales, c.cuotas_pagadas, c.cuotas_vencidas, c.fecha_primera_impaga)
+       IS DISTINCT FROM
+          (t.monto_pagado, t.saldo_pendiente, t.cuotas_pendientes,
+           t.cuotas_parciales, t.cuotas_pagadas, t.cuotas_vencidas, t.fecha_primera_impaga)
+"""
+
+
+@dataclass
+class LedgerReport:
+    schedule_drift: List[Dict[str, Any]] = field(default_factory=list)
+    credit_drift: List[Dict[str, Any]] = field(default_factory=list)
+    repaired: bool = False
+    
+    @property
+    def consistent(self) -> bool:
+        return not self.schedule_drift and not self.credit_drift
+
+
+class LedgerService:
+    """
+    Verifies the denormalized balances on payment_schedule/creditos against
+    core.pagos and, optionally, repairs them. Cuota estados are repaired
+    before the credit counters are recomputed from them.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def reconcile(self, repair: bool = False) -> LedgerReport:
+        
+        if repair:
+            # Block payment posting (but not reads) while the ledger is rebuilt
+            self.db.execute(text("LOCK TABLE core.pagos IN SHARE MODE"))
+        
+        report = LedgerReport(
+            schedule_drift=[dict(r._mapping) for r in self.db.execute(text(SCHEDULE_DRIFT_SQL))]
+        )
+        
+        if repair and report.schedule_drift:
+            self.db.execute(text(f"""
+                UPDATE core.payment_schedule ps
+                SET monto_pagado = d.monto_pagado,
+                    saldo_pendiente = d.saldo_pendiente,
+                    estado = d.estado
+                FROM ({SCHEDULE_DRIFT_SQL}) d
+                WHERE d.schedule_id = ps.schedule_id
+            """))
+        
+        report.credit_drift = [dict(r._mapping) for r in self.db.execute(text(CREDIT_DRIFT_SQL))]
+        
+        if repair and report.credit_drift:
+            self.db.execute(text(f"""
+                UPDATE core.creditos c
+                SET monto_pagado = d.monto_pagado,
+                    saldo_pendiente = d.saldo_pendiente,
+                    cuotas_pendientes = d.cuotas_pendientes,
+                    cuotas_parciales = d.cuotas_parciales,
+                    cuotas_pagadas = d.cuotas_pagadas,
+                    cuotas_vencidas = d.cuotas_vencidas,
+                    fecha_primera_impaga = d.fecha_primera_impaga
+                FROM ({CREDIT_DRIFT_SQL}) d
+                WHERE d.credito_id = c.credito_id
+            """))
+        
+        if repair:
+            self.db.commit()
+            report.repaired = not report.consistent
+        else:
+            self.db.rollback()
+        
+        return report
@@ -0,0 +1,200 @@
+import gzip
+import os
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.services.amortization_service import add_months
+
+# Monthly partitions currently attached to core.pagos (the default partition excluded)
+PARTITIONS_SQL = """
+    SELECT c.relname AS particion, to_date(substr(c.relname, 7), 'YYYY_MM') AS desde
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'core.pagos'::regclass
+      AND c.relname ~ '^pagos_[0-9]{4}_[0-9]{2}$'
+    ORDER BY c.relname
+"""
+
+# Pagos and amount of one partition
+PARTITION_CHECK_SQL = """
+    SELECT COUNT(*) AS pagos, COALESCE(SUM(monto), 0) AS monto
+    FROM core.{particion}
+"""
+
+# Per-cuota totals leaving core.pagos, so the ledger still reconciles
+ARCHIVED_TOTALS_SQL = """
+    INSERT INTO core.pagos_archivados AS a (schedule_id, pagos, monto)
+    SELECT schedule_id, COUNT(*), SUM(monto)
+    FROM core.{particion}
+    GROUP BY schedule_id
+    ON CONFLICT (schedule_id) DO UPDATE
+    SET pagos = a.pagos + EXCLUDED.pagos,
+        monto = a.monto + EXCLUDED.monto
+"""
+
+EXPORT_SQL = """
+    COPY (
+        SELECT pago_id, schedule_id, fecha_pago, monto, medio
+        FROM core.{archivo}
+        ORDER BY fecha_pago, pago_id
+    ) TO STDOUT WITH (FORMAT csv, HEADER)
+"""
+
+
+def archive_name(particion: str) -> str:
+    """core.pagos_archivo partition holding an archived ``pagos_AAAA_MM`` month."""
+    
+    return particion.replace("pagos_", "pagos_archivo_", 1)
+
+
+class PartitionService:
+    """
+    Monthly partitions of core.pagos (see sql/10_pagos_particiones.sql).
+    
+    ``ensure`` creates the partitions ahead of time; ``archive`` moves the
+    months older than the retention window out of core.pagos, whatever the
+    state of their credits, into core.pagos_archivo (where per-credit
+    history still reads them) and exports each to a gzip CSV file.
+    Detaching fires no triggers, so the daily collections rollup keeps
+    those pagos.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def ensure(self, desde: Optional[date] = None, months_ahead: Optional[int] = None) -> int:
+        """
+        Create the partitions from ``desde`` (default: this month) to
+        ``months_ahead`` months from now, plus any month with rows in the
+        default partition. Returns partitions created.
+        """
+        
+        created = self.db.execute(
+            text("SELECT core.asegurar_particiones_pagos(:meses, :desde)"),
+            {"meses": settings.pagos_partitions_ahead if months_ahead is None else months_ahead, "desde": desde}
+        ).scalar()
+        self.db.commit()
+        
+        return created
+    
+    def archivable(self, before: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        Attached months ending on or before ``before`` (default:
+        ``pagos_archive_after_months`` before the current month; never later
+        than the current month) with their pagos count and amount.
+        """
+        
+        current = date.today().replace(day=1)
+        cutoff = min(before or add_months(current, -settings.pagos_archive_after_months), current)
+        
+        months = []
+        for row in self.db.execute(text(PARTITIONS_SQL)).all():
+            hasta = add_months(row.desde, 1)
+            if hasta > cutoff:
+                continue
+            
+            check = self.db.execute(text(PARTITION_CHECK_SQL.format(particion=row.particion))).one()
+            months.append({"particion": row.particion, "desde": row.desde, "hasta": hasta, **check._mapping})
+        
+        self.db.rollback()
+        
+        return months
+    
+    def archive(self, out_dir: Optional[str] = None, before: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        Move every archivable month into core.pagos_archivo and export it.
+        
+        Returns the months archived, each with the file it was written to.
+        A month archived by an interrupted run is exported on the next one.
+        """
+        
+        out = Path(out_dir or settings.pagos_archive_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        
+        months = self.archivable(before)
+        for month in months:
+            self._move(month)
+            month["archivo"] = self._export(month["particion"], out)
+        
+        for pending in self.db.execute(text("""
+            SELECT particion FROM core.pagos_archivos
+            WHERE archivo IS NULL AND to_regclass('core.' || replace(particion, 'pagos_', 'pagos_archivo_')) IS NOT NULL
+        """)).scalars().all():
+            self._export(pending, out)
+        
+        return months
+    
+    def _move(self, month: Dict[str, Any]) -> None:
+        particion = month["particion"]
+        archivo = archive_name(particion)
+        
+        # Backdated pagos into this month wait until the move commits, so
+        # the totals cover exactly what is moved. One racing the detach can
+        # deadlock with it; Postgres aborts either side and a rerun picks
+        # the month up again.
+        self.db.execute(text(f"LOCK TABLE core.{particion} IN SHARE MODE"))
+        check = self.db.execute(text(PARTITION_CHECK_SQL.format(particion=particion))).one()
+        
+        self.db.execute(text(ARCHIVED_TOTALS_SQL.format(particion=particion)))
+        self.db.execute(
+            text("""
+                INSERT INTO core.pagos_archivos AS a (particion, desde, hasta, pagos, monto)
+                VALUES (:particion, :desde, :hasta, :pagos, :monto)
+                ON CONFLICT (particion) DO UPDATE
+                SET pagos = a.pagos + EXCLUDED.pagos,
+                    monto = a.monto + EXCLUDED.monto,
+                    archivo = NULL,
+                    archivado_en = now()
+            """),
+            {
+                "particion": particion,
+                "desde": month["desde"],
+                "hasta": month["hasta"],
+                "pagos": check.pagos,
+                "monto": check.monto
+            }
+        )
+        self.db.execute(text(f"ALTER TABLE core.pagos DETACH PARTITION core.{particion}"))
+        
+        # A month archived before (then backdated into) already has its
+        # archive partition: merge the new rows into it
+        if self.db.execute(text("SELECT to_regclass(:name)"), {"name": f"core.{archivo}"}).scalar():
+            self.db.execute(text(f"""
+                INSERT INTO core.{archivo} (pago_id, schedule_id, fecha_pago, monto, medio)
+                SELECT pago_id, schedule_id, fecha_pago, monto, medio FROM core.{particion}
+            """))
+            self.db.execute(text(f"DROP TABLE core.{particion}"))
+        else:
+            self.db.execute(text(f"ALTER TABLE core.{particion} RENAME TO {archivo}"))
+            self.db.execute(text(f"""
+                ALTER TABLE core.pagos_archivo ATTACH PARTITION core.{archivo}
+                FOR VALUES FROM ('{month["desde"]}') TO ('{month["hasta"]}')
+            """))
+        
+        self.db.commit()
+        
+        month.update(pagos=check.pagos, monto=check.monto)
+    
+    def _export(self, particion: str, out: Path) -> str:
+        path = out / f"{particion}.csv.gz"
+        partial = path.with_name(path.name + ".partial")
+        
+        cursor = self.db.connection().connection.dbapi_connection.cursor()
+        try:
+            with gzip.open(partial, "wb") as file:
+                cursor.copy_expert(EXPORT_SQL.format(archivo=archive_name(particion)), file)
+        finally:
+            cursor.close()
+        
+        os.replace(partial, path)
+        
+        self.db.execute(
+            text("UPDATE core.pagos_archivos SET archivo = :archivo WHERE particion = :particion"),
+            {"archivo": str(path), "particion": particion}
+        )
+        self.db.commit()
+        
+        return str(path)
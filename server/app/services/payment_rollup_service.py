@@ -0,0 +1,145 @@
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+GROUP_COLUMNS = ("medio", "producto", "ciudad")
+# Stored as '' when the pago or client has none; served back as None
+OPTIONAL_COLUMNS = ("medio", "ciudad")
+PERIODS = {
+    "dia": "fecha",
+    "semana": "CAST(date_trunc('week', fecha) AS date)",
+}
+
+# Rollup rows plus deltas not yet compacted; identical totals either way.
+PAGOS_DIARIOS_SQL = """
+    SELECT fecha, medio, producto, ciudad, pagos, monto
+    FROM core.pagos_diarios
+    UNION ALL
+    SELECT fecha, medio, producto, ciudad, pagos, monto
+    FROM core.pagos_diarios_deltas
+"""
+
+COMPACT_SQL = """
+    WITH moved AS (
+        DELETE FROM core.pagos_diarios_deltas
+        RETURNING fecha, medio, producto, ciudad, pagos, monto
+    ), folded AS (
+        INSERT INTO core.pagos_diarios AS r (fecha, medio, producto, ciudad, pagos, monto)
+        SELECT fecha, medio, producto, ciudad, SUM(pagos), SUM(monto)
+        FROM moved
+        GROUP BY fecha, medio, producto, ciudad
+        ON CONFLICT (fecha, medio, producto, ciudad) DO UPDATE
+        SET pagos = r.pagos + EXCLUDED.pagos,
+            monto = r.monto + EXCLUDED.monto
+    )
+    SELECT COUNT(*) FROM moved
+"""
+
+
+class PaymentRollupService:
+    """
+    Collections time series served from core.pagos_diarios (fed by triggers
+    on pagos/creditos/clientes, see sql/09_pagos_diarios.sql). Reads cost
+    the days and groups in the range, not the number of pagos.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def series(
+        self,
+        desde: date,
+        hasta: date,
+        periodo: str = "dia",
+        group_by: Sequence[str] = (),
+        medio: Optional[str] = None,
+        producto: Optional[str] = None,
+        ciudad: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Pagos and amount collected per day (or ISO week, Monday first) of
+        fecha_pago between ``desde`` and ``hasta``, split by ``group_by``.
+        Weeks cut by the range only count its days.
+        """
+        
+        groups = [column for column in GROUP_COLUMNS if column in group_by]
+        keys = ", ".join(str(n) for n in range(1, len(groups) + 2))
+        filters, params = self._filters(medio, producto, ciudad)
+        params.update(desde=desde, hasta=hasta)
+        
+        rows = self.db.execute(text(f"""
+            SELECT {", ".join([PERIODS[periodo] + " AS periodo", *groups])},
+                   SUM(pagos) AS pagos,
+                   SUM(monto) AS monto
+            FROM ({PAGOS_DIARIOS_SQL}) recaudo
+            WHERE fecha BETWEEN :desde AND :hasta{filters}
+            GROUP BY {keys}
+            HAVING SUM(pagos) <> 0
+            ORDER BY {keys}
+        """), params).all()
+        
+        optional = [column for column in OPTIONAL_COLUMNS if column in groups]
+        
+        return [
+            {**row._mapping, **{column: row._mapping[column] or None for column in optional}}
+            for row in rows
+        ]
+    
+    def totals(self) -> Dict[str, Any]:
+        """All-time pagos and amount per medio (None for pagos without one)."""
+        
+        rows = self.db.execute(text(f"""
+            SELECT medio, SUM(pagos) AS pagos, SUM(monto) AS monto
+            FROM ({PAGOS_DIARIOS_SQL}) recaudo
+            GROUP BY medio
+        """)).all()
+        
+        return {row.medio or None: (row.pagos, row.monto) for row in rows}
+    
+    def compact(self) -> int:
+        """Fold pending trigger deltas into the rollup. Returns delta rows folded."""
+        
+        folded = self.db.execute(text(COMPACT_SQL)).scalar()
+        self.db.execute(text("DELETE FROM core.pagos_diarios WHERE pagos = 0 AND monto = 0"))
+        self.db.commit()
+        
+        return folded
+    
+    def rebuild(self) -> None:
+        """
+        Recompute the rollup from pagos, archived months included (after
+        bulk loads or to fix drift).
+        """
+        
+        # Writers block on their delta insert until the rebuild commits, so
+        # every pago is either in the recomputed totals or in a later delta
+        self.db.execute(text("LOCK TABLE core.pagos_diarios_deltas IN EXCLUSIVE MODE"))
+        self.db.execute(text("DELETE FROM core.pagos_diarios_deltas"))
+        self.db.execute(text("DELETE FROM core.pagos_diarios"))
+        self.db.execute(text("""
+            INSERT INTO core.pagos_diarios (fecha, medio, producto, ciudad, pagos, monto)
+            SELECT p.fecha_pago::date, COALESCE(p.medio, ''), c.producto, COALESCE(cl.ciudad, ''), COUNT(*), SUM(p.monto)
+            FROM (
+                SELECT schedule_id, fecha_pago, monto, medio FROM core.pagos
+                UNION ALL
+                SELECT schedule_id, fecha_pago, monto, medio FROM core.pagos_archivo
+            ) p
+            JOIN core.payment_schedule ps ON ps.schedule_id = p.schedule_id
+            JOIN core.creditos c ON c.credito_id = ps.credito_id
+            JOIN core.clientes cl ON cl.cliente_id = c.cliente_id
+            GROUP BY 1, 2, 3, 4
+        """))
+        self.db.commit()
+    
+    @staticmethod
+    def _filters(medio: Optional[str], producto: Optional[str], ciudad: Optional[str]):
+        conditions = ""
+        params: Dict[str, Any] = {}
+        
+        for column, value in (("medio", medio), ("producto", producto), ("ciudad", ciudad)):
+            if value:
+                conditions += f" AND {column} = :{column}"
+                params[column] = value
+        
+        return conditions, params
@@ -1,17 +1,166 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, desc
-from app.models.models import Credito, PaymentSchedule, Pago, Cliente
-from app.schemas.payment import PaymentScheduleResponse, PagoResponse, PaymentSummary
-from app.schemas.credito import CreditoSummary
+from sqlalchemy import Select, Subquery, func, and_, any_, bindparam, insert, literal, select, true, tuple_, union_all, update, BigInteger, Date
+from sqlalchemy.dialects.postgresql import ARRAY
+from app.core.cache import credit_cache
+from app.models.models import Credito, PaymentSchedule, Pago, PagoArchivo, Cliente
+from app.schemas.payment import PaymentScheduleResponse, PagoResponse, PaymentSummary, OverdueCuotaResponse
+from app.schemas.credito import CreditoResponse, CreditoSummary, CreditoWithSchedule
+
+# Credito counter column for each cuota estado
+ESTADO_COUNTERS = {
+    'pendiente': 'cuotas_pendientes',
+    'parcial': 'cuotas_parciales',
+    'pagada': 'cuotas_pagadas',
+    'vencida': 'cuotas_vencidas',
+}
+
+# Plain-row views of a credit's schedule, in PaymentScheduleResponse / PagoResponse field order
+SCHEDULE_ROW_COLUMNS = (
+    PaymentSchedule.credito_id,
+    PaymentSchedule.num_cuota,
+    PaymentSchedule.fecha_vencimiento,
+    PaymentSchedule.valor_cuota,
+    PaymentSchedule.estado,
+    PaymentSchedule.schedule_id,
+    PaymentSchedule.monto_pagado,
+    PaymentSchedule.saldo_pendiente,
+)
+
+PAGO_ROW_COLUMNS = (
+    Pago.schedule_id,
+    Pago.fecha_pago,
+    Pago.monto,
+    Pago.medio,
+    Pago.pago_id,
+)
+
+
+def oldest_unpaid_due_date(paid_schedule_id: Optional[int] = None):
+    """
+    Correlated subquery for a credit's oldest non-pagada cuota due date (its days-past-due anchor).
+    
+    ``paid_schedule_id`` is a cuota paid off by the same statement, whose
+    update the subquery's snapshot does not see yet.
+    """
+    
+    conditions = [PaymentSchedule.credito_id == Credito.credito_id, PaymentSchedule.estado != 'pagada']
+    if paid_schedule_id is not None:
+        conditions.append(PaymentSchedule.schedule_id != paid_schedule_id)
+    
+    return select(func.min(PaymentSchedule.fecha_vencimiento)).where(*conditions).scalar_subquery()
+
+
+def fecha_pago_window(desde: Optional[date] = None, hasta: Optional[date] = None, column=Pago.fecha_pago) -> list:
+    """
+    Conditions for pagos made on ``desde .. hasta`` (inclusive days).
+    
+    They compare the bare partition key, so the planner (or the executor,
+    for prepared statements) only scans the monthly partitions of
+    core.pagos that overlap the range.
+    """
+    
+    conditions = []
+    if desde:
+        conditions.append(column >= desde)
+    if hasta:
+        conditions.append(column < hasta + timedelta(days=1))
+    
+    return conditions
+
+
+def credit_pagos_window(
+    credito_id: Optional[int] = None,
+    schedule_id: Optional[int] = None,
+    column=Pago.fecha_pago
+) -> list:
+    """
+    Lower bound on fecha_pago for one credit's (or one cuota's) pagos.
+    
+    No pago predates its credit's fecha_desembolso (posting rejects them),
+    so bounding by it lets the executor skip the partitions of every
+    earlier month; the bound is an InitPlan, pruned at execution time.
+    """
+    
+    desembolso = select(Credito.fecha_desembolso)
+    if schedule_id is not None:
+        desembolso = desembolso.join(
+            PaymentSchedule, PaymentSchedule.credito_id == Credito.credito_id
+        ).where(PaymentSchedule.schedule_id == schedule_id)
+    else:
+        desembolso = desembolso.where(Credito.credito_id == credito_id)
+    
+    return [column >= desembolso.scalar_subquery()]
+
+
+def pagos_union(
+    credito_id: Optional[int] = None,
+    schedule_id: Optional[int] = None,
+    pago_id: Optional[int] = None,
+    medio: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    estado: Optional[str] = None
+) -> Subquery:
+    """
+    core.pagos plus the months archived to core.pagos_archivo, as one
+    ``pagos`` subquery with the PAGO_ROW_COLUMNS columns.
+    
+    Every filter is applied to both sides. Per-credit and per-cuota reads
+    also carry the fecha_desembolso bound, so for credits disbursed after
+    the last archived month the archive is pruned away entirely.
+    """
+    
+    parts = []
+    for table in (Pago.__table__, PagoArchivo.__table__):
+        query = select(table.c.schedule_id, table.c.fecha_pago, table.c.monto, table.c.medio, table.c.pago_id)
+        
+        if schedule_id is not None:
+            query = query.where(table.c.schedule_id == schedule_id)
+        if credito_id is not None or estado:
+            query = query.join(PaymentSchedule, PaymentSchedule.schedule_id == table.c.schedule_id)
+        if credito_id is not None:
+            query = query.where(PaymentSchedule.credito_id == credito_id)
+        if estado:
+            query = query.where(PaymentSchedule.estado == estado)
+        if credito_id is not None or schedule_id is not None:
+            query = query.where(*credit_pagos_window(credito_id, schedule_id, column=table.c.fecha_pago))
+        if pago_id is not None:
+            query = query.where(table.c.pago_id == pago_id)
+        if medio:
+            query = query.where(table.c.medio == medio)
+        
+        parts.append(query.where(*fecha_pago_window(desde, hasta, column=table.c.fecha_pago)))
+    
+    return union_all(*parts).subquery("pagos")
+
+
+def pagos_history(
+    credito_id: Optional[int] = None,
+    schedule_id: Optional[int] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    estado: Optional[str] = None
+) -> Select:
+    """One credit's (or one cuota's) pagos, archived months included, newest first."""
+    
+    history = pagos_union(credito_id=credito_id, schedule_id=schedule_id, desde=desde, hasta=hasta, estado=estado)
+    
+    return select(history).order_by(history.c.fecha_pago.desc())
+
+
+class PaymentRejected(Exception):
+    """A payment that cannot be applied to its cuota (e.g. it exceeds the balance)."""
 
 
 class PaymentService:
     
     def __init__(self, db: Session):
         self.db = db
+        # Sessions from get_read_db may be on a lagging replica (see CreditCache.load)
+        self.replica = bool(db.info.get("replica"))
     
     def get_payment_schedule(
         self, 
@@ -19,157 +168,518 @@ class PaymentService:
         include_payments: bool = True
     ) -> List[PaymentScheduleResponse]:
         
-        query = self.db.query(PaymentSchedule).filter(
-            PaymentSchedule.credito_id == credito_id
-        ).order_by(PaymentSchedule.num_cuota)
+        return [
+            PaymentScheduleResponse(**row)
+            for row in self.get_schedule_rows(credito_id, include_payments)
+        ]
+    
+    def get_schedule_rows(self, credito_id: int, include_payments: bool = True) -> List[Dict[str, Any]]:
+        """
+        The schedule as plain dicts shaped like ``PaymentScheduleResponse``,
+        for endpoints that encode it directly (``FastJSONResponse``). The
+        rows may be shared with the cache and must not be mutated.
+        """
         
-        schedules = query.all()
+        if not credit_cache.enabled:
+            return self._load_schedule(credito_id, include_payments)
         
-        result = []
-        for schedule in schedules:
-            payments = self.db.query(Pago).filter(
-                Pago.schedule_id == schedule.schedule_id
-            ).order_by(desc(Pago.fecha_pago)).all()
-            
-            monto_pagado = sum(p.monto for p in payments) if payments else Decimal('0.00')
-            saldo_pendiente = schedule.valor_cuota - monto_pagado
-            
-            today = date.today()
-            dias_vencimiento = (today - schedule.fecha_vencimiento).days
-            
-            schedule_response = PaymentScheduleResponse(
-                schedule_id=schedule.schedule_id,
-                credito_id=schedule.credito_id,
-                num_cuota=schedule.num_cuota,
-                fecha_vencimiento=schedule.fecha_vencimiento,
-                valor_cuota=schedule.valor_cuota,
-                estado=schedule.estado,
-                monto_pagado=monto_pagado,
-                saldo_pendiente=saldo_pendiente,
-                dias_vencimiento=dias_vencimiento,
-                pagos=[PagoResponse.model_validate(p) for p in payments] if include_payments else []
-            )
-            
-            result.append(schedule_response)
+        schedule = credit_cache.load(
+            credito_id,
+            'schedule',
+            lambda: self._load_schedule(credito_id, include_payments=True),
+            replica=self.replica
+        )
         
-        return result
+        if include_payments:
+            return schedule
+        
+        return [{**row, 'pagos': []} for row in schedule]
     
     def get_credit_summary(self, credito_id: int) -> Optional[CreditoSummary]:
         
-        credito = self.db.query(Credito).filter(Credito.credito_id == credito_id).first()
-        if not credito:
+        views = self._get_credito_views(credito_id)
+        
+        return views[1] if views else None
+    
+    def get_credit_summaries(
+        self,
+        credito_ids: Optional[List[int]] = None,
+        cliente_id: Optional[int] = None,
+        producto: Optional[str] = None,
+        estado: Optional[str] = None,
+        limit: Optional[int] = None,
+        extra_columns: Sequence[Any] = ()
+    ) -> List[Dict[str, Any]]:
+        """
+        Summaries plus the next unpaid cuota of many credits in one statement,
+        as plain dicts shaped like ``CreditoBatchSummary``, ordered by credito_id.
+        ``extra_columns`` (``Credito`` columns) are added to each dict by name.
+        
+        Totals come from the ledger columns; the next cuota is a ``LATERAL``
+        ``LIMIT 1`` probe of ``ix_ps_credito_cuota`` per credit, so the cost
+        grows linearly with the number of credits. Ids are bound as a single
+        array parameter.
+        """
+        
+        next_cuota = select(
+            PaymentSchedule.schedule_id,
+            PaymentSchedule.num_cuota,
+            PaymentSchedule.fecha_vencimiento,
+            PaymentSchedule.valor_cuota,
+            PaymentSchedule.estado,
+            PaymentSchedule.monto_pagado,
+            PaymentSchedule.saldo_pendiente
+        ).where(
+            PaymentSchedule.credito_id == Credito.credito_id,
+            PaymentSchedule.estado != 'pagada'
+        ).order_by(PaymentSchedule.fecha_vencimiento, PaymentSchedule.num_cuota).limit(1).lateral("next_cuota")
+        
+        query = select(
+            Credito.credito_id,
+            Credito.cliente_id,
+            Credito.producto,
+            Credito.inversion,
+            Credito.estado,
+            Credito.monto_pagado,
+            Credito.saldo_pendiente,
+            Credito.cuotas_pendientes,
+            Credito.cuotas_parciales,
+            Credito.cuotas_pagadas,
+            Credito.cuotas_vencidas,
+            Credito.fecha_primera_impaga,
+            *[column.label(f"extra_{column.key}") for column in extra_columns],
+            *[column.label(f"next_{column.key}") for column in next_cuota.c]
+        ).outerjoin(next_cuota, true()).order_by(Credito.credito_id)
+        
+        if credito_ids is not None:
+            query = query.where(Credito.credito_id == any_(
+                bindparam("credito_ids", credito_ids, type_=ARRAY(BigInteger))
+            ))
+        
+        if cliente_id:
+            query = query.where(Credito.cliente_id == cliente_id)
+        
+        if producto:
+            query = query.where(Credito.producto == producto)
+        
+        if estado:
+            query = query.where(Credito.estado == estado)
+        
+        if limit:
+            query = query.limit(limit)
+        
+        today = date.today()
+        summaries = []
+        
+        for row in self.db.execute(query):
+            next_payment = None
+            if row.next_schedule_id is not None:
+                next_payment = {
+                    'schedule_id': row.next_schedule_id,
+                    'credito_id': row.credito_id,
+                    'num_cuota': row.next_num_cuota,
+                    'fecha_vencimiento': row.next_fecha_vencimiento,
+                    'valor_cuota': row.next_valor_cuota,
+                    'estado': row.next_estado,
+                    'monto_pagado': row.next_monto_pagado,
+                    'saldo_pendiente': row.next_saldo_pendiente,
+                    'dias_vencimiento': (today - row.next_fecha_vencimiento).days,
+                }
+            
+            summaries.append({
+                'credito_id': row.credito_id,
+                'producto': row.producto,
+                'inversion': row.inversion,
+                'cuotas_totales': (
+                    row.cuotas_pendientes + row.cuotas_parciales + row.cuotas_pagadas + row.cuotas_vencidas
+                ),
+                'cuotas_pagadas': row.cuotas_pagadas,
+                'cuotas_vencidas': row.cuotas_vencidas,
+                'cuotas_pendientes': row.cuotas_pendientes + row.cuotas_parciales,
+                'monto_pagado': row.monto_pagado,
+                'saldo_pendiente': row.saldo_pendiente,
+                'estado': row.estado,
+                'cliente_id': row.cliente_id,
+                'dias_mora': max((today - row.fecha_primera_impaga).days, 0) if row.fecha_primera_impaga else 0,
+                'next_payment': next_payment,
+                **{column.key: row._mapping[f"extra_{column.key}"] for column in extra_columns},
+            })
+        
+        return summaries
+    
+    def get_credito_with_schedule(
+        self,
+        credito_id: int,
+        include_schedule: bool = True,
+        include_payments: bool = True
+    ) -> Optional[CreditoWithSchedule]:
+        
+        views = self._get_credito_views(credito_id)
+        if not views:
             return None
         
-        schedule_stats = self.db.query(
-            func.count(PaymentSchedule.schedule_id).label('total_cuotas'),
-            func.count(func.case((PaymentSchedule.estado == 'pagada', 1))).label('cuotas_pagadas'),
-            func.count(func.case((PaymentSchedule.estado == 'vencida', 1))).label('cuotas_vencidas'),
-            func.count(func.case((PaymentSchedule.estado.in_(['pendiente', 'parcial']), 1))).label('cuotas_pendientes')
-        ).filter(PaymentSchedule.credito_id == credito_id).first()
+        credito, summary = views
+        
+        if not include_schedule:
+            return CreditoWithSchedule(**credito.model_dump())
         
-        payment_amounts = self.db.query(
-            func.coalesce(func.sum(Pago.monto), 0).label('monto_pagado')
-        ).join(PaymentSchedule).filter(PaymentSchedule.credito_id == credito_id).first()
+        return CreditoWithSchedule(
+            **credito.model_dump(),
+            payment_schedule=self.get_payment_schedule(credito_id, include_payments),
+            summary=summary
+        )
+    
+    def get_credito_document(
+        self,
+        credito_id: int,
+        include_schedule: bool = True,
+        include_payments: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """``get_credito_with_schedule`` as a plain dict, without building the schedule models."""
+        
+        views = self._get_credito_views(credito_id)
+        if not views:
+            return None
         
-        monto_pagado = payment_amounts.monto_pagado if payment_amounts else Decimal('0.00')
-        saldo_pendiente = credito.inversion - monto_pagado
+        credito, summary = views
+        document = credito.model_dump()
+        
+        if not include_schedule:
+            document.update(payment_schedule=[], summary=None)
+            return document
+        
+        document.update(
+            payment_schedule=self.get_schedule_rows(credito_id, include_payments),
+            summary=summary.model_dump()
+        )
+        
+        return document
+    
+    def _get_credito_views(self, credito_id: int) -> Optional[Tuple[CreditoResponse, CreditoSummary]]:
+        
+        def _load():
+            credito = self.db.query(Credito).filter(Credito.credito_id == credito_id).first()
+            if not credito:
+                return None
+            
+            return CreditoResponse.model_validate(credito), self.summarize_credito(credito)
+        
+        return credit_cache.load(credito_id, 'credito', _load, replica=self.replica)
+    
+    @staticmethod
+    def summarize_credito(credito: Credito) -> CreditoSummary:
+        """Build the summary from the credit's ledger columns, without touching pagos."""
         
         return CreditoSummary(
             credito_id=credito.credito_id,
             producto=credito.producto,
             inversion=credito.inversion,
-            cuotas_totales=schedule_stats.total_cuotas,
-            cuotas_pagadas=schedule_stats.cuotas_pagadas,
-            cuotas_vencidas=schedule_stats.cuotas_vencidas,
-            cuotas_pendientes=schedule_stats.cuotas_pendientes,
-            monto_pagado=monto_pagado,
-            saldo_pendiente=saldo_pendiente,
+            cuotas_totales=(
+                credito.cuotas_pendientes + credito.cuotas_parciales
+                + credito.cuotas_pagadas + credito.cuotas_vencidas
+            ),
+            cuotas_pagadas=credito.cuotas_pagadas,
+            cuotas_vencidas=credito.cuotas_vencidas,
+            cuotas_pendientes=credito.cuotas_pendientes + credito.cuotas_parciales,
+            monto_pagado=credito.monto_pagado,
+            saldo_pendiente=credito.saldo_pendiente,
             estado=credito.estado
         )
     
+    def _load_schedule(
+        self,
+        credito_id: int,
+        include_payments: bool
+    ) -> List[Dict[str, Any]]:
+        """
+        Load a credit's cuotas in a fixed number of statements: one for the
+        cuotas (balances come from the ledger columns) and, when requested,
+        one for all of their pagos. Rows are read as tuples, without ORM
+        instances or model validation.
+        """
+        
+        schedules = self.db.execute(
+            select(*SCHEDULE_ROW_COLUMNS).where(
+                PaymentSchedule.credito_id == credito_id
+            ).order_by(PaymentSchedule.num_cuota)
+        ).all()
+        
+        payments_by_schedule: Dict[int, List[Dict[str, Any]]] = {}
+        
+        if include_payments and schedules:
+            payments = self.db.execute(pagos_history(credito_id=credito_id)).all()
+            
+            for payment in payments:
+                payments_by_schedule.setdefault(payment.schedule_id, []).append(payment._asdict())
+        
+        today = date.today()
+        
+        return [
+            {
+                **schedule._asdict(),
+                'dias_vencimiento': (today - schedule.fecha_vencimiento).days,
+                'pagos': payments_by_schedule.get(schedule.schedule_id, []),
+            }
+            for schedule in schedules
+        ]
+    
+    @staticmethod
+    def _schedule_response(
+        schedule: PaymentSchedule,
+        today: date,
+        payments: Sequence[Any]
+    ) -> PaymentScheduleResponse:
+        
+        return PaymentScheduleResponse(
+            schedule_id=schedule.schedule_id,
+            credito_id=schedule.credito_id,
+            num_cuota=schedule.num_cuota,
+            fecha_vencimiento=schedule.fecha_vencimiento,
+            valor_cuota=schedule.valor_cuota,
+            estado=schedule.estado,
+            monto_pagado=schedule.monto_pagado,
+            saldo_pendiente=schedule.saldo_pendiente,
+            dias_vencimiento=(today - schedule.fecha_vencimiento).days,
+            pagos=[PagoResponse.model_validate(p) for p in payments]
+        )
+    
     def get_next_payment(self, credito_id: int) -> Optional[PaymentScheduleResponse]:
         
+        return credit_cache.load(
+            credito_id, 'next', lambda: self._load_next_payment(credito_id), replica=self.replica
+        )
+    
+    def _load_next_payment(self, credito_id: int) -> Optional[PaymentScheduleResponse]:
+        
         next_schedule = self.db.query(PaymentSchedule).filter(
             and_(
                 PaymentSchedule.credito_id == credito_id,
                 PaymentSchedule.estado.in_(['pendiente', 'parcial', 'vencida'])
             )
-        ).order_by(PaymentSchedule.fecha_vencimiento).first()
+        ).order_by(PaymentSchedule.fecha_vencimiento, PaymentSchedule.num_cuota).first()
         
         if not next_schedule:
             return None
         
-        payments = self.db.query(Pago).filter(
-            Pago.schedule_id == next_schedule.schedule_id
-        ).all()
+        payments = self.db.execute(pagos_history(schedule_id=next_schedule.schedule_id)).all()
         
-        monto_pagado = sum(p.monto for p in payments) if payments else Decimal('0.00')
-        saldo_pendiente = next_schedule.valor_cuota - monto_pagado
+        return self._schedule_response(next_schedule, date.today(), payments)
+    
+    def get_overdue_cuotas(
+        self,
+        cutoff_date: date,
+        size: int,
+        after: Optional[Tuple[date, int]] = None,
+        min_saldo: Optional[Decimal] = None,
+        ciudad: Optional[str] = None,
+        producto: Optional[str] = None
+    ) -> Tuple[List[OverdueCuotaResponse], bool]:
+        """
+        One page of overdue cuotas, keyset-paginated on (fecha_vencimiento, schedule_id).
+        
+        Fetches size + 1 rows in a single statement to know whether another
+        page exists.
+        """
         
         today = date.today()
-        dias_vencimiento = (today - next_schedule.fecha_vencimiento).days
         
-        return PaymentScheduleResponse(
-            schedule_id=next_schedule.schedule_id,
-            credito_id=next_schedule.credito_id,
-            num_cuota=next_schedule.num_cuota,
-            fecha_vencimiento=next_schedule.fecha_vencimiento,
-            valor_cuota=next_schedule.valor_cuota,
-            estado=next_schedule.estado,
-            monto_pagado=monto_pagado,
-            saldo_pendiente=saldo_pendiente,
-            dias_vencimiento=dias_vencimiento,
-            pagos=[PagoResponse.model_validate(p) for p in payments]
+        query = self.db.query(
+            PaymentSchedule.schedule_id,
+            PaymentSchedule.credito_id,
+            PaymentSchedule.num_cuota,
+            PaymentSchedule.fecha_vencimiento,
+            PaymentSchedule.valor_cuota,
+            PaymentSchedule.estado,
+            Credito.cliente_id,
+            Credito.producto,
+            Cliente.nombre.label('cliente_nombre'),
+            Cliente.ciudad,
+            PaymentSchedule.monto_pagado,
+            PaymentSchedule.saldo_pendiente,
+            (literal(today, Date) - PaymentSchedule.fecha_vencimiento).label('dias_vencimiento')
+        ).join(
+            Credito, Credito.credito_id == PaymentSchedule.credito_id
+        ).join(
+            Cliente, Cliente.cliente_id == Credito.cliente_id
+        ).filter(
+            PaymentSchedule.estado.in_(['vencida', 'parcial']),
+            PaymentSchedule.fecha_vencimiento <= cutoff_date
         )
+        
+        if after:
+            query = query.filter(
+                tuple_(PaymentSchedule.fecha_vencimiento, PaymentSchedule.schedule_id) > tuple_(*after)
+            )
+        
+        query = self._filter_overdue(query, min_saldo, ciudad, producto)
+        
+        rows = query.order_by(
+            PaymentSchedule.fecha_vencimiento,
+            PaymentSchedule.schedule_id
+        ).limit(size + 1).all()
+        
+        items = [OverdueCuotaResponse.model_validate(row._mapping) for row in rows[:size]]
+        
+        return items, len(rows) > size
+    
+    def overdue_count_query(
+        self,
+        cutoff_date: date,
+        min_saldo: Optional[Decimal] = None,
+        ciudad: Optional[str] = None,
+        producto: Optional[str] = None
+    ):
+        """
+        The cuotas ``get_overdue_cuotas`` pages through, for counting: it
+        joins creditos/clientes only when a filter needs them, so the
+        unfiltered count is served by ix_ps_overdue_keyset alone.
+        """
+        
+        query = self.db.query(PaymentSchedule.schedule_id).filter(
+            PaymentSchedule.estado.in_(['vencida', 'parcial']),
+            PaymentSchedule.fecha_vencimiento <= cutoff_date
+        )
+        
+        if ciudad or producto:
+            query = query.join(Credito, Credito.credito_id == PaymentSchedule.credito_id)
+        if ciudad:
+            query = query.join(Cliente, Cliente.cliente_id == Credito.cliente_id)
+        
+        return self._filter_overdue(query, min_saldo, ciudad, producto)
+    
+    @staticmethod
+    def _filter_overdue(query, min_saldo: Optional[Decimal], ciudad: Optional[str], producto: Optional[str]):
+        
+        if ciudad:
+            query = query.filter(Cliente.ciudad == ciudad)
+        
+        if producto:
+            query = query.filter(Credito.producto == producto)
+        
+        if min_saldo is not None:
+            query = query.filter(PaymentSchedule.saldo_pendiente >= min_saldo)
+        
+        return query
     
     def create_payment(self, schedule_id: int, monto: Decimal, medio: str = None) -> Optional[PagoResponse]:
+        """
+        Record a payment and move the ledger in two statements.
         
-        schedule = self.db.query(PaymentSchedule).filter(
-            PaymentSchedule.schedule_id == schedule_id
+        The cuota row is locked and validated first, so concurrent posts to
+        the same cuota are serialized and the balance check cannot be raced.
+        One statement then updates the cuota, inserts the pago and applies
+        the credit totals and counters as relative updates (data-modifying
+        CTEs, see ``_post_payment``).
+        """
+        
+        cuota = self.db.execute(
+            select(
+                PaymentSchedule.credito_id,
+                PaymentSchedule.valor_cuota,
+                PaymentSchedule.monto_pagado,
+                PaymentSchedule.saldo_pendiente,
+                PaymentSchedule.estado,
+                PaymentSchedule.fecha_vencimiento,
+                Credito.fecha_desembolso
+            ).join(
+                Credito, Credito.credito_id == PaymentSchedule.credito_id
+            ).where(PaymentSchedule.schedule_id == schedule_id).with_for_update(of=PaymentSchedule)
         ).first()
         
-        if not schedule:
+        if not cuota:
             return None
         
-        new_payment = Pago(
-            schedule_id=schedule_id,
-            fecha_pago=datetime.now(),
-            monto=monto,
-            medio=medio
-        )
+        fecha_pago = datetime.now()
+        
+        if fecha_pago.date() < cuota.fecha_desembolso:
+            self.db.rollback()
+            raise PaymentRejected(
+                f"Payment date is before the credit's disbursement ({cuota.fecha_desembolso})"
+            )
         
-        self.db.add(new_payment)
-        self.db.flush()
+        if monto > cuota.saldo_pendiente:
+            self.db.rollback()
+            raise PaymentRejected(
+                f"Payment amount exceeds remaining balance. "
+                f"Remaining: {cuota.saldo_pendiente}"
+            )
+        
+        new_status = self.schedule_status(cuota.valor_cuota, cuota.monto_pagado + monto, cuota.fecha_vencimiento)
         
-        self._update_schedule_status(schedule_id)
+        pago = self.db.execute(
+            self._post_payment(schedule_id, monto, medio, fecha_pago, cuota.estado, new_status)
+        ).one()
         
         self.db.commit()
         
-        return PagoResponse.model_validate(new_payment)
+        credit_cache.invalidate(cuota.credito_id)
+        
+        return PagoResponse.model_validate(pago)
     
-    def _update_schedule_status(self, schedule_id: int):
+    @staticmethod
+    def _post_payment(
+        schedule_id: int,
+        monto: Decimal,
+        medio: Optional[str],
+        fecha_pago: datetime,
+        old_status: str,
+        new_status: str
+    ):
+        """
+        ``UPDATE`` cuota, ``INSERT`` pago and ``UPDATE`` credit as one
+        statement returning the pago. The pago and the credit change are
+        driven by the cuota update's rows, and that update re-checks the
+        balance, so nothing is written if it does not hold.
+        """
         
-        schedule = self.db.query(PaymentSchedule).filter(
-            PaymentSchedule.schedule_id == schedule_id
-        ).first()
+        cuota = update(PaymentSchedule).where(
+            PaymentSchedule.schedule_id == schedule_id,
+            PaymentSchedule.saldo_pendiente >= monto
+        ).values(
+            monto_pagado=PaymentSchedule.monto_pagado + monto,
+            saldo_pendiente=PaymentSchedule.saldo_pendiente - monto,
+            estado=new_status
+        ).returning(PaymentSchedule.schedule_id, PaymentSchedule.credito_id).cte("cuota")
         
-        if not schedule:
-            return
+        pago = insert(Pago).from_select(
+            ["schedule_id", "fecha_pago", "monto", "medio"],
+            select(
+                cuota.c.schedule_id,
+                literal(fecha_pago, Pago.fecha_pago.type),
+                literal(monto, Pago.monto.type),
+                literal(medio, Pago.medio.type)
+            )
+        ).returning(Pago.schedule_id, Pago.fecha_pago, Pago.monto, Pago.medio, Pago.pago_id).cte("pago")
         
-        total_payments = self.db.query(
-            func.coalesce(func.sum(Pago.monto), 0)
-        ).filter(Pago.schedule_id == schedule_id).scalar()
+        values: Dict[Any, Any] = {
+            Credito.monto_pagado: Credito.monto_pagado + monto,
+            Credito.saldo_pendiente: Credito.saldo_pendiente - monto,
+        }
         
-        today = date.today()
+        if old_status != new_status:
+            old_counter = getattr(Credito, ESTADO_COUNTERS[old_status])
+            new_counter = getattr(Credito, ESTADO_COUNTERS[new_status])
+            values[old_counter] = old_counter - 1
+            values[new_counter] = new_counter + 1
+        
+        if new_status == 'pagada':
+            values[Credito.fecha_primera_impaga] = oldest_unpaid_due_date(paid_schedule_id=schedule_id)
+        
+        credito = update(Credito).where(
+            Credito.credito_id == cuota.c.credito_id
+        ).values(values).returning(Credito.credito_id).cte("credito")
+        
+        # PostgreSQL runs data-modifying CTEs even when nothing reads them
+        return select(pago).add_cte(credito)
+    
+    @staticmethod
+    def schedule_status(valor_cuota: Decimal, monto_pagado: Decimal, fecha_vencimiento: date) -> str:
+        
+        if monto_pagado >= valor_cuota:
+            return 'pagada'
+        elif monto_pagado > 0:
+            return 'parcial'
+        elif fecha_vencimiento < date.today():
+            return 'vencida'
         
-        if total_payments >= schedule.valor_cuota:
-            new_status = 'pagada'
-        elif total_payments > 0:
-            new_status = 'parcial'
-        elif schedule.fecha_vencimiento < today:
-            new_status = 'vencida'
-        else:
-            new_status = 'pendiente'
-        
-        schedule.estado = new_status
-        self.db.add(schedule)
+        return 'pendiente'
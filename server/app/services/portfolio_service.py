@@ -0,0 +1,231 @@
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+BUCKETS = ('0', '1-30', '31-60', '61-90', '90+')
+SNAPSHOT_JOB = "cartera_mensual"
+GROUP_COLUMNS = {"producto": "producto", "ciudad": "ciudad"}
+
+# Rollup rows plus deltas not yet compacted; identical totals either way.
+CARTERA_SQL = """
+    SELECT producto, ciudad, fecha_primera_impaga, creditos, saldo_pendiente
+    FROM core.cartera_rollup
+    UNION ALL
+    SELECT producto, ciudad, fecha_primera_impaga, creditos, saldo_pendiente
+    FROM core.cartera_deltas
+"""
+
+COMPACT_SQL = """
+    WITH moved AS (
+        DELETE FROM core.cartera_deltas
+        RETURNING producto, ciudad, fecha_primera_impaga, creditos, saldo_pendiente
+    ), folded AS (
+        INSERT INTO core.cartera_rollup AS r (producto, ciudad, fecha_primera_impaga, creditos, saldo_pendiente)
+        SELECT producto, ciudad, fecha_primera_impaga, SUM(creditos), SUM(saldo_pendiente)
+        FROM moved
+        GROUP BY producto, ciudad, fecha_primera_impaga
+        ON CONFLICT (producto, ciudad, fecha_primera_impaga) DO UPDATE
+        SET creditos = r.creditos + EXCLUDED.creditos,
+            saldo_pendiente = r.saldo_pendiente + EXCLUDED.saldo_pendiente
+    )
+    SELECT COUNT(*) FROM moved
+"""
+
+
+def previous_month_end(day: date) -> date:
+    """Last day of the month before ``day``'s month."""
+    return day.replace(day=1) - timedelta(days=1)
+
+
+class PortfolioService:
+    """
+    Delinquency analytics served from core.cartera_rollup (fed by triggers
+    on creditos/clientes, see sql/07_portfolio_rollups.sql) and from
+    month-end snapshots. No query here scans creditos except the monthly
+    snapshot and an explicit rebuild.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def aging_buckets(
+        self,
+        today: Optional[date] = None,
+        producto: Optional[str] = None,
+        ciudad: Optional[str] = None,
+        group_by: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Vigente credits and outstanding balance per days-past-due bucket."""
+        
+        group = GROUP_COLUMNS.get(group_by)
+        filters, params = self._filters(producto, ciudad)
+        params["today"] = today or date.today()
+        
+        rows = self.db.execute(text(f"""
+            SELECT core.f_tramo_mora(CAST(:today AS date) - fecha_primera_impaga) AS bucket,
+                   {group + ' AS grupo' if group else 'NULL AS grupo'},
+                   SUM(creditos) AS creditos,
+                   SUM(saldo_pendiente) AS saldo_pendiente
+            FROM ({CARTERA_SQL}) cartera
+            {filters}
+            GROUP BY 1, 2
+            HAVING SUM(creditos) <> 0
+        """), params).all()
+        
+        order = {bucket: i for i, bucket in enumerate(BUCKETS)}
+        
+        return sorted(
+            (
+                {
+                    "bucket": row.bucket,
+                    group_by: row.grupo or None,
+                    "creditos": row.creditos,
+                    "saldo_pendiente": row.saldo_pendiente,
+                } if group else {
+                    "bucket": row.bucket,
+                    "creditos": row.creditos,
+                    "saldo_pendiente": row.saldo_pendiente,
+                }
+                for row in rows
+            ),
+            key=lambda r: (r.get(group_by) or '', order[r["bucket"]])
+        )
+    
+    def roll_rates(
+        self,
+        months: int = 6,
+        producto: Optional[str] = None,
+        ciudad: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Month-over-month bucket transitions for the last ``months`` closes;
+        ``tasa`` is the share of the from-bucket balance that moved to the
+        to-bucket.
+        """
+        
+        filters, params = self._filters(producto, ciudad)
+        params["months"] = months
+        
+        rows = self.db.execute(text(f"""
+            WITH meses AS (
+                SELECT DISTINCT mes FROM core.cartera_roll_rates ORDER BY mes DESC LIMIT :months
+            ), transiciones AS (
+                SELECT mes, tramo_desde, tramo_hasta,
+                       SUM(creditos) AS creditos, SUM(saldo_pendiente) AS saldo_pendiente
+                FROM core.cartera_roll_rates
+                {filters}{' AND' if filters else 'WHERE'} mes IN (SELECT mes FROM meses)
+                GROUP BY mes, tramo_desde, tramo_hasta
+            )
+            SELECT mes, tramo_desde, tramo_hasta, creditos, saldo_pendiente,
+                   saldo_pendiente / NULLIF(SUM(saldo_pendiente) OVER (PARTITION BY mes, tramo_desde), 0) AS tasa
+            FROM transiciones
+            ORDER BY mes DESC, tramo_desde, tramo_hasta
+        """), params).all()
+        
+        return [dict(row._mapping) for row in rows]
+    
+    def compact(self) -> int:
+        """Fold pending trigger deltas into the rollup. Returns delta rows folded."""
+        
+        folded = self.db.execute(text(COMPACT_SQL)).scalar()
+        self.db.execute(text("DELETE FROM core.cartera_rollup WHERE creditos = 0 AND saldo_pendiente = 0"))
+        self.db.commit()
+        
+        return folded
+    
+    def rebuild(self) -> None:
+        """Recompute the rollup from creditos (after bulk loads or to fix drift)."""
+        
+        # Writers block on their delta insert until the rebuild commits, so
+        # every change is either in the recomputed totals or in a later delta
+        self.db.execute(text("LOCK TABLE core.cartera_deltas IN EXCLUSIVE MODE"))
+        self.db.execute(text("DELETE FROM core.cartera_deltas"))
+        self.db.execute(text("DELETE FROM core.cartera_rollup"))
+        self.db.execute(text("""
+            INSERT INTO core.cartera_rollup (producto, ciudad, fecha_primera_impaga, creditos, saldo_pendiente)
+            SELECT c.producto, COALESCE(cl.ciudad, ''), c.fecha_primera_impaga, COUNT(*), SUM(c.saldo_pendiente)
+            FROM core.creditos c
+            JOIN core.clientes cl ON cl.cliente_id = c.cliente_id
+            WHERE c.estado = 'vigente' AND c.fecha_primera_impaga IS NOT NULL
+            GROUP BY 1, 2, 3
+        """))
+        self.db.commit()
+    
+    def snapshot(self, mes: date) -> Optional[int]:
+        """
+        Record every vigente credit's bucket at month-end ``mes`` and the
+        roll rates from the previous month-end. Idempotent per month;
+        returns None if another process is taking the same snapshot.
+        """
+        
+        locked = self.db.execute(
+            text("SELECT pg_try_advisory_xact_lock(hashtext('core.' || :job))"),
+            {"job": SNAPSHOT_JOB}
+        ).scalar()
+        
+        if not locked:
+            self.db.rollback()
+            return None
+        
+        params = {"mes": mes, "anterior": previous_month_end(mes)}
+        
+        self.db.execute(text("DELETE FROM core.cartera_mensual WHERE mes = :mes"), params)
+        taken = self.db.execute(text("""
+            INSERT INTO core.cartera_mensual (mes, credito_id, producto, ciudad, tramo, saldo_pendiente)
+            SELECT :mes, c.credito_id, c.producto, COALESCE(cl.ciudad, ''),
+                   core.f_tramo_mora(CAST(:mes AS date) - c.fecha_primera_impaga), c.saldo_pendiente
+            FROM core.creditos c
+            JOIN core.clientes cl ON cl.cliente_id = c.cliente_id
+            WHERE c.estado = 'vigente' AND c.fecha_primera_impaga IS NOT NULL
+        """), params).rowcount
+        
+        self.db.execute(text("DELETE FROM core.cartera_roll_rates WHERE mes = :mes"), params)
+        self.db.execute(text("""
+            INSERT INTO core.cartera_roll_rates
+                (mes, producto, ciudad, tramo_desde, tramo_hasta, creditos, saldo_pendiente)
+            SELECT :mes, p.producto, p.ciudad, p.tramo, COALESCE(a.tramo, 'cerrado'),
+                   COUNT(*), SUM(p.saldo_pendiente)
+            FROM core.cartera_mensual p
+            LEFT JOIN core.cartera_mensual a ON a.mes = :mes AND a.credito_id = p.credito_id
+            WHERE p.mes = :anterior
+            GROUP BY 1, 2, 3, 4, 5
+        """), params)
+        
+        self.db.execute(text("""
+            INSERT INTO core.job_watermarks (job, watermark, last_run_at, rows_changed)
+            VALUES (:job, :mes, now(), :taken)
+            ON CONFLICT (job) DO UPDATE
+            SET watermark = GREATEST(core.job_watermarks.watermark, EXCLUDED.watermark),
+                last_run_at = EXCLUDED.last_run_at,
+                rows_changed = EXCLUDED.rows_changed
+        """), {"job": SNAPSHOT_JOB, "mes": mes, "taken": taken})
+        self.db.commit()
+        
+        return taken
+    
+    def snapshot_due(self, today: Optional[date] = None) -> Optional[date]:
+        """The last month-end if it has not been snapshotted yet."""
+        
+        mes = previous_month_end(today or date.today())
+        taken = self.db.execute(
+            text("SELECT watermark FROM core.job_watermarks WHERE job = :job"),
+            {"job": SNAPSHOT_JOB}
+        ).scalar()
+        
+        return mes if taken is None or taken < mes else None
+    
+    @staticmethod
+    def _filters(producto: Optional[str], ciudad: Optional[str]):
+        conditions = []
+        params: Dict[str, Any] = {}
+        
+        if producto:
+            conditions.append("producto = :producto")
+            params["producto"] = producto
+        
+        if ciudad:
+            conditions.append("ciudad = :ciudad")
+            params["ciudad"] = ciudad
+        
+        return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Client search benchmark: indexed search vs. the legacy leading-wildcard ILIKE.
+
+    python bench/client_search.py --seed 1000000      # load synthetic clients once
+    python bench/client_search.py --repeat 50 --out search.json
+    python bench/client_search.py --cleanup           # remove the synthetic clients
+
+Synthetic rows use tipo_doc 'BENCH' so they can be removed afterwards.
+Requires sql/05_client_search.sql to be applied.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.models.models import Cliente  # noqa: E402
+from app.services.cliente_service import ClienteService  # noqa: E402
+
+SEED_SQL = """
+INSERT INTO core.clientes (tipo_doc, num_doc, nombre, ciudad)
+SELECT 'BENCH',
+       to_char(50000000 + g, 'FM999999999'),
+       (ARRAY['José','María','Andrés','Lucía','Óscar','Nicolás','Sofía','Martín','Valentina','Julián'])[1 + g % 10]
+         || ' ' ||
+       (ARRAY['Pérez','Gómez','Rodríguez','Muñoz','Martínez','López','Hernández','Díaz','Álvarez','Ramírez','Castaño','Peña'])[1 + (g / 10) % 12]
+         || ' ' ||
+       (ARRAY['Gutiérrez','Sánchez','Ríos','Vásquez','Jiménez','Zuluaga','Ospina','Cárdenas'])[1 + (g / 120) % 8]
+         || ' ' || g,
+       (ARRAY['Bogotá','Medellín','Cali','Barranquilla','Cartagena','Bucaramanga','Pereira','Manizales'])[1 + g % 8]
+FROM generate_series(1, :rows) g
+ON CONFLICT (tipo_doc, num_doc) DO NOTHING
+"""
+
+DEFAULT_TERMS = ["jose", "maria perez", "rodriguez", "munoz", "castano peña", "50000123", "5000012", "Zuluaga 4242"]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[max(0, int(len(samples) * 0.95) - 1)], 2),
+        "max_ms": round(samples[-1], 2),
+    }
+
+
+def legacy_query(db, term):
+    return db.query(Cliente).filter(
+        Cliente.nombre.ilike(f"%{term}%") | Cliente.num_doc.ilike(f"%{term}%")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, help="Insert this many synthetic clients and ANALYZE")
+    parser.add_argument("--cleanup", action="store_true", help="Delete synthetic clients")
+    parser.add_argument("--term", action="append", dest="terms")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--size", type=int, default=20)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.cleanup:
+            deleted = db.execute(text("DELETE FROM core.clientes WHERE tipo_doc = 'BENCH'")).rowcount
+            db.commit()
+            print(f"Deleted {deleted} synthetic clients")
+            return
+
+        if args.seed:
+            start = time.perf_counter()
+            db.execute(text(SEED_SQL), {"rows": args.seed})
+            db.commit()
+            db.execute(text("ANALYZE core.clientes"))
+            db.commit()
+            print(f"Seeded {args.seed} clients in {time.perf_counter() - start:.1f}s")
+
+        total = db.query(Cliente).count()
+        service = ClienteService(db)
+        report = {"clients": total, "repeat": args.repeat, "terms": {}}
+
+        for term in args.terms or DEFAULT_TERMS:
+            indexed = service.search_query(term)
+            entry = {
+                "indexed": timed(lambda: indexed.limit(args.size).all(), args.repeat),
+                "matches_page": len(indexed.limit(args.size).all()),
+            }
+            if not args.skip_legacy:
+                legacy = legacy_query(db, term)
+                entry["legacy_ilike"] = timed(lambda: legacy.limit(args.size).all(), max(1, args.repeat // 4))
+            report["terms"][term] = entry
+            print(term, json.dumps(entry))
+
+        if args.out:
+            with open(args.out, "w") as fh:
+                json.dump(report, fh, indent=2)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
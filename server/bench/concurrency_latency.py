@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Concurrent latency benchmark for the Roda API.
+
+Drives a running server with a fixed number of concurrent clients and reports
+p50/p95/p99 latency per endpoint. Run it once per DB_MODE (or against the
+previous release) and compare the JSON outputs:
+
+    DB_MODE=threadpool uvicorn app.main:app --workers 1
+    python bench/concurrency_latency.py --label threadpool --out threadpool.json
+
+    DB_MODE=async uvicorn app.main:app --workers 1
+    python bench/concurrency_latency.py --label async --out async.json
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_PATHS = [
+    "/api/v1/creditos/1",
+    "/api/v1/creditos/1/schedule",
+    "/api/v1/creditos/1/summary",
+    "/api/v1/payments/",
+    "/api/v1/clientes/",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def worker(base_url, paths, deadline, results, errors, lock):
+    session = requests.Session()
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = session.get(f"{base_url}{path}", timeout=30)
+            ok = response.status_code < 500
+        except requests.RequestException:
+            ok = False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with lock:
+            if ok:
+                results.setdefault(path, []).append(elapsed_ms)
+            else:
+                errors[path] = errors.get(path, 0) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--path", action="append", dest="paths", help="Endpoint to hit (repeatable)")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    paths = args.paths or DEFAULT_PATHS
+    results, errors, lock = {}, {}, threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(worker, args.base_url, paths, deadline, results, errors, lock)
+
+    all_latencies = [ms for values in results.values() for ms in values]
+    report = {
+        "label": args.label,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "requests": len(all_latencies),
+        "throughput_rps": round(len(all_latencies) / args.duration, 1),
+        "errors": errors,
+        "overall": summarize(all_latencies),
+        "endpoints": {path: summarize(values) for path, values in results.items()},
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.fmean(values), 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+    }
+
+
+if __name__ == "__main__":
+    main()
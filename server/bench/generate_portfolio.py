@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Synthetic portfolio generator.
+
+Bulk-loads clientes, creditos, payment_schedule and pagos with COPY at a
+configurable scale. The data is deterministic: the same --seed, --creditos,
+--chunk-size and --as-of always produce the same rows (only the ids depend
+on where the sequences are).
+
+    python bench/generate_portfolio.py --creditos 500000 --seed 42
+    python bench/generate_portfolio.py --creditos 10000 --as-of 2024-06-30
+    python bench/generate_portfolio.py --cleanup
+
+Schedules use the French amortization of the API. Each credit gets a
+borrower profile (al día, moroso, desertor) that decides when its cuotas
+are paid, in one or several pagos, up to --as-of. The ledger columns,
+cuota counters and fecha_primera_impaga are written consistent with the
+pagos, so `python -m app.cli reconcile-ledger` finds no drift; the
+portfolio rollup is rebuilt at the end. Synthetic clients use tipo_doc
+'SYNTH' so they can be removed afterwards. Requires sql/01..10.
+"""
+
+import argparse
+import csv
+import io
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.services.amortization_service import add_months, build_schedule  # noqa: E402
+from app.services.cobranza_service import CobranzaService  # noqa: E402
+from app.services.partition_service import PartitionService  # noqa: E402
+from app.services.payment_rollup_service import PaymentRollupService  # noqa: E402
+from app.services.payment_service import ESTADO_COUNTERS  # noqa: E402
+from app.services.portfolio_service import PortfolioService  # noqa: E402
+
+TIPO_DOC = "SYNTH"
+
+NOMBRES = ["José", "María", "Andrés", "Lucía", "Óscar", "Nicolás", "Sofía", "Martín", "Valentina", "Julián",
+           "Camila", "Santiago", "Daniela", "Felipe", "Laura", "Sebastián"]
+APELLIDOS = ["Pérez", "Gómez", "Rodríguez", "Muñoz", "Martínez", "López", "Hernández", "Díaz", "Álvarez",
+             "Ramírez", "Castaño", "Peña", "Gutiérrez", "Sánchez", "Ríos", "Vásquez", "Zuluaga", "Ospina"]
+CIUDADES = [("Bogotá", 35), ("Medellín", 20), ("Cali", 12), ("Barranquilla", 9), ("Cartagena", 6),
+            ("Bucaramanga", 6), ("Pereira", 5), ("Manizales", 4), (None, 3)]
+
+PRODUCTOS = {
+    # producto: (weight, inversion min, inversion max)
+    "e-bike": (70, 2_500_000, 8_000_000),
+    "e-moped": (30, 6_000_000, 16_000_000),
+}
+PLAZOS = [(12, 30), (18, 25), (24, 30), (36, 15)]
+TEAS = [(Decimal("0.240000"), 20), (Decimal("0.289000"), 40), (Decimal("0.329000"), 30), (Decimal("0.389000"), 10)]
+MEDIOS = [("app", 55), ("link", 25), ("efectivo", 15), (None, 5)]
+
+# al_dia pays every cuota up to 10 days early; moroso 1-75 days late;
+# desertor pays like moroso and stops after a random cuota
+PROFILES = [("al_dia", 70), ("moroso", 20), ("desertor", 10)]
+CREDITOS_POR_CLIENTE = [(1, 80), (2, 15), (3, 5)]
+
+CLIENTE_COLUMNS = ("cliente_id", "tipo_doc", "num_doc", "nombre", "ciudad")
+CREDITO_COLUMNS = (
+    "credito_id", "cliente_id", "producto", "inversion", "cuotas_totales", "tea",
+    "fecha_desembolso", "fecha_inicio_pago", "estado", "monto_pagado", "saldo_pendiente",
+    "cuotas_pendientes", "cuotas_parciales", "cuotas_pagadas", "cuotas_vencidas", "fecha_primera_impaga",
+)
+SCHEDULE_COLUMNS = (
+    "schedule_id", "credito_id", "num_cuota", "fecha_vencimiento", "valor_cuota",
+    "estado", "monto_pagado", "saldo_pendiente",
+)
+PAGO_COLUMNS = ("schedule_id", "fecha_pago", "monto", "medio")
+
+RESERVE_SQL = """
+SELECT setval(pg_get_serial_sequence(:table, :column),
+              nextval(pg_get_serial_sequence(:table, :column)) + :n - 1)
+"""
+
+CLEANUP_SQL = [
+    # Months archived since the load (archive-pagos) hold synthetic pagos too
+    """DELETE FROM core.pagos_archivo p USING core.payment_schedule ps, core.creditos c, core.clientes cl
+       WHERE ps.schedule_id = p.schedule_id AND c.credito_id = ps.credito_id
+         AND cl.cliente_id = c.cliente_id AND cl.tipo_doc = :tipo_doc""",
+    """DELETE FROM core.pagos_archivados a USING core.payment_schedule ps, core.creditos c, core.clientes cl
+       WHERE ps.schedule_id = a.schedule_id AND c.credito_id = ps.credito_id
+         AND cl.cliente_id = c.cliente_id AND cl.tipo_doc = :tipo_doc""",
+    """UPDATE core.pagos_archivos m
+       SET pagos = t.pagos, monto = t.monto
+       FROM (
+         SELECT m.particion, COUNT(p.pago_id) AS pagos, COALESCE(SUM(p.monto), 0) AS monto
+         FROM core.pagos_archivos m
+         LEFT JOIN core.pagos_archivo p ON p.fecha_pago >= m.desde AND p.fecha_pago < m.hasta
+         GROUP BY m.particion
+       ) t
+       WHERE t.particion = m.particion AND (m.pagos, m.monto) <> (t.pagos, t.monto)""",
+    """DELETE FROM core.pagos p USING core.payment_schedule ps, core.creditos c, core.clientes cl
+       WHERE ps.schedule_id = p.schedule_id AND c.credito_id = ps.credito_id
+         AND cl.cliente_id = c.cliente_id AND cl.tipo_doc = :tipo_doc""",
+    """DELETE FROM core.payment_schedule ps USING core.creditos c, core.clientes cl
+       WHERE c.credito_id = ps.credito_id AND cl.cliente_id = c.cliente_id AND cl.tipo_doc = :tipo_doc""",
+    """DELETE FROM core.creditos c USING core.clientes cl
+       WHERE cl.cliente_id = c.cliente_id AND cl.tipo_doc = :tipo_doc""",
+    "DELETE FROM core.clientes WHERE tipo_doc = :tipo_doc",
+]
+
+CENT = Decimal("0.01")
+
+
+def weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+class Chunk:
+    """Rows of one COPY batch, with ids local to the chunk until ``number`` assigns them."""
+
+    def __init__(self):
+        self.clientes = []
+        self.creditos = []
+        self.cuotas = []
+        self.pagos = []
+
+    def number(self, cliente_base, credito_base, schedule_base):
+        for row in self.clientes:
+            row[0] += cliente_base
+            row[2] = str(row[0])
+        for row in self.creditos:
+            row[0] += credito_base
+            row[1] += cliente_base
+        for row in self.cuotas:
+            row[0] += schedule_base
+            row[1] += credito_base
+        for row in self.pagos:
+            row[0] += schedule_base
+
+
+def simulate_cuota(rng, cuota, profile, stopped, as_of, split_rate, partial_rate):
+    """Pagos (fecha, monto) made on a cuota by ``as_of`` and its resulting estado."""
+
+    due = cuota.fecha_vencimiento
+    valor = cuota.valor_cuota
+    pagos = []
+
+    if not stopped:
+        if profile == "al_dia":
+            pay_date = due - timedelta(days=rng.randint(0, 10))
+        else:
+            pay_date = due + timedelta(days=rng.randint(1, 75))
+
+        if pay_date <= as_of:
+            parts = rng.randint(2, 3) if rng.random() < split_rate else 1
+            share = (valor / parts).quantize(CENT)
+            amounts = [share] * (parts - 1) + [valor - share * (parts - 1)]
+            if parts > 1 and rng.random() < partial_rate:
+                amounts.pop()
+
+            for k, monto in enumerate(amounts):
+                pagos.append((pay_date - timedelta(days=3 * (parts - 1 - k)), monto))
+
+    paid = sum((monto for _, monto in pagos), Decimal("0"))
+    if paid >= valor:
+        estado = "pagada"
+    elif paid > 0:
+        estado = "parcial"
+    elif due < as_of:
+        estado = "vencida"
+    else:
+        estado = "pendiente"
+
+    return pagos, paid, estado
+
+
+def generate_chunk(rng, creditos, as_of, split_rate, partial_rate):
+    chunk = Chunk()
+    window = (as_of - add_months(as_of, -36)).days
+
+    while len(chunk.creditos) < creditos:
+        cliente_idx = len(chunk.clientes)
+        nombre = f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+        chunk.clientes.append([cliente_idx, TIPO_DOC, None, nombre, weighted(rng, CIUDADES)])
+
+        for _ in range(min(weighted(rng, CREDITOS_POR_CLIENTE), creditos - len(chunk.creditos))):
+            producto = rng.choices(list(PRODUCTOS), [spec[0] for spec in PRODUCTOS.values()])[0]
+            _, low, high = PRODUCTOS[producto]
+            inversion = Decimal(rng.randrange(low, high, 50_000))
+            cuotas_totales = weighted(rng, PLAZOS)
+            tea = weighted(rng, TEAS)
+            desembolso = as_of - timedelta(days=rng.randrange(window))
+            inicio = add_months(desembolso, 1)
+            profile = weighted(rng, PROFILES)
+            stop_after = rng.randrange(cuotas_totales) if profile == "desertor" else None
+
+            credito_idx = len(chunk.creditos)
+            counts = dict.fromkeys(ESTADO_COUNTERS, 0)
+            monto_pagado = Decimal("0")
+            primera_impaga = None
+
+            for i, cuota in enumerate(build_schedule(inversion, cuotas_totales, tea, inicio)):
+                stopped = stop_after is not None and i >= stop_after
+                pagos, paid, estado = simulate_cuota(rng, cuota, profile, stopped, as_of, split_rate, partial_rate)
+
+                schedule_idx = len(chunk.cuotas)
+                chunk.cuotas.append([
+                    schedule_idx, credito_idx, cuota.num_cuota, cuota.fecha_vencimiento,
+                    cuota.valor_cuota, estado, paid, cuota.valor_cuota - paid,
+                ])
+                for fecha, monto in pagos:
+                    hora = f"{rng.randint(7, 21):02d}:{rng.randint(0, 59):02d}:00-05"
+                    chunk.pagos.append([schedule_idx, f"{fecha} {hora}", monto, weighted(rng, MEDIOS)])
+
+                counts[estado] += 1
+                monto_pagado += paid
+                if estado != "pagada" and primera_impaga is None:
+                    primera_impaga = cuota.fecha_vencimiento
+
+            chunk.creditos.append([
+                credito_idx, cliente_idx, producto, inversion, cuotas_totales, tea, desembolso, inicio,
+                "vigente" if primera_impaga else "cancelado", monto_pagado, inversion - monto_pagado,
+                counts["pendiente"], counts["parcial"], counts["pagada"], counts["vencida"], primera_impaga,
+            ])
+
+    return chunk
+
+
+def reserve(conn, table, column, n):
+    """First id of ``n`` consecutive ids taken from the table's sequence."""
+
+    last = conn.execute(text(RESERVE_SQL), {"table": table, "column": column, "n": n}).scalar()
+    return last - n + 1
+
+
+def copy_rows(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def load(args):
+    as_of = args.as_of or date.today()
+    chunks = (args.creditos + args.chunk_size - 1) // args.chunk_size
+    totals = {"clientes": 0, "creditos": 0, "cuotas": 0, "pagos": 0}
+    start = time.perf_counter()
+
+    # Disbursements go back 36 months, so COPY routes every pago straight to its month
+    db = SessionLocal()
+    try:
+        PartitionService(db).ensure(desde=add_months(as_of, -36))
+    finally:
+        db.close()
+
+    for index in range(chunks):
+        rng = random.Random(f"{args.seed}:{index}")
+        size = min(args.chunk_size, args.creditos - index * args.chunk_size)
+        chunk = generate_chunk(rng, size, as_of, args.split_rate, args.partial_rate)
+
+        with engine.connect() as conn:
+            chunk.number(
+                reserve(conn, "core.clientes", "cliente_id", len(chunk.clientes)),
+                reserve(conn, "core.creditos", "credito_id", len(chunk.creditos)),
+                reserve(conn, "core.payment_schedule", "schedule_id", len(chunk.cuotas)),
+            )
+
+            cursor = conn.connection.dbapi_connection.cursor()
+            copy_rows(cursor, "core.clientes", CLIENTE_COLUMNS, chunk.clientes)
+            copy_rows(cursor, "core.creditos", CREDITO_COLUMNS, chunk.creditos)
+            copy_rows(cursor, "core.payment_schedule", SCHEDULE_COLUMNS, chunk.cuotas)
+            copy_rows(cursor, "core.pagos", PAGO_COLUMNS, chunk.pagos)
+            cursor.close()
+            conn.commit()
+
+        totals["clientes"] += len(chunk.clientes)
+        totals["creditos"] += len(chunk.creditos)
+        totals["cuotas"] += len(chunk.cuotas)
+        totals["pagos"] += len(chunk.pagos)
+        print(f"chunk {index + 1}/{chunks}: {totals['creditos']} creditos, {totals['cuotas']} cuotas, "
+              f"{totals['pagos']} pagos ({time.perf_counter() - start:.1f}s)")
+
+    finish(f"Loaded {totals} in {time.perf_counter() - start:.1f}s")
+
+
+def cleanup():
+    start = time.perf_counter()
+
+    with engine.begin() as conn:
+        for statement in CLEANUP_SQL:
+            conn.execute(text(statement), {"tipo_doc": TIPO_DOC})
+
+    finish(f"Deleted synthetic portfolio in {time.perf_counter() - start:.1f}s")
+
+
+def finish(message):
+    db = SessionLocal()
+    try:
+        PartitionService(db).ensure()
+        PortfolioService(db).rebuild()
+        CobranzaService(db).rebuild()
+        PaymentRollupService(db).rebuild()
+    finally:
+        db.close()
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in ("clientes", "creditos", "payment_schedule", "pagos"):
+            conn.execute(text(f"ANALYZE core.{table}"))
+
+    print(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--creditos", type=int, default=10000, help="Credits to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--as-of", type=date.fromisoformat, help="Simulate payments up to this day (default today)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Credits per COPY transaction")
+    parser.add_argument("--split-rate", type=float, default=0.15, help="Share of cuotas paid in several pagos")
+    parser.add_argument("--partial-rate", type=float, default=0.3, help="Share of split cuotas left partial")
+    parser.add_argument("--cleanup", action="store_true", help="Delete the synthetic portfolio")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+    else:
+        load(args)
+
+
+if __name__ == "__main__":
+    main()
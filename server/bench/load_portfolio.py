@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Load benchmark over a generated portfolio.
+
+Drives a running server with a fixed number of concurrent clients issuing a
+weighted mix of the main operations (schedule, summary, overdue list,
+credit and client lists, payment posting) against credits sampled from the
+database, and reports throughput and latency percentiles per operation.
+Results are saved as JSON; --compare fails the run when p95 latency or
+throughput regress beyond --threshold against a previous result:
+
+    python bench/generate_portfolio.py --creditos 500000
+    uvicorn app.main:app --workers 4
+    python bench/load_portfolio.py --label main --out main.json
+    python bench/load_portfolio.py --label branch --out branch.json --compare main.json
+
+Payment posting writes small pagos (--monto) to pending cuotas; use
+--read-only to leave the data untouched.
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.database import engine  # noqa: E402
+from concurrency_latency import summarize  # noqa: E402
+
+DEFAULT_MIX = "schedule=25,summary=25,overdue=10,creditos=15,clientes=10,pago=15"
+
+SEARCH_TERMS = ["jose", "maria perez", "rodriguez", "munoz", "castano", "lucia gomez", "zuluaga"]
+
+SAMPLE_CREDITOS_SQL = """
+SELECT credito_id FROM core.creditos
+ORDER BY md5(credito_id::text || :seed)
+LIMIT :n
+"""
+
+SAMPLE_CUOTAS_SQL = """
+SELECT DISTINCT ON (credito_id) schedule_id
+FROM core.payment_schedule
+WHERE credito_id = ANY(:ids) AND estado <> 'pagada'
+ORDER BY credito_id, num_cuota
+"""
+
+
+def operation_request(name, rng, sample, args):
+    """(method, path, json body) for one operation on a random sampled credit."""
+
+    credito_id = rng.choice(sample["creditos"])
+
+    if name == "schedule":
+        return "GET", f"/api/v1/creditos/{credito_id}/schedule", None
+    if name == "summary":
+        return "GET", f"/api/v1/creditos/{credito_id}/summary", None
+    if name == "overdue":
+        return "GET", f"/api/v1/payments/overdue?size={args.page_size}", None
+    if name == "creditos":
+        return "GET", f"/api/v1/creditos/?page={rng.randint(1, 50)}&size={args.page_size}", None
+    if name == "clientes":
+        return "GET", f"/api/v1/clientes/?search={rng.choice(SEARCH_TERMS)}&size={args.page_size}", None
+    if name == "pago":
+        body = {
+            "schedule_id": rng.choice(sample["cuotas"]),
+            "monto": args.monto,
+            "medio": "app",
+            "fecha_pago": datetime.now(timezone.utc).isoformat(),
+        }
+        return "POST", "/api/v1/payments/", body
+
+    raise ValueError(f"Unknown operation {name!r}")
+
+
+def worker(index, args, mix, sample, measure_from, deadline, results, lock):
+    rng = random.Random(f"{args.seed}:{index}")
+    names, weights = zip(*mix.items())
+    session = requests.Session()
+
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path, body = operation_request(name, rng, sample, args)
+
+        start = time.perf_counter()
+        try:
+            response = session.request(method, f"{args.base_url}{path}", json=body, timeout=30)
+            status = response.status_code
+        except requests.RequestException:
+            status = 0
+        end = time.perf_counter()
+
+        if start < measure_from:
+            continue
+
+        with lock:
+            entry = results.setdefault(name, {"latencies": [], "status": {}})
+            entry["status"][status] = entry["status"].get(status, 0) + 1
+            if 0 < status < 500:
+                entry["latencies"].append((end - start) * 1000)
+
+
+def load_sample(args, mix):
+    with engine.connect() as conn:
+        creditos = conn.execute(text(SAMPLE_CREDITOS_SQL), {"seed": str(args.seed), "n": args.sample}).scalars().all()
+        cuotas = []
+        if mix.get("pago"):
+            cuotas = conn.execute(text(SAMPLE_CUOTAS_SQL), {"ids": list(creditos)}).scalars().all()
+
+    if not creditos or (mix.get("pago") and not cuotas):
+        sys.exit("No credits or pending cuotas to sample; run bench/generate_portfolio.py first")
+
+    return {"creditos": creditos, "cuotas": cuotas}
+
+
+def parse_mix(value, read_only):
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+
+    if read_only:
+        mix.pop("pago", None)
+
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, threshold):
+    """Print p95/throughput deltas per operation; True if any regressed beyond ``threshold``."""
+
+    regressed = False
+
+    for name, current in report["operations"].items():
+        previous = baseline.get("operations", {}).get(name)
+        if not previous or not previous["p95_ms"] or not previous["throughput_rps"]:
+            continue
+
+        p95_delta = current["p95_ms"] / previous["p95_ms"] - 1
+        rps_delta = current["throughput_rps"] / previous["throughput_rps"] - 1
+        worse = p95_delta > threshold or rps_delta < -threshold
+        regressed = regressed or worse
+
+        print(f"{name:10} p95 {previous['p95_ms']:>9.2f} -> {current['p95_ms']:>9.2f} ms ({p95_delta:+.1%})  "
+              f"rps {previous['throughput_rps']:>8.1f} -> {current['throughput_rps']:>8.1f} ({rps_delta:+.1%})"
+              f"{'  REGRESSION' if worse else ''}")
+
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=60.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds run before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights, e.g. schedule=3,pago=1")
+    parser.add_argument("--read-only", action="store_true", help="Drop payment posting from the mix")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sample", type=int, default=10000, help="Credits sampled for the run")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--monto", default="1000.00", help="Amount of each posted pago")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", help="Write the report as JSON to this file")
+    parser.add_argument("--compare", help="Previous JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix, args.read_only)
+    sample = load_sample(args, mix)
+    results, lock = {}, threading.Lock()
+
+    measure_from = time.perf_counter() + args.warmup
+    deadline = measure_from + args.duration
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for index in range(args.concurrency):
+            pool.submit(worker, index, args, mix, sample, measure_from, deadline, results, lock)
+
+    operations = {}
+    for name, entry in sorted(results.items()):
+        latencies = entry["latencies"]
+        operations[name] = {
+            **summarize(latencies),
+            "max_ms": round(max(latencies), 2) if latencies else 0.0,
+            "throughput_rps": round(len(latencies) / args.duration, 1),
+            "status": {str(status): count for status, count in sorted(entry["status"].items())},
+        }
+
+    all_latencies = [ms for entry in results.values() for ms in entry["latencies"]]
+    report = {
+        "label": args.label,
+        "revision": git_revision(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": mix,
+            "seed": args.seed,
+            "sample": len(sample["creditos"]),
+        },
+        "requests": len(all_latencies),
+        "errors": sum(
+            count for entry in results.values()
+            for status, count in entry["status"].items() if status == 0 or status >= 500
+        ),
+        "throughput_rps": round(len(all_latencies) / args.duration, 1),
+        "overall": summarize(all_latencies),
+        "operations": operations,
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
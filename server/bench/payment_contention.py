@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Throughput of payment posting under contention.
+
+Creates a throwaway credit (cliente tipo_doc 'BENCH') and posts small pagos
+to its first --cuotas cuotas from --threads threads, directly through
+PaymentService against DATABASE_URL. With --cuotas 1 every post contends
+for the same row lock. Each implementation is run in turn:
+
+    current  lock the cuota, then one statement updates the cuota,
+             inserts the pago and moves the credit ledger
+    legacy   the previous ORM path: lock, insert, flush the cuota
+             update, update the credit (4 statements)
+
+    python bench/payment_contention.py
+    DB_POOL_SIZE=32 python bench/payment_contention.py --threads 32 --posts 2000 --cuotas 1 4 --out contention.json
+
+After each run the cuota totals are checked against the sum of their pagos
+and the credit ledger against its cuotas. The credit is deleted at the end
+unless --keep is given. Keep --threads within the pool (DB_POOL_SIZE +
+DB_MAX_OVERFLOW) so threads wait on the row lock and not on the pool.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import delete, func  # noqa: E402
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.models.models import Cliente, Credito, Pago, PaymentSchedule  # noqa: E402
+from app.services.amortization_service import AmortizationService  # noqa: E402
+from app.services.payment_service import ESTADO_COUNTERS, PaymentService, oldest_unpaid_due_date  # noqa: E402
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from concurrency_latency import summarize  # noqa: E402
+
+TIPO_DOC = "BENCH"
+
+
+def legacy_create_payment(db, schedule_id, monto, medio):
+    """PaymentService.create_payment before the single-statement posting."""
+
+    schedule = db.query(PaymentSchedule).filter(
+        PaymentSchedule.schedule_id == schedule_id
+    ).with_for_update().first()
+
+    if monto > schedule.saldo_pendiente:
+        db.rollback()
+        raise ValueError("Payment amount exceeds remaining balance")
+
+    db.add(Pago(schedule_id=schedule_id, fecha_pago=datetime.now(), monto=monto, medio=medio))
+
+    old_status = schedule.estado
+    schedule.monto_pagado = schedule.monto_pagado + monto
+    schedule.saldo_pendiente = schedule.saldo_pendiente - monto
+    schedule.estado = PaymentService.schedule_status(
+        schedule.valor_cuota, schedule.monto_pagado, schedule.fecha_vencimiento
+    )
+    db.flush()
+
+    values = {
+        Credito.monto_pagado: Credito.monto_pagado + monto,
+        Credito.saldo_pendiente: Credito.saldo_pendiente - monto,
+    }
+    if old_status != schedule.estado:
+        old_counter = getattr(Credito, ESTADO_COUNTERS[old_status])
+        new_counter = getattr(Credito, ESTADO_COUNTERS[schedule.estado])
+        values[old_counter] = old_counter - 1
+        values[new_counter] = new_counter + 1
+    if schedule.estado == "pagada":
+        values[Credito.fecha_primera_impaga] = oldest_unpaid_due_date()
+
+    db.query(Credito).filter(Credito.credito_id == schedule.credito_id).update(values, synchronize_session=False)
+    db.commit()
+
+
+def current_create_payment(db, schedule_id, monto, medio):
+    PaymentService(db).create_payment(schedule_id, monto, medio)
+
+
+IMPLEMENTATIONS = {"current": current_create_payment, "legacy": legacy_create_payment}
+
+
+def create_credit(cuotas):
+    db = SessionLocal()
+    try:
+        cliente = Cliente(tipo_doc=TIPO_DOC, num_doc=f"B{time.time_ns()}", nombre="Benchmark", ciudad=None)
+        db.add(cliente)
+        db.flush()
+
+        # Large cuotas so thousands of small pagos never pay one off
+        credito = Credito(
+            cliente_id=cliente.cliente_id, producto="e-moped", inversion=Decimal("900000000.00"),
+            cuotas_totales=cuotas, tea=Decimal("0.289000"), fecha_desembolso=date.today(),
+            fecha_inicio_pago=date.today(), estado="vigente",
+        )
+        db.add(credito)
+        db.flush()
+        AmortizationService(db).create_schedule(credito)
+        db.commit()
+
+        schedule_ids = [
+            schedule_id for schedule_id, in db.query(PaymentSchedule.schedule_id).filter(
+                PaymentSchedule.credito_id == credito.credito_id
+            ).order_by(PaymentSchedule.num_cuota)
+        ]
+        return cliente.cliente_id, credito.credito_id, schedule_ids
+    finally:
+        db.close()
+
+
+def drop_credit(cliente_id, credito_id):
+    db = SessionLocal()
+    try:
+        schedule_ids = db.query(PaymentSchedule.schedule_id).filter(PaymentSchedule.credito_id == credito_id)
+        db.execute(delete(Pago).where(Pago.schedule_id.in_(schedule_ids.scalar_subquery())))
+        db.execute(delete(PaymentSchedule).where(PaymentSchedule.credito_id == credito_id))
+        db.execute(delete(Credito).where(Credito.credito_id == credito_id))
+        db.execute(delete(Cliente).where(Cliente.cliente_id == cliente_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def check_ledger(credito_id):
+    db = SessionLocal()
+    try:
+        drift = db.query(func.count()).select_from(PaymentSchedule).filter(
+            PaymentSchedule.credito_id == credito_id,
+            PaymentSchedule.monto_pagado != func.coalesce(
+                db.query(func.sum(Pago.monto)).filter(
+                    Pago.schedule_id == PaymentSchedule.schedule_id
+                ).scalar_subquery(), 0
+            )
+        ).scalar()
+        credito = db.query(Credito).filter(Credito.credito_id == credito_id).one()
+        cuotas_pagado = db.query(func.sum(PaymentSchedule.monto_pagado)).filter(
+            PaymentSchedule.credito_id == credito_id
+        ).scalar()
+        return drift == 0 and credito.monto_pagado == cuotas_pagado
+    finally:
+        db.close()
+
+
+def run(implementation, schedule_ids, args):
+    post = IMPLEMENTATIONS[implementation]
+    monto = Decimal(args.monto)
+    latencies, errors, lock = [], [0], threading.Lock()
+
+    def worker(n):
+        db = SessionLocal()
+        try:
+            for i in range(n, args.posts, args.threads):
+                started = time.perf_counter()
+                try:
+                    post(db, schedule_ids[i % len(schedule_ids)], monto, "app")
+                except Exception:
+                    db.rollback()
+                    with lock:
+                        errors[0] += 1
+                    continue
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed_ms)
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(worker, range(args.threads)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        **summarize(latencies),
+        "errors": errors[0],
+        "seconds": round(elapsed, 2),
+        "posts_per_second": round(len(latencies) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=12, help="At most DB_POOL_SIZE + DB_MAX_OVERFLOW")
+    parser.add_argument("--posts", type=int, default=1000, help="Pagos posted per run")
+    parser.add_argument("--cuotas", type=int, nargs="+", default=[1, 8], help="Cuotas the posts are spread over")
+    parser.add_argument("--monto", default="1.00")
+    parser.add_argument("--implementations", nargs="+", choices=sorted(IMPLEMENTATIONS), default=["legacy", "current"])
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark credit")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    cliente_id, credito_id, schedule_ids = create_credit(max(max(args.cuotas), 12))
+    report = {"threads": args.threads, "posts": args.posts, "results": []}
+
+    try:
+        for cuotas in args.cuotas:
+            for implementation in args.implementations:
+                result = {"implementation": implementation, "cuotas": cuotas}
+                result.update(run(implementation, schedule_ids[:cuotas], args))
+                result["ledger_ok"] = check_ledger(credito_id)
+                report["results"].append(result)
+                print(json.dumps(result))
+    finally:
+        if not args.keep:
+            drop_credit(cliente_id, credito_id)
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+CPU cost of serializing GET /creditos/{id} for growing schedules.
+
+No database or server is needed: the same in-memory credit is serialized
+by three paths and the CPU time per response is reported.
+
+    legacy   ORM instances -> PagoResponse/PaymentScheduleResponse models ->
+             CreditoWithSchedule -> FastAPI response_model validation and
+             jsonable encoding -> json.dumps (the path before the fast path)
+    models   plain rows -> CreditoWithSchedule (get_credito_with_schedule)
+             -> same FastAPI response handling
+    fast     plain rows -> FastJSONResponse (pydantic-core to_json)
+
+    python bench/serialization.py
+    python bench/serialization.py --cuotas 12 36 360 --pagos 2 --out serialization.json
+
+All three outputs are checked to be the same JSON before timing.
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from app.api.responses import FastJSONResponse  # noqa: E402
+from app.models.models import Credito, Pago, PaymentSchedule  # noqa: E402
+from app.schemas.credito import CreditoResponse, CreditoWithSchedule  # noqa: E402
+from app.schemas.payment import PagoResponse, PaymentScheduleResponse  # noqa: E402
+from app.services.amortization_service import build_schedule  # noqa: E402
+from app.services.payment_service import PaymentService  # noqa: E402
+
+RESPONSE_FIELD = create_response_field(name="Response_get_credito", type_=CreditoWithSchedule)
+
+
+def sample_credit(cuotas, pagos_por_cuota):
+    """A credit as ORM instances and as the plain rows the service caches."""
+
+    today = date.today()
+    credito = Credito(
+        credito_id=1, cliente_id=1, producto="e-bike", inversion=Decimal("4500000.00"),
+        cuotas_totales=cuotas, tea=Decimal("0.289000"), fecha_desembolso=today - timedelta(days=400),
+        fecha_inicio_pago=today - timedelta(days=370), estado="vigente", monto_pagado=Decimal("0.00"),
+        saldo_pendiente=Decimal("4500000.00"), cuotas_pendientes=cuotas, cuotas_parciales=0,
+        cuotas_pagadas=0, cuotas_vencidas=0,
+    )
+
+    schedules, pagos, rows = [], {}, []
+    pago_id = 0
+
+    for cuota in build_schedule(credito.inversion, cuotas, credito.tea, credito.fecha_inicio_pago):
+        schedule = PaymentSchedule(
+            schedule_id=cuota.num_cuota, credito_id=1, num_cuota=cuota.num_cuota,
+            fecha_vencimiento=cuota.fecha_vencimiento, valor_cuota=cuota.valor_cuota, estado="pendiente",
+            monto_pagado=Decimal("0.00"), saldo_pendiente=cuota.valor_cuota,
+        )
+        schedules.append(schedule)
+
+        pagos[schedule.schedule_id] = []
+        for n in range(pagos_por_cuota):
+            pago_id += 1
+            pagos[schedule.schedule_id].append(Pago(
+                pago_id=pago_id, schedule_id=schedule.schedule_id, monto=Decimal("1000.00"), medio="app",
+                fecha_pago=datetime(2024, 1, 1, 10, n, tzinfo=timezone.utc),
+            ))
+
+        rows.append({
+            "credito_id": 1, "num_cuota": schedule.num_cuota, "fecha_vencimiento": schedule.fecha_vencimiento,
+            "valor_cuota": schedule.valor_cuota, "estado": schedule.estado, "schedule_id": schedule.schedule_id,
+            "monto_pagado": schedule.monto_pagado, "saldo_pendiente": schedule.saldo_pendiente,
+            "dias_vencimiento": (today - schedule.fecha_vencimiento).days,
+            "pagos": [
+                {"schedule_id": p.schedule_id, "fecha_pago": p.fecha_pago, "monto": p.monto,
+                 "medio": p.medio, "pago_id": p.pago_id}
+                for p in pagos[schedule.schedule_id]
+            ],
+        })
+
+    return credito, schedules, pagos, rows
+
+
+def fastapi_render(content):
+    """What FastAPI does with a handler's return value for ``response_model=CreditoWithSchedule``."""
+
+    coro = serialize_response(field=RESPONSE_FIELD, response_content=content, is_coroutine=True)
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return JSONResponse(done.value).body
+    raise RuntimeError("serialize_response awaited")
+
+
+def legacy(credito, schedules, pagos, rows):
+    today = date.today()
+    credit_view = CreditoResponse.model_validate(credito)
+    summary = PaymentService.summarize_credito(credito)
+    schedule = [
+        PaymentScheduleResponse(
+            schedule_id=s.schedule_id, credito_id=s.credito_id, num_cuota=s.num_cuota,
+            fecha_vencimiento=s.fecha_vencimiento, valor_cuota=s.valor_cuota, estado=s.estado,
+            monto_pagado=s.monto_pagado, saldo_pendiente=s.saldo_pendiente,
+            dias_vencimiento=(today - s.fecha_vencimiento).days,
+            pagos=[PagoResponse.model_validate(p) for p in pagos[s.schedule_id]],
+        )
+        for s in schedules
+    ]
+    return fastapi_render(CreditoWithSchedule(**credit_view.model_dump(), payment_schedule=schedule, summary=summary))
+
+
+def models(credito, schedules, pagos, rows):
+    credit_view = CreditoResponse.model_validate(credito)
+    summary = PaymentService.summarize_credito(credito)
+    schedule = [PaymentScheduleResponse(**row) for row in rows]
+    return fastapi_render(CreditoWithSchedule(**credit_view.model_dump(), payment_schedule=schedule, summary=summary))
+
+
+def fast(credito, schedules, pagos, rows):
+    # The credit and summary views are cached models; only the dump is per request
+    credit_view = CreditoResponse.model_validate(credito)
+    summary = PaymentService.summarize_credito(credito)
+    document = credit_view.model_dump()
+    document.update(payment_schedule=rows, summary=summary.model_dump())
+    return FastJSONResponse(document).body
+
+
+PATHS = {"legacy": legacy, "models": models, "fast": fast}
+
+
+def cpu_per_call(fn, args, min_seconds):
+    calls = 0
+    start = time.process_time()
+    while True:
+        fn(*args)
+        calls += 1
+        elapsed = time.process_time() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cuotas", type=int, nargs="+", default=[12, 36, 120, 360])
+    parser.add_argument("--pagos", type=int, default=2, help="Pagos per cuota")
+    parser.add_argument("--seconds", type=float, default=1.0, help="CPU seconds per measurement")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    report = {"pagos_por_cuota": args.pagos, "results": []}
+
+    for cuotas in args.cuotas:
+        sample = sample_credit(cuotas, args.pagos)
+        bodies = {name: fn(*sample) for name, fn in PATHS.items()}
+        assert len({json.dumps(json.loads(body), sort_keys=True) for body in bodies.values()}) == 1, \
+            "serialization paths disagree"
+
+        result = {"cuotas": cuotas, "bytes": len(bodies["fast"])}
+        for name, fn in PATHS.items():
+            result[f"{name}_us"] = round(cpu_per_call(fn, sample, args.seconds), 1)
+        result["saved_vs_legacy_us"] = round(result["legacy_us"] - result["fast_us"], 1)
+        result["speedup_vs_legacy"] = round(result["legacy_us"] / result["fast_us"], 1)
+
+        report["results"].append(result)
+        print(json.dumps(result))
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
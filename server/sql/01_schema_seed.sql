@@ -33,13 +33,18 @@ CREATE TABLE IF NOT EXISTS core.payment_schedule (
   UNIQUE (credito_id, num_cuota)
 );
 
+-- Particionada por mes de fecha_pago (ver sql/10_pagos_particiones.sql,
+-- que crea los meses y mueve a ellos lo que cae en la partición por defecto)
 CREATE TABLE IF NOT EXISTS core.pagos (
-  pago_id      BIGSERIAL PRIMARY KEY,
+  pago_id      BIGSERIAL,
   schedule_id  BIGINT NOT NULL REFERENCES core.payment_schedule(schedule_id),
   fecha_pago   TIMESTAMPTZ NOT NULL,
   monto        NUMERIC(12,2) NOT NULL,
-  medio        TEXT
-);
+  medio        TEXT,
+  PRIMARY KEY (pago_id, fecha_pago)
+) PARTITION BY RANGE (fecha_pago);
+
+CREATE TABLE IF NOT EXISTS core.pagos_default PARTITION OF core.pagos DEFAULT;
 
 -- Índices mínimos
 CREATE INDEX IF NOT EXISTS ix_ps_credito_cuota ON core.payment_schedule(credito_id, num_cuota);
@@ -0,0 +1,5 @@
+-- sql/02_overdue_index.sql
+-- Cartera vencida: índice parcial en el orden del keyset de /payments/overdue
+CREATE INDEX IF NOT EXISTS ix_ps_overdue_keyset
+  ON core.payment_schedule(fecha_vencimiento, schedule_id)
+  WHERE estado IN ('vencida', 'parcial');
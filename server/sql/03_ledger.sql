@@ -0,0 +1,50 @@
+-- sql/03_ledger.sql
+-- Ledger de saldos: monto pagado / saldo por cuota y por crédito, y contadores
+-- de cuotas por estado. Se mantienen en PaymentService.create_payment y se
+-- verifican/reparan con `python -m app.cli reconcile-ledger [--repair]`.
+ALTER TABLE core.payment_schedule
+  ADD COLUMN IF NOT EXISTS monto_pagado    NUMERIC(12,2) NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS saldo_pendiente NUMERIC(12,2);
+
+ALTER TABLE core.creditos
+  ADD COLUMN IF NOT EXISTS monto_pagado      NUMERIC(12,2) NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS saldo_pendiente   NUMERIC(12,2),
+  ADD COLUMN IF NOT EXISTS cuotas_pendientes INT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS cuotas_parciales  INT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS cuotas_pagadas    INT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS cuotas_vencidas   INT NOT NULL DEFAULT 0;
+
+-- Backfill desde core.pagos
+UPDATE core.payment_schedule ps
+SET monto_pagado = t.total,
+    saldo_pendiente = ps.valor_cuota - t.total
+FROM (
+  SELECT s.schedule_id, COALESCE(SUM(p.monto), 0) AS total
+  FROM core.payment_schedule s
+  LEFT JOIN core.pagos p ON p.schedule_id = s.schedule_id
+  GROUP BY s.schedule_id
+) t
+WHERE t.schedule_id = ps.schedule_id;
+
+UPDATE core.creditos cr
+SET monto_pagado      = t.monto_pagado,
+    saldo_pendiente   = cr.inversion - t.monto_pagado,
+    cuotas_pendientes = t.pendientes,
+    cuotas_parciales  = t.parciales,
+    cuotas_pagadas    = t.pagadas,
+    cuotas_vencidas   = t.vencidas
+FROM (
+  SELECT c.credito_id,
+         COALESCE(SUM(s.monto_pagado), 0) AS monto_pagado,
+         COUNT(*) FILTER (WHERE s.estado = 'pendiente') AS pendientes,
+         COUNT(*) FILTER (WHERE s.estado = 'parcial')   AS parciales,
+         COUNT(*) FILTER (WHERE s.estado = 'pagada')    AS pagadas,
+         COUNT(*) FILTER (WHERE s.estado = 'vencida')   AS vencidas
+  FROM core.creditos c
+  LEFT JOIN core.payment_schedule s ON s.credito_id = c.credito_id
+  GROUP BY c.credito_id
+) t
+WHERE t.credito_id = cr.credito_id;
+
+ALTER TABLE core.payment_schedule ALTER COLUMN saldo_pendiente SET NOT NULL;
+ALTER TABLE core.creditos ALTER COLUMN saldo_pendiente SET NOT NULL;
@@ -0,0 +1,4 @@
+-- sql/04_pagination_indexes.sql
+-- Claves de orden de los listados (paginación por cursor y offset)
+CREATE INDEX IF NOT EXISTS ix_creditos_desembolso_id ON core.creditos(fecha_desembolso, credito_id);
+CREATE INDEX IF NOT EXISTS ix_pagos_fecha_id ON core.pagos(fecha_pago, pago_id);
@@ -0,0 +1,23 @@
+-- sql/05_client_search.sql
+-- Búsqueda de clientes: trigramas sobre el nombre normalizado (minúsculas,
+-- sin tildes), prefijo exacto para documentos y filtro de ciudad por prefijo.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() es STABLE; el wrapper con diccionario explícito es IMMUTABLE y
+-- se puede usar en índices de expresión.
+CREATE OR REPLACE FUNCTION core.f_unaccent(text)
+RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+CREATE INDEX IF NOT EXISTS ix_clientes_nombre_trgm
+  ON core.clientes USING gin (core.f_unaccent(lower(nombre)) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS ix_clientes_num_doc_prefix
+  ON core.clientes (num_doc text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS ix_clientes_ciudad_prefix
+  ON core.clientes (core.f_unaccent(lower(ciudad)) text_pattern_ops);
+
+ANALYZE core.clientes;
@@ -0,0 +1,14 @@
+-- sql/06_aging.sql
+-- Envejecimiento de cuotas: `python -m app.cli age-cuotas` (y la tarea de fondo
+-- de la API) pasa a 'vencida' las cuotas 'pendiente' ya vencidas. Solo recorre
+-- las vencidas desde la última corrida (marca de agua en core.job_watermarks).
+CREATE TABLE IF NOT EXISTS core.job_watermarks (
+  job          TEXT PRIMARY KEY,
+  watermark    DATE NOT NULL,
+  last_run_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+  rows_changed INT NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS ix_ps_aging_pendiente
+  ON core.payment_schedule(fecha_vencimiento)
+  WHERE estado = 'pendiente';
@@ -0,0 +1,164 @@
+-- sql/07_portfolio_rollups.sql
+-- Cartera por tramos de mora y roll rates.
+--
+-- Cada crédito guarda la fecha de vencimiento de su cuota impaga más antigua
+-- (fecha_primera_impaga); los días de mora son hoy - esa fecha, así que el
+-- tramo de un crédito cambia con el calendario sin tener que reescribirlo.
+-- core.cartera_rollup agrega saldo y créditos vigentes por
+-- (producto, ciudad, fecha_primera_impaga) y los tramos se calculan al leer.
+--
+-- Los triggers (por sentencia, con tablas de transición) solo insertan deltas
+-- en core.cartera_deltas, sin filas calientes; el job de aging los compacta en
+-- el rollup. Las lecturas suman rollup + deltas pendientes.
+ALTER TABLE core.creditos
+  ADD COLUMN IF NOT EXISTS fecha_primera_impaga DATE;
+
+UPDATE core.creditos c
+SET fecha_primera_impaga = t.fecha
+FROM (
+  SELECT credito_id, MIN(fecha_vencimiento) AS fecha
+  FROM core.payment_schedule
+  WHERE estado <> 'pagada'
+  GROUP BY credito_id
+) t
+WHERE t.credito_id = c.credito_id
+  AND c.fecha_primera_impaga IS DISTINCT FROM t.fecha;
+
+CREATE OR REPLACE FUNCTION core.f_tramo_mora(dias INT)
+RETURNS TEXT LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT CASE
+    WHEN dias <= 0  THEN '0'
+    WHEN dias <= 30 THEN '1-30'
+    WHEN dias <= 60 THEN '31-60'
+    WHEN dias <= 90 THEN '61-90'
+    ELSE '90+'
+  END
+$$;
+
+CREATE TABLE IF NOT EXISTS core.cartera_rollup (
+  producto             TEXT NOT NULL,
+  ciudad               TEXT NOT NULL,          -- '' sin ciudad
+  fecha_primera_impaga DATE NOT NULL,
+  creditos             INT NOT NULL,
+  saldo_pendiente      NUMERIC(14,2) NOT NULL,
+  PRIMARY KEY (producto, ciudad, fecha_primera_impaga)
+);
+
+CREATE TABLE IF NOT EXISTS core.cartera_deltas (
+  producto             TEXT NOT NULL,
+  ciudad               TEXT NOT NULL,
+  fecha_primera_impaga DATE NOT NULL,
+  creditos             INT NOT NULL,
+  saldo_pendiente      NUMERIC(14,2) NOT NULL
+);
+
+-- Foto por crédito al cierre de cada mes y transiciones entre tramos
+CREATE TABLE IF NOT EXISTS core.cartera_mensual (
+  mes             DATE NOT NULL,               -- último día del mes
+  credito_id      BIGINT NOT NULL,
+  producto        TEXT NOT NULL,
+  ciudad          TEXT NOT NULL,
+  tramo           TEXT NOT NULL,
+  saldo_pendiente NUMERIC(12,2) NOT NULL,
+  PRIMARY KEY (mes, credito_id)
+);
+
+CREATE TABLE IF NOT EXISTS core.cartera_roll_rates (
+  mes             DATE NOT NULL,
+  producto        TEXT NOT NULL,
+  ciudad          TEXT NOT NULL,
+  tramo_desde     TEXT NOT NULL,
+  tramo_hasta     TEXT NOT NULL,               -- 'cerrado' si salió de la cartera
+  creditos        INT NOT NULL,
+  saldo_pendiente NUMERIC(14,2) NOT NULL,
+  PRIMARY KEY (mes, producto, ciudad, tramo_desde, tramo_hasta)
+);
+
+-- Carga inicial (idempotente)
+DELETE FROM core.cartera_deltas;
+DELETE FROM core.cartera_rollup;
+INSERT INTO core.cartera_rollup (producto, ciudad, fecha_primera_impaga, creditos, saldo_pendiente)
+SELECT c.producto, COALESCE(cl.ciudad, ''), c.fecha_primera_impaga, COUNT(*), SUM(c.saldo_pendiente)
+FROM core.creditos c
+JOIN core.clientes cl ON cl.cliente_id = c.cliente_id
+WHERE c.estado = 'vigente' AND c.fecha_primera_impaga IS NOT NULL
+GROUP BY 1, 2, 3;
+
+CREATE OR REPLACE FUNCTION core.trg_cartera_creditos()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO core.cartera_deltas
+    SELECT n.producto, COALESCE(cl.ciudad, ''), n.fecha_primera_impaga, COUNT(*), SUM(n.saldo_pendiente)
+    FROM new_rows n
+    JOIN core.clientes cl ON cl.cliente_id = n.cliente_id
+    WHERE n.estado = 'vigente' AND n.fecha_primera_impaga IS NOT NULL
+    GROUP BY 1, 2, 3;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO core.cartera_deltas
+    SELECT o.producto, COALESCE(cl.ciudad, ''), o.fecha_primera_impaga, -COUNT(*), -SUM(o.saldo_pendiente)
+    FROM old_rows o
+    JOIN core.clientes cl ON cl.cliente_id = o.cliente_id
+    WHERE o.estado = 'vigente' AND o.fecha_primera_impaga IS NOT NULL
+    GROUP BY 1, 2, 3;
+  ELSE
+    -- Solo las filas cuyo aporte al rollup cambió (no p.ej. los contadores)
+    INSERT INTO core.cartera_deltas
+    SELECT d.producto, COALESCE(cl.ciudad, ''), d.fecha_primera_impaga, SUM(d.signo), SUM(d.signo * d.saldo_pendiente)
+    FROM (
+      SELECT o.cliente_id, o.producto, o.estado, o.fecha_primera_impaga, o.saldo_pendiente, -1 AS signo
+      FROM old_rows o JOIN new_rows n ON n.credito_id = o.credito_id
+      WHERE (o.cliente_id, o.producto, o.estado, o.fecha_primera_impaga, o.saldo_pendiente)
+            IS DISTINCT FROM (n.cliente_id, n.producto, n.estado, n.fecha_primera_impaga, n.saldo_pendiente)
+      UNION ALL
+      SELECT n.cliente_id, n.producto, n.estado, n.fecha_primera_impaga, n.saldo_pendiente, 1
+      FROM old_rows o JOIN new_rows n ON n.credito_id = o.credito_id
+      WHERE (o.cliente_id, o.producto, o.estado, o.fecha_primera_impaga, o.saldo_pendiente)
+            IS DISTINCT FROM (n.cliente_id, n.producto, n.estado, n.fecha_primera_impaga, n.saldo_pendiente)
+    ) d
+    JOIN core.clientes cl ON cl.cliente_id = d.cliente_id
+    WHERE d.estado = 'vigente' AND d.fecha_primera_impaga IS NOT NULL
+    GROUP BY 1, 2, 3;
+  END IF;
+  RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION core.trg_cartera_clientes()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO core.cartera_deltas
+  SELECT c.producto, v.ciudad, c.fecha_primera_impaga, SUM(v.signo), SUM(v.signo * c.saldo_pendiente)
+  FROM (
+    SELECT o.cliente_id, COALESCE(o.ciudad, '') AS ciudad, -1 AS signo
+    FROM old_rows o JOIN new_rows n ON n.cliente_id = o.cliente_id
+    WHERE o.ciudad IS DISTINCT FROM n.ciudad
+    UNION ALL
+    SELECT n.cliente_id, COALESCE(n.ciudad, ''), 1
+    FROM old_rows o JOIN new_rows n ON n.cliente_id = o.cliente_id
+    WHERE o.ciudad IS DISTINCT FROM n.ciudad
+  ) v
+  JOIN core.creditos c ON c.cliente_id = v.cliente_id
+  WHERE c.estado = 'vigente' AND c.fecha_primera_impaga IS NOT NULL
+  GROUP BY 1, 2, 3;
+  RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS cartera_creditos_ins ON core.creditos;
+DROP TRIGGER IF EXISTS cartera_creditos_upd ON core.creditos;
+DROP TRIGGER IF EXISTS cartera_creditos_del ON core.creditos;
+DROP TRIGGER IF EXISTS cartera_clientes_upd ON core.clientes;
+
+CREATE TRIGGER cartera_creditos_ins AFTER INSERT ON core.creditos
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_cartera_creditos();
+CREATE TRIGGER cartera_creditos_upd AFTER UPDATE ON core.creditos
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_cartera_creditos();
+CREATE TRIGGER cartera_creditos_del AFTER DELETE ON core.creditos
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_cartera_creditos();
+CREATE TRIGGER cartera_clientes_upd AFTER UPDATE ON core.clientes
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_cartera_clientes();
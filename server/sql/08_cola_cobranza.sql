@@ -0,0 +1,128 @@
+-- sql/08_cola_cobranza.sql
+-- Cola de cobranza: créditos en mora ordenados por prioridad de llamada.
+--
+-- prioridad(hoy) = días de mora + 0,5 × días sin pagar + 10 × ln(1 + saldo / 100.000)
+--
+-- Los días sin pagar cuentan desde el último pago (o el desembolso si nunca
+-- pagó). Los dos términos en días crecen al mismo ritmo para todos los
+-- créditos, así que el orden no cambia con el calendario: cada fila guarda
+-- la parte fija (prioridad_base) y la prioridad del día se calcula al leer.
+--
+-- La cola se mantiene por crédito: un trigger por sentencia sobre creditos
+-- la actualiza cuando cambian el estado, el saldo o la cuota impaga más
+-- antigua (pagos, cargas masivas, reparación del ledger), y el job de aging
+-- agrega los créditos cuya primera cuota impaga acaba de vencer. Los agentes
+-- reservan filas con FOR UPDATE SKIP LOCKED (reservado_hasta).
+CREATE INDEX IF NOT EXISTS ix_creditos_primera_impaga
+  ON core.creditos(fecha_primera_impaga) WHERE estado = 'vigente';
+
+CREATE TABLE IF NOT EXISTS core.cola_cobranza (
+  credito_id           BIGINT PRIMARY KEY REFERENCES core.creditos(credito_id) ON DELETE CASCADE,
+  cliente_id           BIGINT NOT NULL,
+  fecha_primera_impaga DATE NOT NULL,
+  ultimo_pago          DATE,                   -- NULL si nunca pagó
+  saldo_pendiente      NUMERIC(12,2) NOT NULL,
+  prioridad_base       NUMERIC(14,4) NOT NULL,
+  agente               TEXT,
+  reservado_hasta      TIMESTAMPTZ,            -- reserva del agente, o pospuesto hasta
+  actualizado_en       TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_cola_cobranza_prioridad
+  ON core.cola_cobranza(prioridad_base DESC, credito_id);
+CREATE INDEX IF NOT EXISTS ix_cola_cobranza_agente
+  ON core.cola_cobranza(agente) WHERE agente IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION core.f_cobranza_base(fecha_primera_impaga DATE, ultimo_pago DATE, saldo NUMERIC)
+RETURNS NUMERIC LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT round(
+    10 * ln(1 + GREATEST(saldo, 0) / 100000)
+    - (fecha_primera_impaga - DATE '2000-01-01')
+    - 0.5 * (ultimo_pago - DATE '2000-01-01'),
+    4
+  )
+$$;
+
+CREATE OR REPLACE FUNCTION core.f_cobranza_prioridad(base NUMERIC, hoy DATE)
+RETURNS NUMERIC LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT round(base + 1.5 * (hoy - DATE '2000-01-01'), 2)
+$$;
+
+-- Fecha del último pago del crédito. Ningún pago es anterior al desembolso,
+-- así que ese límite poda las particiones previas al crédito;
+-- sql/10_pagos_particiones.sql la redefine para incluir los meses archivados.
+CREATE OR REPLACE FUNCTION core.f_ultimo_pago(credito BIGINT, desembolso DATE)
+RETURNS DATE LANGUAGE sql STABLE AS $$
+  SELECT MAX(p.fecha_pago)::date
+  FROM core.payment_schedule ps
+  JOIN core.pagos p ON p.schedule_id = ps.schedule_id
+  WHERE ps.credito_id = credito AND p.fecha_pago >= desembolso
+$$;
+
+-- Recalcula las filas de los créditos dados: entran o se actualizan los que
+-- están en mora al día `hoy`, salen los demás. Las reservas se conservan.
+CREATE OR REPLACE FUNCTION core.refrescar_cola_cobranza(ids BIGINT[], hoy DATE DEFAULT CURRENT_DATE)
+RETURNS INT LANGUAGE plpgsql AS $$
+DECLARE
+  salieron INT;
+  cambiaron INT;
+BEGIN
+  IF cardinality(ids) = 0 THEN
+    RETURN 0;
+  END IF;
+
+  DELETE FROM core.cola_cobranza q
+  USING unnest(ids) AS i(credito_id), core.creditos c
+  WHERE q.credito_id = i.credito_id
+    AND c.credito_id = q.credito_id
+    AND (c.estado <> 'vigente' OR c.fecha_primera_impaga IS NULL OR c.fecha_primera_impaga >= hoy);
+  GET DIAGNOSTICS salieron = ROW_COUNT;
+
+  INSERT INTO core.cola_cobranza AS q
+    (credito_id, cliente_id, fecha_primera_impaga, ultimo_pago, saldo_pendiente, prioridad_base)
+  SELECT c.credito_id, c.cliente_id, c.fecha_primera_impaga, up.fecha, c.saldo_pendiente,
+         core.f_cobranza_base(c.fecha_primera_impaga, COALESCE(up.fecha, c.fecha_desembolso), c.saldo_pendiente)
+  FROM unnest(ids) AS i(credito_id)
+  JOIN core.creditos c ON c.credito_id = i.credito_id
+  LEFT JOIN LATERAL (SELECT core.f_ultimo_pago(c.credito_id, c.fecha_desembolso) AS fecha) up ON true
+  WHERE c.estado = 'vigente' AND c.fecha_primera_impaga < hoy
+  ON CONFLICT (credito_id) DO UPDATE
+  SET cliente_id = EXCLUDED.cliente_id,
+      fecha_primera_impaga = EXCLUDED.fecha_primera_impaga,
+      ultimo_pago = EXCLUDED.ultimo_pago,
+      saldo_pendiente = EXCLUDED.saldo_pendiente,
+      prioridad_base = EXCLUDED.prioridad_base,
+      actualizado_en = now()
+  WHERE (q.cliente_id, q.fecha_primera_impaga, q.ultimo_pago, q.saldo_pendiente)
+        IS DISTINCT FROM (EXCLUDED.cliente_id, EXCLUDED.fecha_primera_impaga, EXCLUDED.ultimo_pago, EXCLUDED.saldo_pendiente);
+  GET DIAGNOSTICS cambiaron = ROW_COUNT;
+
+  RETURN salieron + cambiaron;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION core.trg_cola_cobranza_creditos()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  -- Solo los créditos cuyo aporte a la cola cambió (no p.ej. los contadores)
+  PERFORM core.refrescar_cola_cobranza(ARRAY(
+    SELECT n.credito_id
+    FROM old_rows o JOIN new_rows n ON n.credito_id = o.credito_id
+    WHERE (o.cliente_id, o.estado, o.fecha_primera_impaga, o.saldo_pendiente)
+          IS DISTINCT FROM (n.cliente_id, n.estado, n.fecha_primera_impaga, n.saldo_pendiente)
+  ));
+  RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS cola_cobranza_creditos_upd ON core.creditos;
+
+CREATE TRIGGER cola_cobranza_creditos_upd AFTER UPDATE ON core.creditos
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_cola_cobranza_creditos();
+
+-- Carga inicial (idempotente)
+SELECT core.refrescar_cola_cobranza(ARRAY(
+  SELECT credito_id FROM core.creditos
+  WHERE estado = 'vigente' AND fecha_primera_impaga < CURRENT_DATE
+));
@@ -0,0 +1,137 @@
+-- sql/09_pagos_diarios.sql
+-- Recaudo diario por (fecha, medio, producto, ciudad).
+--
+-- core.pagos_diarios agrega cantidad y monto de pagos por día de fecha_pago
+-- (en la zona horaria de la base), medio de pago, producto del crédito y
+-- ciudad actual del cliente. Igual que la cartera (07), los triggers por
+-- sentencia solo insertan deltas en core.pagos_diarios_deltas, sin filas
+-- calientes; el job de aging los compacta y las lecturas suman rollup +
+-- deltas pendientes, así que nunca recorren core.pagos. Un pago sin medio
+-- (pagos.medio admite NULL) se agrupa con medio '', igual que la ciudad.
+CREATE TABLE IF NOT EXISTS core.pagos_diarios (
+  fecha    DATE NOT NULL,
+  medio    TEXT NOT NULL,                      -- '' sin medio
+  producto TEXT NOT NULL,
+  ciudad   TEXT NOT NULL,                      -- '' sin ciudad
+  pagos    INT NOT NULL,
+  monto    NUMERIC(14,2) NOT NULL,
+  PRIMARY KEY (fecha, medio, producto, ciudad)
+);
+
+CREATE TABLE IF NOT EXISTS core.pagos_diarios_deltas (
+  fecha    DATE NOT NULL,
+  medio    TEXT NOT NULL,
+  producto TEXT NOT NULL,
+  ciudad   TEXT NOT NULL,
+  pagos    INT NOT NULL,
+  monto    NUMERIC(14,2) NOT NULL
+);
+
+-- Carga inicial (idempotente)
+DELETE FROM core.pagos_diarios_deltas;
+DELETE FROM core.pagos_diarios;
+INSERT INTO core.pagos_diarios (fecha, medio, producto, ciudad, pagos, monto)
+SELECT p.fecha_pago::date, COALESCE(p.medio, ''), c.producto, COALESCE(cl.ciudad, ''), COUNT(*), SUM(p.monto)
+FROM core.pagos p
+JOIN core.payment_schedule ps ON ps.schedule_id = p.schedule_id
+JOIN core.creditos c ON c.credito_id = ps.credito_id
+JOIN core.clientes cl ON cl.cliente_id = c.cliente_id
+GROUP BY 1, 2, 3, 4;
+
+CREATE OR REPLACE FUNCTION core.trg_pagos_diarios_pagos()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO core.pagos_diarios_deltas
+    SELECT n.fecha_pago::date, COALESCE(n.medio, ''), c.producto, COALESCE(cl.ciudad, ''), COUNT(*), SUM(n.monto)
+    FROM new_rows n
+    JOIN core.payment_schedule ps ON ps.schedule_id = n.schedule_id
+    JOIN core.creditos c ON c.credito_id = ps.credito_id
+    JOIN core.clientes cl ON cl.cliente_id = c.cliente_id
+    GROUP BY 1, 2, 3, 4;
+  END IF;
+
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    INSERT INTO core.pagos_diarios_deltas
+    SELECT o.fecha_pago::date, COALESCE(o.medio, ''), c.producto, COALESCE(cl.ciudad, ''), -COUNT(*), -SUM(o.monto)
+    FROM old_rows o
+    JOIN core.payment_schedule ps ON ps.schedule_id = o.schedule_id
+    JOIN core.creditos c ON c.credito_id = ps.credito_id
+    JOIN core.clientes cl ON cl.cliente_id = c.cliente_id
+    GROUP BY 1, 2, 3, 4;
+  END IF;
+
+  RETURN NULL;
+END
+$$;
+
+-- Un crédito que cambia de producto (o de cliente) mueve todos sus pagos
+CREATE OR REPLACE FUNCTION core.trg_pagos_diarios_creditos()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO core.pagos_diarios_deltas
+  SELECT p.fecha_pago::date, COALESCE(p.medio, ''), d.producto, d.ciudad, SUM(d.signo), SUM(d.signo * p.monto)
+  FROM (
+    SELECT o.credito_id, o.producto, COALESCE(cl.ciudad, '') AS ciudad, -1 AS signo
+    FROM old_rows o
+    JOIN new_rows n ON n.credito_id = o.credito_id
+    JOIN core.clientes cl ON cl.cliente_id = o.cliente_id
+    WHERE (o.producto, o.cliente_id) IS DISTINCT FROM (n.producto, n.cliente_id)
+    UNION ALL
+    SELECT n.credito_id, n.producto, COALESCE(cl.ciudad, ''), 1
+    FROM old_rows o
+    JOIN new_rows n ON n.credito_id = o.credito_id
+    JOIN core.clientes cl ON cl.cliente_id = n.cliente_id
+    WHERE (o.producto, o.cliente_id) IS DISTINCT FROM (n.producto, n.cliente_id)
+  ) d
+  JOIN core.payment_schedule ps ON ps.credito_id = d.credito_id
+  JOIN core.pagos p ON p.schedule_id = ps.schedule_id
+  GROUP BY 1, 2, 3, 4;
+  RETURN NULL;
+END
+$$;
+
+-- Un cliente que cambia de ciudad mueve los pagos de todos sus créditos
+CREATE OR REPLACE FUNCTION core.trg_pagos_diarios_clientes()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO core.pagos_diarios_deltas
+  SELECT p.fecha_pago::date, COALESCE(p.medio, ''), c.producto, v.ciudad, SUM(v.signo), SUM(v.signo * p.monto)
+  FROM (
+    SELECT o.cliente_id, COALESCE(o.ciudad, '') AS ciudad, -1 AS signo
+    FROM old_rows o JOIN new_rows n ON n.cliente_id = o.cliente_id
+    WHERE o.ciudad IS DISTINCT FROM n.ciudad
+    UNION ALL
+    SELECT n.cliente_id, COALESCE(n.ciudad, ''), 1
+    FROM old_rows o JOIN new_rows n ON n.cliente_id = o.cliente_id
+    WHERE o.ciudad IS DISTINCT FROM n.ciudad
+  ) v
+  JOIN core.creditos c ON c.cliente_id = v.cliente_id
+  JOIN core.payment_schedule ps ON ps.credito_id = c.credito_id
+  JOIN core.pagos p ON p.schedule_id = ps.schedule_id
+  GROUP BY 1, 2, 3, 4;
+  RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS pagos_diarios_pagos_ins ON core.pagos;
+DROP TRIGGER IF EXISTS pagos_diarios_pagos_upd ON core.pagos;
+DROP TRIGGER IF EXISTS pagos_diarios_pagos_del ON core.pagos;
+DROP TRIGGER IF EXISTS pagos_diarios_creditos_upd ON core.creditos;
+DROP TRIGGER IF EXISTS pagos_diarios_clientes_upd ON core.clientes;
+
+CREATE TRIGGER pagos_diarios_pagos_ins AFTER INSERT ON core.pagos
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_pagos_diarios_pagos();
+CREATE TRIGGER pagos_diarios_pagos_upd AFTER UPDATE ON core.pagos
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_pagos_diarios_pagos();
+CREATE TRIGGER pagos_diarios_pagos_del AFTER DELETE ON core.pagos
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_pagos_diarios_pagos();
+CREATE TRIGGER pagos_diarios_creditos_upd AFTER UPDATE ON core.creditos
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_pagos_diarios_creditos();
+CREATE TRIGGER pagos_diarios_clientes_upd AFTER UPDATE ON core.clientes
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_pagos_diarios_clientes();
@@ -0,0 +1,186 @@
+-- sql/10_pagos_particiones.sql
+-- core.pagos particionada por mes de fecha_pago.
+--
+-- Cada mes vive en core.pagos_AAAA_MM; core.pagos_default recibe lo que cae
+-- fuera de las particiones existentes (pagos muy atrasados o a futuro) hasta
+-- que se crea su mes, momento en que esas filas se mueven a la partición.
+-- El job de aging (y `python -m app.cli ensure-partitions`) crea el mes en
+-- curso, los PAGOS_PARTITIONS_AHEAD siguientes y los meses que aparezcan en
+-- la partición por defecto. `python -m app.cli archive-pagos` desprende los
+-- meses que superan PAGOS_ARCHIVE_AFTER_MONTHS, sea cual sea el estado de
+-- sus créditos, los pasa a core.pagos_archivo y los exporta.
+--
+-- payment_schedule no se particiona: pagos la referencia por FK y las
+-- consultas por crédito la recorren por credito_id, no por fecha.
+
+-- Crea (si falta) la partición del mes de `mes`, moviendo a ella las filas
+-- de ese mes que estén en la partición por defecto.
+CREATE OR REPLACE FUNCTION core.crear_particion_pagos(mes DATE)
+RETURNS BOOLEAN LANGUAGE plpgsql AS $$
+DECLARE
+  desde DATE := date_trunc('month', mes)::date;
+  hasta DATE := (date_trunc('month', mes) + INTERVAL '1 month')::date;
+  nombre TEXT := 'pagos_' || to_char(mes, 'YYYY_MM');
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('core.pagos_particiones'));
+
+  IF to_regclass('core.' || nombre) IS NOT NULL THEN
+    RETURN false;
+  END IF;
+
+  EXECUTE format('CREATE TABLE core.%I (LIKE core.pagos INCLUDING DEFAULTS)', nombre);
+
+  IF to_regclass('core.pagos_default') IS NOT NULL THEN
+    EXECUTE format(
+      'WITH movidos AS (
+         DELETE FROM core.pagos_default WHERE fecha_pago >= %L AND fecha_pago < %L RETURNING *
+       )
+       INSERT INTO core.%I SELECT * FROM movidos',
+      desde, hasta, nombre
+    );
+  END IF;
+
+  EXECUTE format(
+    'ALTER TABLE core.pagos ATTACH PARTITION core.%I FOR VALUES FROM (%L) TO (%L)',
+    nombre, desde, hasta
+  );
+  RETURN true;
+END
+$$;
+
+-- Desde `desde` (o el mes en curso) hasta `meses_adelante` meses adelante,
+-- más los meses con filas en la partición por defecto. Devuelve las
+-- particiones creadas.
+CREATE OR REPLACE FUNCTION core.asegurar_particiones_pagos(meses_adelante INT DEFAULT 3, desde DATE DEFAULT NULL)
+RETURNS INT LANGUAGE plpgsql AS $$
+DECLARE
+  actual DATE := date_trunc('month', now())::date;
+  mes DATE;
+  creadas INT := 0;
+BEGIN
+  FOR mes IN
+    SELECT generate_series(
+             LEAST(date_trunc('month', COALESCE(desde, actual))::date, actual),
+             actual + meses_adelante * INTERVAL '1 month',
+             INTERVAL '1 month'
+           )::date
+    UNION
+    SELECT DISTINCT date_trunc('month', fecha_pago)::date FROM core.pagos_default
+    ORDER BY 1
+  LOOP
+    IF core.crear_particion_pagos(mes) THEN
+      creadas := creadas + 1;
+    END IF;
+  END LOOP;
+
+  RETURN creadas;
+END
+$$;
+
+-- Convierte una core.pagos sin particionar (instalaciones anteriores)
+DO $$
+DECLARE
+  mes DATE;
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = 'core.pagos'::regclass) <> 'r' THEN
+    RETURN;
+  END IF;
+
+  ALTER TABLE core.pagos RENAME TO pagos_sin_particionar;
+  ALTER TABLE core.pagos_sin_particionar DROP CONSTRAINT IF EXISTS pagos_pkey;
+  DROP INDEX IF EXISTS core.ix_pagos_schedule_fecha;
+  DROP INDEX IF EXISTS core.ix_pagos_fecha_id;
+  ALTER SEQUENCE core.pagos_pago_id_seq OWNED BY NONE;
+  ALTER TABLE core.pagos_sin_particionar ALTER COLUMN pago_id DROP DEFAULT;
+
+  CREATE TABLE core.pagos (
+    pago_id      BIGINT NOT NULL DEFAULT nextval('core.pagos_pago_id_seq'),
+    schedule_id  BIGINT NOT NULL REFERENCES core.payment_schedule(schedule_id),
+    fecha_pago   TIMESTAMPTZ NOT NULL,
+    monto        NUMERIC(12,2) NOT NULL,
+    medio        TEXT,
+    PRIMARY KEY (pago_id, fecha_pago)
+  ) PARTITION BY RANGE (fecha_pago);
+  ALTER SEQUENCE core.pagos_pago_id_seq OWNED BY core.pagos.pago_id;
+
+  CREATE TABLE core.pagos_default PARTITION OF core.pagos DEFAULT;
+  CREATE INDEX ix_pagos_schedule_fecha ON core.pagos(schedule_id, fecha_pago);
+  CREATE INDEX ix_pagos_fecha_id ON core.pagos(fecha_pago, pago_id);
+
+  FOR mes IN SELECT DISTINCT date_trunc('month', fecha_pago)::date FROM core.pagos_sin_particionar LOOP
+    PERFORM core.crear_particion_pagos(mes);
+  END LOOP;
+
+  -- Los triggers del rollup diario (09) se fueron con la tabla anterior y se
+  -- recrean abajo, así que la copia no genera deltas
+  INSERT INTO core.pagos (pago_id, schedule_id, fecha_pago, monto, medio)
+  SELECT pago_id, schedule_id, fecha_pago, monto, medio FROM core.pagos_sin_particionar;
+
+  DROP TABLE core.pagos_sin_particionar;
+END
+$$;
+
+SELECT core.asegurar_particiones_pagos(3);
+
+DROP TRIGGER IF EXISTS pagos_diarios_pagos_ins ON core.pagos;
+DROP TRIGGER IF EXISTS pagos_diarios_pagos_upd ON core.pagos;
+DROP TRIGGER IF EXISTS pagos_diarios_pagos_del ON core.pagos;
+
+CREATE TRIGGER pagos_diarios_pagos_ins AFTER INSERT ON core.pagos
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_pagos_diarios_pagos();
+CREATE TRIGGER pagos_diarios_pagos_upd AFTER UPDATE ON core.pagos
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_pagos_diarios_pagos();
+CREATE TRIGGER pagos_diarios_pagos_del AFTER DELETE ON core.pagos
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_pagos_diarios_pagos();
+
+-- Meses archivados y, por cuota, lo que quedó fuera de core.pagos: el
+-- ledger se sigue verificando contra pagos + archivados.
+--
+-- Cada mes archivado queda como partición core.pagos_archivo_AAAA_MM de
+-- core.pagos_archivo. Las lecturas de pagos de la API (cronograma,
+-- /payments, /payments/{id}, /payments/credito, /payments/schedule,
+-- /exports/pagos) leen de ambas tablas. Sin FK: es historia de solo lectura.
+CREATE TABLE IF NOT EXISTS core.pagos_archivo (
+  pago_id      BIGINT NOT NULL,
+  schedule_id  BIGINT NOT NULL,
+  fecha_pago   TIMESTAMPTZ NOT NULL,
+  monto        NUMERIC(12,2) NOT NULL,
+  medio        TEXT,
+  PRIMARY KEY (pago_id, fecha_pago)
+) PARTITION BY RANGE (fecha_pago);
+
+CREATE INDEX IF NOT EXISTS ix_pagos_archivo_schedule_fecha ON core.pagos_archivo(schedule_id, fecha_pago);
+CREATE INDEX IF NOT EXISTS ix_pagos_archivo_fecha_id ON core.pagos_archivo(fecha_pago, pago_id);
+
+-- La cola de cobranza (sql/08) sigue viendo el último pago de un crédito
+-- aunque su mes ya esté archivado
+CREATE OR REPLACE FUNCTION core.f_ultimo_pago(credito BIGINT, desembolso DATE)
+RETURNS DATE LANGUAGE sql STABLE AS $$
+  SELECT MAX(p.fecha_pago)::date
+  FROM core.payment_schedule ps
+  JOIN (
+    SELECT schedule_id, fecha_pago FROM core.pagos WHERE fecha_pago >= desembolso
+    UNION ALL
+    SELECT schedule_id, fecha_pago FROM core.pagos_archivo WHERE fecha_pago >= desembolso
+  ) p ON p.schedule_id = ps.schedule_id
+  WHERE ps.credito_id = credito
+$$;
+
+CREATE TABLE IF NOT EXISTS core.pagos_archivos (
+  particion    TEXT PRIMARY KEY,
+  desde        DATE NOT NULL,
+  hasta        DATE NOT NULL,
+  pagos        INT NOT NULL,
+  monto        NUMERIC(14,2) NOT NULL,
+  archivo      TEXT,                           -- NULL mientras no se exporte
+  archivado_en TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS core.pagos_archivados (
+  schedule_id  BIGINT PRIMARY KEY,
+  pagos        INT NOT NULL,
+  monto        NUMERIC(14,2) NOT NULL
+);
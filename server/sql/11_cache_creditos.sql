@@ -0,0 +1,58 @@
+-- sql/11_cache_creditos.sql
+-- Invalidación del cache de créditos entre procesos.
+--
+-- Cada API guarda en memoria las vistas por crédito (cronograma, resumen,
+-- próxima cuota). Los cambios que hace otro proceso (la CLI, el job de
+-- aging, reconcile-ledger --repair, regenerate-schedules u otro worker de
+-- la API) se avisan con NOTIFY en el canal credit_cache: el payload es la
+-- lista de credito_id separados por coma, o '*' cuando no cabe en un
+-- mensaje y hay que vaciar el cache. NOTIFY se entrega al confirmar la
+-- transacción y Postgres descarta los mensajes repetidos dentro de ella.
+
+CREATE OR REPLACE FUNCTION core.notificar_cache_creditos(ids BIGINT[])
+RETURNS VOID LANGUAGE plpgsql AS $$
+DECLARE
+  payload TEXT := array_to_string(ARRAY(SELECT DISTINCT unnest(ids) ORDER BY 1), ',');
+BEGIN
+  IF payload = '' THEN
+    RETURN;
+  END IF;
+
+  -- El payload de NOTIFY admite menos de 8000 bytes
+  PERFORM pg_notify('credit_cache', CASE WHEN length(payload) < 7900 THEN payload ELSE '*' END);
+END
+$$;
+
+CREATE OR REPLACE FUNCTION core.trg_cache_creditos()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM core.notificar_cache_creditos(ARRAY(SELECT credito_id FROM new_rows));
+  ELSE
+    PERFORM core.notificar_cache_creditos(ARRAY(SELECT credito_id FROM old_rows));
+  END IF;
+  RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS cache_creditos_upd ON core.creditos;
+DROP TRIGGER IF EXISTS cache_creditos_del ON core.creditos;
+DROP TRIGGER IF EXISTS cache_schedule_ins ON core.payment_schedule;
+DROP TRIGGER IF EXISTS cache_schedule_upd ON core.payment_schedule;
+DROP TRIGGER IF EXISTS cache_schedule_del ON core.payment_schedule;
+
+CREATE TRIGGER cache_creditos_upd AFTER UPDATE ON core.creditos
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_cache_creditos();
+CREATE TRIGGER cache_creditos_del AFTER DELETE ON core.creditos
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_cache_creditos();
+CREATE TRIGGER cache_schedule_ins AFTER INSERT ON core.payment_schedule
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_cache_creditos();
+CREATE TRIGGER cache_schedule_upd AFTER UPDATE ON core.payment_schedule
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_cache_creditos();
+CREATE TRIGGER cache_schedule_del AFTER DELETE ON core.payment_schedule
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_cache_creditos();
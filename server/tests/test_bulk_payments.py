@@ -0,0 +1,85 @@
+"""Parsing of bulk payment uploads: every bad row gets its own rejection."""
+import asyncio
+import json
+from decimal import Decimal
+
+import pytest
+
+from app.services.bulk_payments import parse_rows
+
+
+def parse(body: bytes, fmt: str):
+    async def chunks():
+        yield body
+    
+    async def collect():
+        return [row async for row in parse_rows(chunks(), fmt)]
+    
+    return asyncio.run(collect())
+
+
+def ndjson(*records) -> bytes:
+    return "\n".join(json.dumps(record) for record in records).encode()
+
+
+def test_valid_rows_are_parsed():
+    rows = parse(ndjson(
+        {"schedule_id": 12, "monto": "10.50", "medio": "app"},
+        {"schedule_id": "13", "monto": 7, "fecha_pago": "2026-10-01T09:30:00"},
+    ), "ndjson")
+    
+    assert [(row.schedule_id, row.monto, row.medio, row.error) for row in rows] == [
+        (12, Decimal("10.50"), "app", None),
+        (13, Decimal("7"), None, None),
+    ]
+    assert rows[1].fecha_pago.isoformat() == "2026-10-01T09:30:00"
+
+
+@pytest.mark.parametrize("record, error", [
+    ({"schedule_id": 12.9, "monto": "1.00"}, "schedule_id must be an integer id"),
+    ({"schedule_id": True, "monto": "1.00"}, "schedule_id must be an integer id"),
+    ({"schedule_id": "12.9", "monto": "1.00"}, "schedule_id must be an integer id"),
+    ({"schedule_id": -3, "monto": "1.00"}, "schedule_id must be an integer id"),
+    ({"monto": "1.00"}, "schedule_id must be an integer id"),
+    ({"schedule_id": 12, "monto": True}, "monto must be a number"),
+    ({"schedule_id": 12, "monto": ["1.00"]}, "monto must be a number"),
+    ({"schedule_id": 12, "monto": "uno"}, "monto must be a number"),
+    ({"schedule_id": 12, "monto": "1.00", "medio": 5}, "medio must be a string"),
+    ({"schedule_id": 12, "monto": "1.00", "fecha_pago": 20261001}, "fecha_pago must be an ISO 8601 string"),
+])
+def test_mistyped_fields_reject_the_row(record, error):
+    rows = parse(ndjson(record, {"schedule_id": 12, "monto": "1.00"}), "ndjson")
+    
+    assert [row.error for row in rows] == [error, None]
+
+
+def test_undecodable_lines_reject_only_their_row():
+    rows = parse(b'{"schedule_id": 12, "monto": "1.00"}\n\xff\xfe\n{"schedule_id": 13, "monto": "2.00"}', "ndjson")
+    
+    assert [(row.row, row.error) for row in rows] == [
+        (1, None), (2, "Malformed row: not valid UTF-8"), (3, None)
+    ]
+
+
+def test_bad_csv_header_fails_before_any_row():
+    with pytest.raises(ValueError, match="missing columns: monto"):
+        parse(b"schedule_id,medio\n12,app\n", "csv")
+
+
+def test_a_bad_line_after_committed_chunks_is_reported_per_row(client, portfolio, monkeypatch):
+    from app.core.config import settings
+    
+    monkeypatch.setattr(settings, "bulk_batch_size", 1)
+    schedule_ids = [ids[-3] for ids in portfolio.schedules.values()][:2]
+    body = (
+        f'{{"schedule_id": {schedule_ids[0]}, "monto": "1.00"}}\n'.encode()
+        + b"\xff{not json\n"
+        + f'{{"schedule_id": {schedule_ids[1]}, "monto": "1.00"}}\n'.encode()
+    )
+    
+    response = client.post("/api/v1/payments/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["received"], report["accepted"], report["rejected"]) == (3, 2, 1)
+    assert report["results"][1]["error"].startswith("Malformed row")
@@ -0,0 +1,110 @@
+"""
+Writes made outside the API process reach its credit cache through
+NOTIFY (sql/11_cache_creditos.sql) instead of waiting for the TTL.
+"""
+import time
+
+import pytest
+from sqlalchemy import text
+
+from app.core.cache import CacheInvalidationListener, CreditCache
+
+
+@pytest.fixture
+def listener(database):
+    from app.core.database import engine
+    
+    cache = CreditCache(max_entries=100, ttl_seconds=3600)
+    listener = CacheInvalidationListener(cache, engine)
+    listener.start()
+    
+    deadline = time.monotonic() + 10
+    while not listener.listening:
+        assert time.monotonic() < deadline, "listener did not connect"
+        time.sleep(0.05)
+    
+    yield listener
+    listener.stop()
+
+
+def cached(cache, key):
+    return cache.load(key, "view", lambda: "reloaded")
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 10
+    while not condition():
+        assert time.monotonic() < deadline, "no invalidation received"
+        time.sleep(0.05)
+
+
+def test_other_process_writes_invalidate_the_cache(listener, portfolio):
+    from app.core.database import engine
+    
+    cache = listener.cache
+    paid, other = portfolio.creditos[6], portfolio.creditos[36]
+    cache.load(paid, "view", lambda: "cached")
+    cache.load(other, "view", lambda: "cached")
+    
+    # Plain SQL, as the CLI or another worker would commit it: no in-process invalidate
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE core.payment_schedule SET estado = estado WHERE credito_id = :id AND num_cuota = 1"),
+            {"id": paid}
+        )
+    
+    wait_for(lambda: cached(cache, paid) == "reloaded")
+    assert cached(cache, other) == "cached"
+    
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE core.creditos SET estado = estado WHERE credito_id = :id"), {"id": other})
+    
+    wait_for(lambda: cached(cache, other) == "reloaded")
+
+
+def test_rolled_back_writes_do_not_invalidate(listener, portfolio):
+    from app.core.database import engine
+    
+    cache = listener.cache
+    credito_id = portfolio.creditos[6]
+    cache.load(credito_id, "view", lambda: "cached")
+    
+    with engine.connect() as conn:
+        conn.execute(text("UPDATE core.creditos SET estado = estado WHERE credito_id = :id"), {"id": credito_id})
+        conn.rollback()
+    
+    notifications = listener.notifications
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_notify('credit_cache', '-1')"))
+    wait_for(lambda: listener.notifications > notifications)
+    
+    assert cached(cache, credito_id) == "cached"
+
+
+def test_oversized_changes_clear_the_cache(listener):
+    cache = listener.cache
+    cache.load(1, "view", lambda: "cached")
+    
+    listener.apply("*")
+    
+    assert cached(cache, 1) == "reloaded"
+
+
+def test_concurrent_loads_of_other_views_are_all_stored():
+    cache = CreditCache(max_entries=10, ttl_seconds=60)
+    
+    # The summary load finishes while the schedule load is still running
+    cache.load(1, "schedule", lambda: (cache.load(1, "summary", lambda: "summary"), "schedule")[1])
+    
+    assert cache.load(1, "schedule", lambda: "unused") == "schedule"
+    assert cache.load(1, "summary", lambda: "unused") == "summary"
+    assert cache.stats()["dropped"] == 0
+
+
+def test_loads_racing_an_invalidation_are_dropped_and_counted():
+    cache = CreditCache(max_entries=10, ttl_seconds=60)
+    
+    assert cache.load(1, "schedule", lambda: (cache.invalidate(1), "stale")[1]) == "stale"
+    
+    assert cache.load(1, "schedule", lambda: "fresh") == "fresh"
+    assert cache.stats()["dropped"] == 1
@@ -0,0 +1,157 @@
+"""
+Collections worklist: kept current by the creditos trigger and the aging
+job, and leased to agents without handing one credit to two of them.
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from app.models.models import Cliente, Credito
+from app.services.amortization_service import AmortizationService
+from app.services.cobranza_service import CobranzaService
+from app.services.payment_service import PaymentService
+
+
+@pytest.fixture
+def session(database):
+    from app.core.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def worklist(database, portfolio):
+    """Drops every lease and snooze once the test is done."""
+    
+    yield
+    
+    with database.begin() as conn:
+        conn.execute(text("UPDATE core.cola_cobranza SET agente = NULL, reservado_hasta = NULL"))
+
+
+def cola_row(db, credito_id):
+    return db.execute(
+        text("SELECT * FROM core.cola_cobranza WHERE credito_id = :id"), {"id": credito_id}
+    ).first()
+
+
+def test_payments_keep_worklist_rows_current(session, portfolio):
+    credito_id = portfolio.creditos[36]
+    
+    PaymentService(session).create_payment(portfolio.schedules[credito_id][-6], Decimal("10.00"), "app")
+    
+    row = cola_row(session, credito_id)
+    credito = session.query(Credito).filter(Credito.credito_id == credito_id).one()
+    
+    assert row.saldo_pendiente == credito.saldo_pendiente
+    assert row.fecha_primera_impaga == credito.fecha_primera_impaga
+    assert row.ultimo_pago == date.today()
+
+
+def test_worklist_ordered_by_priority(session, portfolio):
+    items = CobranzaService(session).worklist(limit=100)
+    
+    assert {item["credito_id"] for item in items} >= set(portfolio.creditos.values())
+    assert [item["prioridad"] for item in items] == sorted((item["prioridad"] for item in items), reverse=True)
+    
+    for item in items:
+        saldo = float(item["saldo_pendiente"])
+        expected = item["dias_mora"] + 0.5 * item["dias_sin_pago"] + 10 * math.log(1 + saldo / 100000)
+        assert float(item["prioridad"]) == pytest.approx(expected, abs=0.01)
+
+
+def test_credits_leave_and_rejoin_with_their_estado(session, portfolio):
+    credito_id = portfolio.creditos[6]
+    
+    session.query(Credito).filter(Credito.credito_id == credito_id).update({"estado": "castigado"})
+    session.commit()
+    assert cola_row(session, credito_id) is None
+    
+    session.query(Credito).filter(Credito.credito_id == credito_id).update({"estado": "vigente"})
+    session.commit()
+    assert cola_row(session, credito_id) is not None
+
+
+def test_concurrent_leases_are_disjoint(database, portfolio, worklist):
+    from app.core.database import SessionLocal
+    
+    def lease(n):
+        db = SessionLocal()
+        try:
+            return CobranzaService(db).lease(f"agente-{n}", 1, 60)
+        finally:
+            db.close()
+    
+    with database.connect() as conn:
+        available = conn.execute(text("SELECT COUNT(*) FROM core.cola_cobranza")).scalar()
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        leased = [item["credito_id"] for items in pool.map(lease, range(available + 4)) for item in items]
+    
+    assert len(leased) == len(set(leased)) == available
+
+
+def test_lease_and_release_endpoints(client, portfolio, queries, worklist):
+    with queries() as log:
+        first = client.post("/api/v1/cobranza/cola/lease", json={"agente": "ana", "cantidad": 1})
+    
+    assert first.status_code == 200, first.text
+    # pick, lock and mark rows and return them with the credit and client in one statement
+    log.assert_at_most(1)
+    
+    credito_id = first.json()["items"][0]["credito_id"]
+    second = client.post("/api/v1/cobranza/cola/lease", json={"agente": "beto", "cantidad": 1}).json()
+    assert credito_id not in [item["credito_id"] for item in second["items"]]
+    
+    assert client.get("/api/v1/cobranza/cola?agente=ana").json()[0]["credito_id"] == credito_id
+    
+    wrong = client.post(f"/api/v1/cobranza/cola/{credito_id}/release", json={"agente": "beto"})
+    assert wrong.status_code == 404
+    
+    snoozed = client.post(f"/api/v1/cobranza/cola/{credito_id}/release", json={"agente": "ana", "posponer_minutos": 60})
+    assert snoozed.status_code == 200, snoozed.text
+    
+    # Snoozed credits are not leased again until the snooze ends
+    again = client.post("/api/v1/cobranza/cola/lease", json={"agente": "ana", "cantidad": 100}).json()
+    assert credito_id not in [item["credito_id"] for item in again["items"]]
+    
+    assert client.post("/api/v1/cobranza/cola/lease", json={"agente": " ", "cantidad": 1}).status_code == 400
+    assert client.post("/api/v1/cobranza/cola/lease", json={"agente": "ana", "cantidad": 0}).status_code == 400
+
+
+def test_aging_enrolls_credits_once_their_first_cuota_is_due(session):
+    cliente = Cliente(tipo_doc="CC", num_doc="7070707070", nombre="Cobranza Futura", ciudad="Pereira")
+    session.add(cliente)
+    session.flush()
+    credito = Credito(
+        cliente_id=cliente.cliente_id,
+        producto="e-bike",
+        inversion=Decimal("3000000.00"),
+        cuotas_totales=12,
+        tea=Decimal("0.289000"),
+        fecha_desembolso=date.today(),
+        fecha_inicio_pago=date.today() + timedelta(days=5),
+        estado="vigente"
+    )
+    session.add(credito)
+    session.flush()
+    AmortizationService(session).create_schedule(credito)
+    session.commit()
+    
+    service = CobranzaService(session)
+    assert cola_row(session, credito.credito_id) is None
+    
+    assert service.enroll(today=date.today() + timedelta(days=10), since=date.today()) >= 1
+    assert cola_row(session, credito.credito_id).fecha_primera_impaga == date.today() + timedelta(days=5)
+    
+    # Not delinquent yet as of the real today
+    service.rebuild()
+    assert cola_row(session, credito.credito_id) is None
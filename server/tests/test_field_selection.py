@@ -0,0 +1,51 @@
+"""``?fields=`` parsing against a response model and projection of plain documents."""
+import pytest
+from fastapi import HTTPException
+
+from app.api.deps import field_selection
+from app.api.responses import select_fields
+from app.schemas.cliente import ClienteDashboard
+
+select = field_selection(ClienteDashboard)
+
+DOCUMENT = {
+    "cliente_id": 7,
+    "nombre": "Lucía Peña",
+    "saldo_pendiente": "90.00",
+    "next_payment": {"schedule_id": 5, "fecha_vencimiento": "2026-11-01", "saldo_pendiente": "9.00"},
+    "creditos": [
+        {"credito_id": 1, "producto": "e-bike", "next_payment": {"schedule_id": 5, "fecha_vencimiento": "2026-11-01"}},
+        {"credito_id": 2, "producto": "e-moped", "next_payment": None},
+    ],
+}
+
+
+def test_no_fields_keeps_everything():
+    assert select(None) is None
+    assert select_fields(DOCUMENT, None) == DOCUMENT
+
+
+def test_nested_fields_are_projected_per_list_item():
+    tree = select("nombre, next_payment.fecha_vencimiento,creditos.producto,creditos.next_payment.fecha_vencimiento")
+    
+    assert select_fields(DOCUMENT, tree) == {
+        "nombre": "Lucía Peña",
+        "next_payment": {"fecha_vencimiento": "2026-11-01"},
+        "creditos": [
+            {"producto": "e-bike", "next_payment": {"fecha_vencimiento": "2026-11-01"}},
+            {"producto": "e-moped", "next_payment": None},
+        ],
+    }
+
+
+@pytest.mark.parametrize("fields", ["creditos,creditos.producto", "creditos.producto,creditos"])
+def test_bare_name_selects_the_whole_value(fields):
+    assert select_fields(DOCUMENT, select(fields)) == {"creditos": DOCUMENT["creditos"]}
+
+
+@pytest.mark.parametrize("fields", ["bogus", "nombre.first", "creditos.next_payment.nope"])
+def test_unknown_fields_are_rejected(fields):
+    with pytest.raises(HTTPException) as error:
+        select(fields)
+    
+    assert error.value.status_code == 400
@@ -0,0 +1,237 @@
+"""
+core.pagos is partitioned by fecha_pago month: pagos land in their month,
+date- and credit-bounded reads only touch the matching partitions, and
+months past retention move to core.pagos_archivo without breaking the
+ledger, the rollup or per-credit history.
+"""
+import csv
+import gzip
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from app.models.models import Cliente, Credito, PaymentSchedule
+from app.services.amortization_service import AmortizationService
+from app.services.ledger_service import LedgerService
+from app.services.partition_service import PartitionService
+from app.services.payment_rollup_service import PaymentRollupService
+from app.services.payment_service import PaymentRejected, PaymentService
+
+
+@pytest.fixture
+def session(database):
+    from app.core.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def partition_of(db, pago_id):
+    return db.execute(
+        text("SELECT tableoid::regclass::text FROM core.pagos WHERE pago_id = :id"), {"id": pago_id}
+    ).scalar()
+
+
+def new_credit(db, num_doc, fecha_desembolso):
+    cliente = Cliente(tipo_doc="CC", num_doc=num_doc, nombre="Pagos Antiguos", ciudad="Cali")
+    db.add(cliente)
+    db.flush()
+    credito = Credito(
+        cliente_id=cliente.cliente_id,
+        producto="e-moped",
+        inversion=Decimal("2000000.00"),
+        cuotas_totales=6,
+        tea=Decimal("0.289000"),
+        fecha_desembolso=fecha_desembolso,
+        fecha_inicio_pago=fecha_desembolso + timedelta(days=30),
+        estado="vigente"
+    )
+    db.add(credito)
+    db.flush()
+    AmortizationService(db).create_schedule(credito)
+    db.commit()
+    
+    schedule_id = db.query(PaymentSchedule.schedule_id).filter(
+        PaymentSchedule.credito_id == credito.credito_id, PaymentSchedule.num_cuota == 1
+    ).scalar()
+    
+    return credito.credito_id, schedule_id
+
+
+def backdate(db, pago_id, fecha_pago):
+    db.execute(
+        text("UPDATE core.pagos SET fecha_pago = :fecha WHERE pago_id = :id"),
+        {"fecha": fecha_pago, "id": pago_id}
+    )
+    db.commit()
+
+
+def backdated_credit(db, num_doc, fecha_pago, estado):
+    """A credit with one pago moved back to ``fecha_pago``, left in ``estado``."""
+    
+    credito_id, schedule_id = new_credit(db, num_doc, fecha_pago - timedelta(days=40))
+    pago = PaymentService(db).create_payment(schedule_id, Decimal("5000.00"), "efectivo")
+    backdate(db, pago.pago_id, fecha_pago)
+    db.query(Credito).filter(Credito.credito_id == credito_id).update({"estado": estado})
+    db.commit()
+    
+    return pago.pago_id, schedule_id
+
+
+def test_pagos_land_in_their_month(session, portfolio):
+    credito_id = portfolio.creditos[36]
+    pago = PaymentService(session).create_payment(portfolio.schedules[credito_id][-5], Decimal("15.00"), "app")
+    
+    assert partition_of(session, pago.pago_id) == f"core.pagos_{date.today():%Y_%m}"
+
+
+def test_ensure_moves_default_rows_into_a_new_month(session):
+    pago_id, _ = backdated_credit(session, "8080808080", date(2003, 5, 20), "vigente")
+    assert partition_of(session, pago_id) == "core.pagos_default"
+    
+    assert PartitionService(session).ensure() >= 1
+    assert partition_of(session, pago_id) == "core.pagos_2003_05"
+    assert PartitionService(session).ensure() == 0
+
+
+def archived_in(db, pago_id):
+    return db.execute(
+        text("SELECT tableoid::regclass::text FROM core.pagos_archivo WHERE pago_id = :id"), {"id": pago_id}
+    ).scalar()
+
+
+def exported(path):
+    with gzip.open(path, "rt", newline="") as file:
+        return [int(row["pago_id"]) for row in csv.DictReader(file)]
+
+
+def test_archive_moves_every_month_past_retention(client, session, tmp_path):
+    cancelado_id, cancelado_cuota = backdated_credit(session, "9090909090", date(2001, 3, 10), "cancelado")
+    vigente_id, vigente_cuota = backdated_credit(session, "9191919191", date(2001, 2, 10), "vigente")
+    PartitionService(session).ensure()
+    totals = PaymentRollupService(session).totals()
+    
+    months = PartitionService(session).archive(out_dir=str(tmp_path), before=date(2001, 4, 1))
+    by_name = {month["particion"]: month for month in months}
+    
+    # Whatever the state of their credits
+    assert exported(by_name["pagos_2001_02"]["archivo"]) == [vigente_id]
+    assert exported(by_name["pagos_2001_03"]["archivo"]) == [cancelado_id]
+    assert partition_of(session, vigente_id) is None
+    assert partition_of(session, cancelado_id) is None
+    assert archived_in(session, vigente_id) == "core.pagos_archivo_2001_02"
+    assert archived_in(session, cancelado_id) == "core.pagos_archivo_2001_03"
+    
+    # The ledger still reconciles, the rollup keeps the pagos and the
+    # credit's history still shows them
+    drifted = [row["schedule_id"] for row in LedgerService(session).reconcile().schedule_drift]
+    assert vigente_cuota not in drifted and cancelado_cuota not in drifted
+    assert PaymentRollupService(session).totals() == totals
+    assert [p["pago_id"] for p in client.get(f"/api/v1/payments/schedule/{vigente_cuota}").json()] == [vigente_id]
+    assert [p["pago_id"] for p in client.get(f"/api/v1/payments/?schedule_id={vigente_cuota}").json()["items"]] == [vigente_id]
+    assert client.get(f"/api/v1/payments/{vigente_id}").json()["pago_id"] == vigente_id
+    assert client.get(f"/api/v1/payments/{vigente_id}?fecha=2001-02-10").json()["pago_id"] == vigente_id
+    exported_pagos = client.get("/api/v1/exports/pagos?format=ndjson&desde=2001-02-01&hasta=2001-03-31").text
+    assert [json.loads(line)["pago_id"] for line in exported_pagos.splitlines()] == [vigente_id, cancelado_id]
+    
+    # A pago backdated into an archived month is merged on the next run
+    late = PaymentService(session).create_payment(vigente_cuota, Decimal("700.00"), "app")
+    backdate(session, late.pago_id, date(2001, 2, 20))
+    PartitionService(session).ensure()
+    
+    months = PartitionService(session).archive(out_dir=str(tmp_path), before=date(2001, 4, 1))
+    
+    assert [(month["particion"], month["pagos"]) for month in months] == [("pagos_2001_02", 1)]
+    assert archived_in(session, late.pago_id) == "core.pagos_archivo_2001_02"
+    assert sorted(exported(months[0]["archivo"])) == sorted([vigente_id, late.pago_id])
+    assert session.execute(
+        text("SELECT pagos FROM core.pagos_archivos WHERE particion = 'pagos_2001_02'")
+    ).scalar() == 2
+    assert vigente_cuota not in [row["schedule_id"] for row in LedgerService(session).reconcile().schedule_drift]
+
+
+def test_pagos_before_disbursement_are_rejected(client, session):
+    _, schedule_id = new_credit(session, "7171717171", date.today() + timedelta(days=10))
+    
+    with pytest.raises(PaymentRejected):
+        PaymentService(session).create_payment(schedule_id, Decimal("100.00"), "app")
+    
+    response = client.post(
+        "/api/v1/payments/bulk",
+        content=f"schedule_id,monto,medio,fecha_pago\n{schedule_id},100.00,app,\n",
+        headers={"Content-Type": "text/csv"}
+    )
+    assert response.json()["rejected"] == 1
+    assert "disbursement" in response.json()["results"][0]["error"]
+
+
+def scanned_partitions(database, statement, parameters, analyze=False):
+    """
+    Partitions of core.pagos (and core.pagos_archivo) in the plan; with
+    ``analyze``, only those the executor did not prune at run time.
+    """
+    
+    raw = database.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(f"EXPLAIN ({'ANALYZE, ' if analyze else ''}FORMAT JSON) {statement}", parameters)
+        plan = cursor.fetchone()[0][0]["Plan"]
+        raw.rollback()
+    finally:
+        raw.close()
+    
+    def relations(node):
+        found = set()
+        if node.get("Relation Name", "").startswith("pagos_") and node.get("Actual Loops", 1):
+            found.add(node["Relation Name"])
+        for child in node.get("Plans", []):
+            found |= relations(child)
+        return found
+    
+    return relations(plan)
+
+
+@pytest.mark.parametrize("db_mode", ["threadpool"], indirect=True)  # re-explained with psycopg2
+def test_date_bounded_endpoints(client, database, portfolio, queries):
+    credito_id = portfolio.creditos[6]
+    today = date.today()
+    
+    pagos = client.get(f"/api/v1/payments/credito/{credito_id}?desde={today}&hasta={today}").json()
+    assert pagos and all(pago["fecha_pago"][:10] == today.isoformat() for pago in pagos)
+    
+    assert client.get(f"/api/v1/payments/credito/{credito_id}?desde=2000-01-01&hasta=2000-01-31").json() == []
+    assert client.get(f"/api/v1/payments/?desde={today}&hasta=2000-01-01").status_code == 400
+    
+    pago_id = pagos[0]["pago_id"]
+    assert client.get(f"/api/v1/payments/{pago_id}?fecha={today}").json()["pago_id"] == pago_id
+    assert client.get(f"/api/v1/payments/{pago_id}?fecha=2000-01-01").status_code == 404
+    
+    with queries() as log:
+        client.get(f"/api/v1/payments/?desde={today}&hasta={today}")
+    
+    # Only this month's partition is planned for a one-day range
+    assert scanned_partitions(database, *log.find("FROM core.pagos")) == {f"pagos_{today:%Y_%m}"}
+
+
+@pytest.mark.parametrize("db_mode", ["threadpool"], indirect=True)  # re-explained with psycopg2
+def test_credit_history_skips_months_before_disbursement(client, database, session, portfolio, queries, tmp_path):
+    backdated_credit(session, "6161616161", date(2002, 6, 10), "cancelado")
+    PartitionService(session).ensure()
+    PartitionService(session).archive(out_dir=str(tmp_path), before=date(2002, 7, 1))
+    credito_id = portfolio.creditos[6]
+    desembolso = session.get(Credito, credito_id).fecha_desembolso
+    
+    with queries() as log:
+        assert client.get(f"/api/v1/payments/credito/{credito_id}").json()
+    
+    # Months before the credit existed, live or archived, are never scanned
+    scanned = scanned_partitions(database, *log.find("FROM core.pagos"), analyze=True)
+    assert f"pagos_{date.today():%Y_%m}" in scanned
+    assert "pagos_2002_06" not in scanned and "pagos_archivo_2002_06" not in scanned
+    assert all(name[-7:] >= f"{desembolso:%Y_%m}" for name in scanned - {"pagos_default"})
@@ -0,0 +1,136 @@
+"""
+Concurrent posts to one cuota: the ledger must add up and the balance
+check must not be raceable. Reconciling repairs a drifted ledger.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from sqlalchemy import event, func, update
+
+from app.core.profiler import QueryProfiler
+from app.models.models import Credito, Pago, PaymentSchedule
+from app.services.ledger_service import LedgerService
+from app.services.payment_service import PaymentRejected, PaymentService
+
+
+def post(schedule_id, monto):
+    from app.core.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        return PaymentService(db).create_payment(schedule_id, monto, "app")
+    except PaymentRejected:
+        return None
+    finally:
+        db.close()
+
+
+def ledger(credito_id, schedule_id):
+    from app.core.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        cuota = db.query(PaymentSchedule).filter(PaymentSchedule.schedule_id == schedule_id).one()
+        pagos = db.query(func.coalesce(func.sum(Pago.monto), 0)).filter(Pago.schedule_id == schedule_id).scalar()
+        credito = db.query(Credito).filter(Credito.credito_id == credito_id).one()
+        totals = db.query(
+            func.sum(PaymentSchedule.monto_pagado), func.sum(PaymentSchedule.saldo_pendiente)
+        ).filter(PaymentSchedule.credito_id == credito_id).one()
+        return cuota, pagos, credito, totals
+    finally:
+        db.close()
+
+
+def test_concurrent_posts_to_one_cuota_all_apply(portfolio):
+    credito_id = portfolio.creditos[36]
+    schedule_id = portfolio.schedules[credito_id][-4]
+    before, paid_before, _, _ = ledger(credito_id, schedule_id)
+    
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: post(schedule_id, Decimal("1.00")), range(64)))
+    
+    assert all(results)
+    cuota, paid, credito, (monto_pagado, _) = ledger(credito_id, schedule_id)
+    
+    assert paid - paid_before == Decimal("64.00")
+    assert cuota.monto_pagado == before.monto_pagado + Decimal("64.00") == paid
+    assert cuota.saldo_pendiente == before.saldo_pendiente - Decimal("64.00")
+    assert cuota.estado == "parcial"
+    assert credito.monto_pagado == monto_pagado
+    assert credito.saldo_pendiente == credito.inversion - monto_pagado
+
+
+def test_profiler_does_not_rerun_writable_ctes(portfolio):
+    from app.core.database import engine
+    
+    credito_id = portfolio.creditos[36]
+    schedule_id = portfolio.schedules[credito_id][-6]
+    before, paid_before, _, _ = ledger(credito_id, schedule_id)
+    
+    profiler = QueryProfiler(slow_ms=0.0, explain_analyze=True)
+    profiler.instrument(engine)
+    try:
+        assert post(schedule_id, Decimal("1.00"))
+    finally:
+        event.remove(engine, "before_cursor_execute", profiler._before)
+        event.remove(engine, "after_cursor_execute", profiler._after)
+    
+    cuota, paid, _, _ = ledger(credito_id, schedule_id)
+    assert paid - paid_before == Decimal("1.00")
+    assert cuota.monto_pagado == before.monto_pagado + Decimal("1.00")
+    
+    plans = [row["plan"] for row in profiler.report() if row["plan"] and "UPDATE" in row["example"]]
+    assert plans and not any("actual time" in plan for plan in plans)
+
+
+def test_balance_check_cannot_be_raced(portfolio):
+    credito_id = portfolio.creditos[36]
+    schedule_id = portfolio.schedules[credito_id][-5]
+    saldo = ledger(credito_id, schedule_id)[0].saldo_pendiente
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: post(schedule_id, saldo), range(8)))
+    
+    assert sum(result is not None for result in results) == 1
+    
+    cuota, paid, credito, (monto_pagado, _) = ledger(credito_id, schedule_id)
+    assert cuota.estado == "pagada"
+    assert cuota.saldo_pendiente == 0
+    assert cuota.monto_pagado == paid
+    assert credito.monto_pagado == monto_pagado
+
+
+def test_reconcile_repairs_cuota_estado(portfolio):
+    from app.core.database import SessionLocal
+    
+    credito_id = portfolio.creditos[6]
+    paid, partial = portfolio.schedules[credito_id][:2]
+    
+    db = SessionLocal()
+    try:
+        counters = db.query(Credito.cuotas_pagadas, Credito.cuotas_parciales).filter(
+            Credito.credito_id == credito_id
+        ).one()
+        
+        # A lost posting on the paid cuota and a stray estado on the partial one
+        db.execute(update(PaymentSchedule).where(PaymentSchedule.schedule_id == paid).values(
+            monto_pagado=0, saldo_pendiente=PaymentSchedule.valor_cuota, estado="vencida"
+        ))
+        db.execute(update(PaymentSchedule).where(PaymentSchedule.schedule_id == partial).values(estado="pagada"))
+        db.commit()
+        
+        report = LedgerService(db).reconcile(repair=True)
+        assert {paid, partial} <= {row["schedule_id"] for row in report.schedule_drift}
+        
+        estados = dict(db.query(PaymentSchedule.schedule_id, PaymentSchedule.estado).filter(
+            PaymentSchedule.schedule_id.in_([paid, partial])
+        ).all())
+        assert estados == {paid: "pagada", partial: "parcial"}
+        
+        # The credit counters were recomputed from the repaired estados
+        assert db.query(Credito.cuotas_pagadas, Credito.cuotas_parciales).filter(
+            Credito.credito_id == credito_id
+        ).one() == counters
+        assert LedgerService(db).reconcile().consistent
+    finally:
+        db.close()
@@ -0,0 +1,117 @@
+"""
+The daily collections rollup must always equal an aggregation over
+core.pagos, whether or not its deltas have been compacted.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from app.models.models import Cliente
+from app.services.payment_rollup_service import PaymentRollupService
+from app.services.payment_service import PaymentService
+
+GROUPS = ("medio", "producto", "ciudad")
+RANGE = {"desde": date(2000, 1, 1), "hasta": date.today() + timedelta(days=1)}
+
+
+@pytest.fixture
+def session(database):
+    from app.core.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def from_pagos(db):
+    # Archived months stay in the rollup, so they count here too
+    rows = db.execute(text("""
+        SELECT p.fecha_pago::date AS periodo, p.medio, c.producto, NULLIF(cl.ciudad, '') AS ciudad,
+               COUNT(*) AS pagos, SUM(p.monto) AS monto
+        FROM (
+            SELECT schedule_id, fecha_pago, monto, medio FROM core.pagos
+            UNION ALL
+            SELECT schedule_id, fecha_pago, monto, medio FROM core.pagos_archivo
+        ) p
+        JOIN core.payment_schedule ps ON ps.schedule_id = p.schedule_id
+        JOIN core.creditos c ON c.credito_id = ps.credito_id
+        JOIN core.clientes cl ON cl.cliente_id = c.cliente_id
+        GROUP BY 1, 2, 3, 4
+    """)).all()
+    
+    return {(r.periodo, r.medio, r.producto, r.ciudad): (r.pagos, r.monto) for r in rows}
+
+
+def from_rollup(db):
+    points = PaymentRollupService(db).series(group_by=GROUPS, **RANGE)
+    
+    return {(p["periodo"], p["medio"], p["producto"], p["ciudad"]): (p["pagos"], p["monto"]) for p in points}
+
+
+def test_rollup_matches_pagos_before_and_after_compaction(session, portfolio):
+    credito_id = portfolio.creditos[36]
+    PaymentService(session).create_payment(portfolio.schedules[credito_id][-7], Decimal("25.00"), "efectivo")
+    
+    assert from_rollup(session) == from_pagos(session)
+    
+    assert PaymentRollupService(session).compact() > 0
+    assert from_rollup(session) == from_pagos(session)
+
+
+def test_city_change_moves_the_clients_pagos(session, portfolio):
+    cliente = session.query(Cliente).filter(Cliente.cliente_id == portfolio.cliente_id).one()
+    
+    cliente.ciudad = "Envigado"
+    session.commit()
+    assert from_rollup(session) == from_pagos(session)
+    
+    cliente.ciudad = "Medellín"
+    session.commit()
+    assert from_rollup(session) == from_pagos(session)
+
+
+def test_weeks_add_up_their_days(session, portfolio):
+    service = PaymentRollupService(session)
+    
+    weekly = defaultdict(lambda: [0, Decimal("0")])
+    for point in service.series(periodo="dia", group_by=["medio"], **RANGE):
+        week = point["periodo"] - timedelta(days=point["periodo"].weekday())
+        weekly[week, point["medio"]][0] += point["pagos"]
+        weekly[week, point["medio"]][1] += point["monto"]
+    
+    assert {
+        (point["periodo"], point["medio"]): [point["pagos"], point["monto"]]
+        for point in service.series(periodo="semana", group_by=["medio"], **RANGE)
+    } == dict(weekly)
+
+
+def test_series_endpoint_filters_and_validates(client, portfolio):
+    today = date.today().isoformat()
+    
+    points = client.get(f"/api/v1/payments/analytics/series?desde={today}&hasta={today}&medio=app&group_by=medio").json()
+    assert points and all(point["medio"] == "app" and point["periodo"] == today for point in points)
+    
+    response = client.get(f"/api/v1/payments/analytics/series?desde={today}&hasta=2000-01-01")
+    assert response.status_code == 400
+
+
+def test_pagos_without_medio_are_rolled_up(client, session, portfolio):
+    credito_id = portfolio.creditos[36]
+    
+    response = client.post("/api/v1/payments/", json={
+        "schedule_id": portfolio.schedules[credito_id][-8],
+        "fecha_pago": datetime.now().isoformat(),
+        "monto": "12.00"
+    })
+    assert response.status_code == 200, response.text
+    
+    assert from_rollup(session) == from_pagos(session)
+    assert PaymentRollupService(session).totals()[None][0] >= 1
+    
+    PaymentRollupService(session).compact()
+    assert from_rollup(session) == from_pagos(session)
@@ -0,0 +1,270 @@
+"""
+Statement budgets per endpoint and PaymentService method.
+
+Each budget is the number of SQL statements the handler executes with the
+response cache disabled. Per-credit endpoints are checked on a 6-cuota and
+a 36-cuota credit: the count must not depend on the schedule length, which
+is what an N+1 loop would break.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.services.payment_service import PaymentService
+
+CUOTAS = [6, 36]
+
+
+def pytest_generate_tests(metafunc):
+    # Endpoint budgets must hold in both database modes
+    if "client" in metafunc.fixturenames:
+        metafunc.parametrize("db_mode", ["async", "threadpool"], indirect=True)
+
+CREDIT_ROUTES = [
+    ("/api/v1/creditos/{credito_id}", 3),
+    ("/api/v1/creditos/{credito_id}?include_payments=false", 2),
+    ("/api/v1/creditos/{credito_id}/schedule", 2),
+    ("/api/v1/creditos/{credito_id}/summary", 1),
+    ("/api/v1/creditos/{credito_id}/next-payment", 2),
+    ("/api/v1/payments/credito/{credito_id}", 1),
+    ("/api/v1/payments/analytics/summary?credito_id={credito_id}", 1),
+]
+
+LIST_ROUTES = [
+    ("/api/v1/creditos/", 2),
+    ("/api/v1/creditos/?paging=cursor", 2),
+    ("/api/v1/creditos/?total=estimated", 2),
+    ("/api/v1/creditos/?total=none", 1),
+    ("/api/v1/creditos/analytics/overview", 1),
+    ("/api/v1/creditos/analytics/aging", 1),
+    ("/api/v1/creditos/analytics/aging?group_by=ciudad", 1),
+    ("/api/v1/creditos/analytics/roll-rates", 1),
+    ("/api/v1/clientes/", 2),
+    ("/api/v1/clientes/?search=maria gomez", 2),
+    ("/api/v1/clientes/?search=10203", 2),
+    ("/api/v1/clientes/{cliente_id}", 1),
+    ("/api/v1/clientes/{cliente_id}/creditos", 2),
+    ("/api/v1/clientes/{cliente_id}/dashboard", 2),
+    ("/api/v1/clientes/{cliente_id}/dashboard?fields=nombre,saldo_pendiente,creditos.next_payment", 2),
+    ("/api/v1/cobranza/cola", 1),
+    ("/api/v1/payments/", 2),
+    ("/api/v1/payments/?paging=cursor", 2),
+    ("/api/v1/payments/overdue", 1),
+    ("/api/v1/payments/overdue?total=exact", 2),
+    ("/api/v1/payments/analytics/summary", 1),
+    ("/api/v1/payments/analytics/series", 1),
+    ("/api/v1/payments/analytics/series?periodo=semana&group_by=medio&group_by=ciudad", 1),
+    ("/api/v1/exports/schedule", 1),
+    ("/api/v1/exports/pagos?format=ndjson", 1),
+]
+
+
+@pytest.mark.parametrize("cuotas", CUOTAS)
+@pytest.mark.parametrize("path, budget", CREDIT_ROUTES)
+def test_credit_route_budget(client, portfolio, queries, path, budget, cuotas):
+    credito_id = portfolio.creditos[cuotas]
+    
+    with queries() as log:
+        response = client.get(path.format(credito_id=credito_id))
+    
+    assert response.status_code == 200, response.text
+    log.assert_at_most(budget)
+
+
+@pytest.mark.parametrize("path, budget", CREDIT_ROUTES)
+def test_credit_route_independent_of_schedule_length(client, portfolio, queries, path, budget):
+    counts = []
+    
+    for cuotas in CUOTAS:
+        with queries() as log:
+            client.get(path.format(credito_id=portfolio.creditos[cuotas]))
+        counts.append(len(log))
+    
+    assert counts[0] == counts[1], f"{path}: {counts[0]} statements for 6 cuotas, {counts[1]} for 36"
+
+
+@pytest.mark.parametrize("path, budget", LIST_ROUTES)
+def test_list_route_budget(client, portfolio, queries, path, budget):
+    with queries() as log:
+        response = client.get(path.format(cliente_id=portfolio.cliente_id))
+    
+    assert response.status_code == 200, response.text
+    log.assert_at_most(budget)
+
+
+@pytest.mark.parametrize("unknown", [0, 998])
+def test_credit_summaries_budget(client, portfolio, queries, unknown):
+    credito_ids = list(portfolio.creditos.values()) + list(range(10**9, 10**9 + unknown))
+    
+    with queries() as log:
+        response = client.post("/api/v1/creditos/summaries", json={"credito_ids": credito_ids})
+    
+    assert response.status_code == 200, response.text
+    assert len(response.json()["items"]) == len(portfolio.creditos)
+    assert len(response.json()["missing"]) == unknown
+    # Summaries and next cuotas of every credit in one statement, whatever the batch size
+    log.assert_at_most(1)
+
+
+def test_credit_summaries_match_single_credit_routes(client, portfolio):
+    items = client.post("/api/v1/creditos/summaries", json={"cliente_id": portfolio.cliente_id}).json()["items"]
+    
+    assert {item["credito_id"] for item in items} >= set(portfolio.creditos.values())
+    
+    for item in items:
+        summary = client.get(f"/api/v1/creditos/{item['credito_id']}/summary").json()
+        next_payment = client.get(f"/api/v1/creditos/{item['credito_id']}/next-payment").json()
+        
+        assert {key: item[key] for key in summary} == summary
+        assert item["next_payment"]["schedule_id"] == next_payment["schedule_id"]
+        assert item["next_payment"]["saldo_pendiente"] == next_payment["saldo_pendiente"]
+
+
+@pytest.mark.parametrize("cuotas", CUOTAS)
+def test_create_pago_budget(client, portfolio, queries, cuotas):
+    schedule_id = portfolio.schedules[portfolio.creditos[cuotas]][-1]
+    
+    with queries() as log:
+        response = client.post("/api/v1/payments/", json={
+            "schedule_id": schedule_id,
+            "monto": "100.00",
+            "medio": "app",
+            "fecha_pago": datetime.now().isoformat()
+        })
+    
+    assert response.status_code == 200, response.text
+    # lock cuota; update cuota + insert pago + update credit in one statement
+    log.assert_at_most(2)
+
+
+@pytest.mark.parametrize("rows", [1, 20])
+def test_bulk_pagos_budget_per_batch(client, portfolio, queries, rows):
+    schedule_ids = [ids[-2] for ids in portfolio.schedules.values()]
+    body = "schedule_id,monto,medio,fecha_pago\n" + "".join(
+        f"{schedule_ids[n % len(schedule_ids)]},1.00,app,\n" for n in range(rows)
+    )
+    
+    with queries() as log:
+        response = client.post("/api/v1/payments/bulk", content=body, headers={"Content-Type": "text/csv"})
+    
+    assert response.status_code == 200, response.text
+    assert response.json()["accepted"] == rows
+    # lock cuotas, insert pagos, update cuotas, lock credits, update credits
+    log.assert_at_most(5)
+
+
+@pytest.mark.parametrize("cuotas", [12, 36])
+def test_create_credito_budget(client, portfolio, queries, cuotas):
+    with queries() as log:
+        response = client.post("/api/v1/creditos/", json={
+            "cliente_id": portfolio.cliente_id,
+            "producto": "e-moped",
+            "inversion": "9000000.00",
+            "cuotas_totales": cuotas,
+            "tea": "0.329",
+            "fecha_desembolso": date.today().isoformat(),
+            "fecha_inicio_pago": date.today().isoformat()
+        })
+    
+    assert response.status_code == 200, response.text
+    # check cliente, insert credit, multi-row insert of the schedule, counters, reload
+    log.assert_at_most(5)
+
+
+def test_cliente_write_budgets(client, queries):
+    with queries() as log:
+        created = client.post("/api/v1/clientes/", json={
+            "tipo_doc": "CC", "num_doc": "9988776655", "nombre": "Andrés Ríos", "ciudad": "Cali"
+        })
+    assert created.status_code == 200, created.text
+    log.assert_at_most(3)
+    
+    cliente_id = created.json()["data"]["cliente_id"]
+    
+    with queries() as log:
+        updated = client.put(f"/api/v1/clientes/{cliente_id}", json={"ciudad": "Cartagena"})
+    assert updated.status_code == 200, updated.text
+    log.assert_at_most(3)
+    
+    with queries() as log:
+        deleted = client.delete(f"/api/v1/clientes/{cliente_id}")
+    assert deleted.status_code == 200, deleted.text
+    log.assert_at_most(3)
+
+
+def test_update_credito_budget(client, portfolio, queries):
+    with queries() as log:
+        response = client.put(f"/api/v1/creditos/{portfolio.creditos[6]}", json={"producto": "e-bike"})
+    
+    assert response.status_code == 200, response.text
+    log.assert_at_most(2)
+
+
+SERVICE_BUDGETS = [
+    ("get_payment_schedule", {}, 2),
+    ("get_payment_schedule", {"include_payments": False}, 1),
+    ("get_credit_summary", {}, 1),
+    ("get_credito_with_schedule", {}, 3),
+    ("get_credito_with_schedule", {"include_payments": False}, 2),
+    ("get_credito_with_schedule", {"include_schedule": False}, 1),
+    ("get_next_payment", {}, 2),
+]
+
+
+@pytest.mark.parametrize("cuotas", CUOTAS)
+@pytest.mark.parametrize("method, kwargs, budget", SERVICE_BUDGETS)
+def test_payment_service_budget(database, portfolio, queries, method, kwargs, budget, cuotas):
+    from app.core.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        with queries() as log:
+            result = getattr(PaymentService(db), method)(portfolio.creditos[cuotas], **kwargs)
+    finally:
+        db.close()
+    
+    assert result is not None
+    log.assert_at_most(budget)
+
+
+def test_overdue_cuotas_budget(database, portfolio, queries):
+    from app.core.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        with queries() as log:
+            items, _ = PaymentService(db).get_overdue_cuotas(date.today(), size=50)
+    finally:
+        db.close()
+    
+    assert items
+    log.assert_at_most(1)
+
+
+def test_overdue_total_matches_the_pages(client, portfolio):
+    for filters in ("", "&ciudad=Medellín&producto=e-bike", "&min_saldo=1000"):
+        page = client.get(f"/api/v1/payments/overdue?size=500&total=exact{filters}").json()
+        
+        assert not page["has_next"]
+        assert page["total"] == len(page["items"])
+    
+    first = client.get("/api/v1/payments/overdue?size=1&total=estimated").json()
+    assert first["total"] >= 1 and len(first["items"]) == 1
+    assert client.get("/api/v1/payments/overdue").json()["total"] is None
+
+
+def test_create_payment_budget(database, portfolio, queries):
+    from app.core.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        with queries() as log:
+            pago = PaymentService(db).create_payment(
+                portfolio.schedules[portfolio.creditos[36]][-3], Decimal("50.00"), "efectivo"
+            )
+    finally:
+        db.close()
+    
+    assert pago.pago_id
+    log.assert_at_most(2)
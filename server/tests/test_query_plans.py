@@ -0,0 +1,94 @@
+"""
+Index usage of the key statements.
+
+Each test captures the statement an endpoint actually runs, explains it with
+sequential scans disabled and checks that the intended index serves it. The
+plan's shape (node types, relations, indexes) is also compared with the
+snapshot in tests/plans/, so a changed join strategy or a lost index shows
+up in review even when the named index is still used somewhere.
+
+Plans are explained against a production-like state rather than the few
+rows of the shared portfolio, where the planner's choice flips with test
+order: a synthetic portfolio (bench/generate_portfolio.py) with its oldest
+months archived, freshly vacuumed and analyzed (so index-only scans do not
+depend on autovacuum). It is removed after the module.
+"""
+import argparse
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from bench import generate_portfolio
+from conftest import plan_indexes
+
+PLANS = [
+    # (snapshot name, path, statement fragment, expected index)
+    ("schedule_cuotas", "/api/v1/creditos/{credito_id}/schedule",
+     "FROM core.payment_schedule", "ix_ps_credito_cuota"),
+    ("schedule_pagos", "/api/v1/creditos/{credito_id}/schedule",
+     "FROM core.pagos", "ix_pagos_schedule_fecha"),
+    ("next_payment", "/api/v1/creditos/{credito_id}/next-payment",
+     "FROM core.payment_schedule", "ix_ps_credito_cuota"),
+    ("pagos_by_schedule", "/api/v1/payments/schedule/{schedule_id}",
+     "FROM core.pagos", "ix_pagos_schedule_fecha"),
+    ("pagos_by_credito", "/api/v1/payments/credito/{credito_id}",
+     "FROM core.pagos", "ix_pagos_schedule_fecha"),
+    ("overdue_keyset", "/api/v1/payments/overdue",
+     "FROM core.payment_schedule", "ix_ps_overdue_keyset"),
+    ("overdue_count", "/api/v1/payments/overdue?total=exact",
+     "count(*)", "ix_ps_overdue_keyset"),
+    ("creditos_cursor", "/api/v1/creditos/?paging=cursor&total=none",
+     "FROM core.creditos", "ix_creditos_desembolso_id"),
+    ("pagos_cursor", "/api/v1/payments/?paging=cursor&total=none",
+     "FROM core.pagos", "ix_pagos_fecha_id"),
+    ("clientes_by_document", "/api/v1/clientes/?search=10203&total=none",
+     "FROM core.clientes", "ix_clientes_num_doc_prefix"),
+    ("clientes_by_name", "/api/v1/clientes/?search=maria gomez&total=none",
+     "FROM core.clientes", "ix_clientes_nombre_trgm"),
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def planner_statistics(database, portfolio, tmp_path_factory):
+    from app.core.database import SessionLocal
+    from app.services.amortization_service import add_months
+    from app.services.partition_service import PartitionService
+    
+    generate_portfolio.load(argparse.Namespace(
+        creditos=3000, seed=42, as_of=None, chunk_size=3000, split_rate=0.15, partial_rate=0.3
+    ))
+    
+    db = SessionLocal()
+    try:
+        PartitionService(db).archive(
+            out_dir=str(tmp_path_factory.mktemp("archive")),
+            before=add_months(date.today().replace(day=1), -24)
+        )
+    finally:
+        db.close()
+    
+    with database.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+    
+    yield
+    
+    generate_portfolio.cleanup()
+
+
+# Captured statements are re-run under EXPLAIN with psycopg2, so they must come from the sync driver
+@pytest.mark.parametrize("db_mode", ["threadpool"], indirect=True)
+@pytest.mark.parametrize("name, path, fragment, index", PLANS, ids=[p[0] for p in PLANS])
+def test_statement_uses_index(client, portfolio, queries, explain, plan_snapshot, name, path, fragment, index):
+    credito_id = portfolio.creditos[36]
+    url = path.format(credito_id=credito_id, schedule_id=portfolio.schedules[credito_id][0])
+    
+    with queries() as log:
+        response = client.get(url)
+    
+    assert response.status_code == 200, response.text
+    
+    plan = explain(*log.find(fragment))
+    
+    assert index in plan_indexes(plan), f"{name}: expected {index}, plan uses {sorted(plan_indexes(plan))}"
+    plan_snapshot(name, plan)
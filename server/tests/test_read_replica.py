@@ -0,0 +1,135 @@
+"""
+Read-replica routing pieces that do not need a database: the lag monitor,
+the read-your-writes cookie and replica-aware caching.
+"""
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.cache import CreditCache
+from app.core.replica import PRIMARY_COOKIE, ReplicaMonitor, ReplicaRoutingMiddleware, get_read_db, pinned_to_primary
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+class FakeReplica:
+    """Stands in for the replica engine; ``connect`` fails while ``lag`` is None."""
+    
+    def __init__(self, lag):
+        self.lag = lag
+    
+    def connect(self):
+        if self.lag is None:
+            raise ConnectionError("replica down")
+        return self
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def execute(self, statement):
+        return self
+    
+    def scalar(self):
+        return self.lag
+
+
+def test_monitor_caches_lag_for_check_interval():
+    clock, replica = FakeClock(), FakeReplica(lag=0.5)
+    monitor = ReplicaMonitor(replica, max_lag_seconds=5, check_interval=1, clock=clock)
+    
+    assert monitor.due()
+    monitor.check()
+    assert not monitor.due()
+    assert monitor.stats()["usable"]
+    
+    clock.now += 1
+    assert monitor.due()
+
+
+def test_monitor_marks_lagging_or_unreachable_replica_unusable():
+    replica = FakeReplica(lag=12.0)
+    monitor = ReplicaMonitor(replica, max_lag_seconds=5, check_interval=1, clock=FakeClock())
+    
+    monitor.check()
+    assert not monitor.stats()["usable"]
+    
+    replica.lag = None
+    monitor.check()
+    assert monitor.stats() == {
+        "lag_seconds": None, "max_lag_seconds": 5, "usable": False, "error": "replica down"
+    }
+
+
+def test_monitor_disabled_without_replica():
+    monitor = ReplicaMonitor(None, max_lag_seconds=5, check_interval=1)
+    
+    assert not monitor.enabled
+    assert monitor.stats() is None
+
+
+def test_pinned_to_primary():
+    assert pinned_to_primary("1010", now=1000)
+    assert not pinned_to_primary("990", now=1000)
+    assert not pinned_to_primary(None, now=1000)
+    assert not pinned_to_primary("garbage", now=1000)
+
+
+def test_successful_writes_pin_the_client_to_the_primary():
+    app = FastAPI()
+    app.add_middleware(ReplicaRoutingMiddleware, pin_seconds=6)
+    
+    @app.get("/items")
+    def read():
+        return {}
+    
+    @app.post("/items")
+    def write():
+        return {}
+    
+    @app.post("/search")
+    def search(db=Depends(get_read_db)):
+        return {}
+    
+    @app.post("/broken")
+    def broken():
+        raise HTTPException(status_code=400)
+    
+    client = TestClient(app)
+    
+    assert PRIMARY_COOKIE not in client.get("/items").cookies
+    assert PRIMARY_COOKIE not in client.post("/broken").cookies
+    assert PRIMARY_COOKIE not in client.post("/search").cookies
+    
+    response = client.post("/items")
+    assert PRIMARY_COOKIE in response.cookies
+    assert "Max-Age=6" in response.headers["set-cookie"]
+    assert pinned_to_primary(response.cookies[PRIMARY_COOKIE])
+
+
+def test_replica_loads_do_not_recache_recent_invalidations():
+    clock = FakeClock()
+    cache = CreditCache(max_entries=10, ttl_seconds=60, replica_staleness_seconds=6, clock=clock)
+    
+    cache.load(1, "schedule", lambda: "v1")
+    cache.invalidate(1)
+    
+    # Within the staleness window a replica may still return the old rows
+    assert cache.load(1, "schedule", lambda: "stale", replica=True) == "stale"
+    assert cache.load(1, "schedule", lambda: "v2", replica=True) == "v2"
+    
+    # The primary is always current
+    assert cache.load(1, "schedule", lambda: "v2") == "v2"
+    assert cache.load(1, "schedule", lambda: "unused", replica=True) == "v2"
+    
+    cache.invalidate(1)
+    clock.now += 7
+    assert cache.load(1, "schedule", lambda: "v3", replica=True) == "v3"
+    assert cache.load(1, "schedule", lambda: "unused", replica=True) == "v3"
@@ -133,9 +133,13 @@ const Clientes = () => {
                   Mostrando{" "}
                   <span className="font-medium">{(page - 1) * 20 + 1}</span> a{" "}
                   <span className="font-medium">
-                    {Math.min(page * 20, data.total)}
+                    {(page - 1) * 20 + data.items.length}
                   </span>{" "}
-                  de <span className="font-medium">{data.total}</span>{" "}
+                  {data.total !== null && (
+                    <>
+                      de <span className="font-medium">{data.total}</span>{" "}
+                    </>
+                  )}
                   resultados
                 </p>
               </div>
@@ -149,7 +153,7 @@ const Clientes = () => {
                     <ChevronLeft className="h-5 w-5" />
                   </button>
                   <span className="relative inline-flex items-center px-4 py-2 text-sm font-semibold text-gray-900 ring-1 ring-inset ring-gray-300">
-                    {page} de {data.pages}
+                    {data.pages !== null ? `${page} de ${data.pages}` : page}
                   </span>
                   <button
                     onClick={() => setPage(page + 1)}
@@ -15,7 +15,11 @@ const Dashboard = () => {
 
   const { data: overduePayments } = useQuery({
     queryKey: ["overduePayments"],
-    queryFn: () => paymentsApi.getOverdue(1).then((res) => res.data),
+    // The five oldest for the list, plus the exact count for the KPI
+    queryFn: () =>
+      paymentsApi
+        .getOverdue(1, 5, undefined, undefined, "exact")
+        .then((res) => res.data),
   });
 
   const formatCurrency = (amount: number) => {
@@ -50,7 +54,7 @@ const Dashboard = () => {
     },
     {
       name: "Pagos Vencidos",
-      value: overduePayments?.length || 0,
+      value: overduePayments?.total ?? 0,
       icon: AlertTriangle,
       color: "text-red-600",
       bgColor: "bg-red-100",
@@ -153,7 +157,7 @@ const Dashboard = () => {
         </div>
       </div>
 
-      {overduePayments && overduePayments.length > 0 && (
+      {overduePayments && overduePayments.items.length > 0 && (
         <div className="card">
           <h3 className="text-lg font-semibold text-gray-900 mb-4 flex items-center">
             <AlertTriangle className="h-5 w-5 text-red-500 mr-2" />
@@ -181,7 +185,7 @@ const Dashboard = () => {
                 </tr>
               </thead>
               <tbody className="bg-white divide-y divide-gray-200">
-                {overduePayments.slice(0, 5).map((payment) => (
+                {overduePayments.items.slice(0, 5).map((payment) => (
                   <tr key={payment.schedule_id}>
                     <td className="px-6 py-4 whitespace-nowrap text-sm font-medium text-gray-900">
                       #{payment.credito_id}
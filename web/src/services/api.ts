@@ -1,14 +1,18 @@
 import axios from "axios";
 import type {
   Cliente,
+  ClienteDashboard,
   Credito,
   CreditoWithSchedule,
   PaymentSchedule,
   Pago,
   PaginatedResponse,
+  CursorPage,
+  OverdueCuota,
   APIResponse,
   AnalyticsOverview,
   PaymentsAnalytics,
+  PaymentSeriesPoint,
 } from "../types/api";
 
 const API_BASE_URL = "http://localhost:8000/api/v1";
@@ -30,6 +34,12 @@ export const clientesApi = {
     api.get<Cliente>(`/clientes/${id}`, {
       params: { include_creditos },
     }),
+
+  // fields: e.g. ["nombre", "saldo_pendiente", "creditos.next_payment"]
+  getDashboard: (id: number, fields?: string[]) =>
+    api.get<Partial<ClienteDashboard>>(`/clientes/${id}/dashboard`, {
+      params: { fields: fields?.join(",") },
+    }),
 };
 
 export const creditosApi = {
@@ -83,9 +93,30 @@ export const paymentsApi = {
       params: { credito_id },
     }),
 
-  getOverdue: (days_overdue = 0) =>
-    api.get<PaymentSchedule[]>("/payments/overdue", {
-      params: { days_overdue },
+  getSeries: (filters: {
+    desde?: string;
+    hasta?: string;
+    periodo?: "dia" | "semana";
+    group_by?: ("medio" | "producto" | "ciudad")[];
+    medio?: string;
+    producto?: string;
+    ciudad?: string;
+  }) =>
+    api.get<PaymentSeriesPoint[]>("/payments/analytics/series", {
+      params: filters,
+      // group_by=medio&group_by=ciudad, not group_by[]=...
+      paramsSerializer: { indexes: null },
+    }),
+
+  getOverdue: (
+    days_overdue = 0,
+    size = 50,
+    cursor?: string,
+    filters?: { min_saldo?: number; ciudad?: string; producto?: string },
+    total?: "exact" | "estimated"
+  ) =>
+    api.get<CursorPage<OverdueCuota>>("/payments/overdue", {
+      params: { days_overdue, size, cursor, total, ...filters },
     }),
 };
 
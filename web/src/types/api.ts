@@ -53,6 +53,36 @@ export interface CreditoSummary {
   estado: string;
 }
 
+export interface NextCuota {
+  schedule_id: number;
+  credito_id: number;
+  num_cuota: number;
+  fecha_vencimiento: string;
+  valor_cuota: number;
+  estado: "pendiente" | "parcial" | "vencida";
+  monto_pagado: number;
+  saldo_pendiente: number;
+  dias_vencimiento: number;
+}
+
+export interface CreditoDashboard extends CreditoSummary {
+  cliente_id: number;
+  dias_mora: number;
+  next_payment: NextCuota | null;
+  tea: number;
+  fecha_desembolso: string;
+  fecha_inicio_pago: string;
+}
+
+export interface ClienteDashboard extends Cliente {
+  monto_pagado: number;
+  saldo_pendiente: number;
+  cuotas_vencidas: number;
+  dias_mora: number;
+  next_payment: NextCuota | null;
+  creditos: CreditoDashboard[];
+}
+
 export interface CreditoWithSchedule extends Credito {
   payment_schedule: PaymentSchedule[];
   summary?: CreditoSummary;
@@ -60,12 +90,40 @@ export interface CreditoWithSchedule extends Credito {
 
 export interface PaginatedResponse<T> {
   items: T[];
-  total: number;
-  page: number;
+  // null with total=none (and page/pages also in cursor mode)
+  total: number | null;
+  page: number | null;
   size: number;
-  pages: number;
+  pages: number | null;
   has_next: boolean;
   has_prev: boolean;
+  next_cursor?: string | null;
+  prev_cursor?: string | null;
+}
+
+export interface CursorPage<T> {
+  items: T[];
+  size: number;
+  // Only when requested with total=exact|estimated
+  total?: number | null;
+  next_cursor?: string | null;
+  has_next: boolean;
+}
+
+export interface OverdueCuota {
+  schedule_id: number;
+  credito_id: number;
+  cliente_id: number;
+  cliente_nombre: string;
+  ciudad?: string;
+  producto: "e-bike" | "e-moped";
+  num_cuota: number;
+  fecha_vencimiento: string;
+  valor_cuota: number;
+  estado: "parcial" | "vencida";
+  monto_pagado: number;
+  saldo_pendiente: number;
+  dias_vencimiento: number;
 }
 
 export interface APIResponse<T> {
@@ -95,3 +153,12 @@ export interface PaymentsAnalytics {
     link: number;
   };
 }
+
+export interface PaymentSeriesPoint {
+  periodo: string;
+  medio?: string | null;
+  producto?: string | null;
+  ciudad?: string | null;
+  pagos: number;
+  monto: string;
+}